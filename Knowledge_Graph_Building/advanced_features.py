@@ -32,11 +32,14 @@ class EnhancedKnowledgeGraphBuilder(MDKnowledgeGraphBuilder):
         relations = []
         sentences = text.split('。')
 
-        for sentence in sentences:
+        # 只对包含日期的句子做实体识别，并一次性批量送入 nlp.pipe
+        date_sentences = [sentence for sentence in sentences if any(date in sentence for date in dates)]
+        entities_list = self.extract_entities_batch(date_sentences)
+
+        for sentence, entities in zip(date_sentences, entities_list):
             for date in dates:
                 if date in sentence:
                     # 找到日期相关的内容
-                    entities = self.extract_entities_spacy(sentence)
                     for entity in entities:
                         relations.append((entity, 'OCCUR_AT', date))
 
@@ -5,31 +5,58 @@ import re
 import os
 import sys
 import signal
+import time
+import json
+import hashlib
+import asyncio
+import random
+import argparse
+import threading
+import email.utils
+from datetime import datetime, timezone
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import zip_longest
+from urllib.parse import urlsplit
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# 有 lxml 时用它解析，比 html.parser 快得多
+try:
+    import lxml
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
 
 # 全局变量
 
-# index_url = 'https://www.runoob.com/python/'
-# downdir = '/storage/emulated/0/git/python-code/h/'
+# 用法: python data_crawler.py https://www.runoob.com/python/ -o ./markdown_files
+#      python data_crawler.py --config sites.json
+
+# 异步爬取参数
+CONCURRENCY = 8  # 全局最大并发请求数（同时也是连接池大小）
+PER_SITE_CONCURRENCY = 4  # 每个站点同时处理的页面数
+PER_HOST_INTERVAL = 0.5  # 同一主机两次请求开始之间的最小间隔（秒）
+MAX_RETRIES = 3  # 失败后的最大重试次数
+RETRY_BACKOFF = 1.0  # 重试的初始等待时间（秒），每次翻倍
+MAX_RETRY_AFTER = 60  # 服务器 Retry-After 要求的等待时间上限（秒）
+REQUEST_TIMEOUT = 30  # 单次请求超时（秒）
+CONVERT_WORKERS = os.cpu_count() or 1  # HTML 转 Markdown 的工作进程数
+CACHE_DIR = '.crawl_cache'  # downdir 下保存响应缓存和检查点的目录
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+}
 
-# 后续记得写速率控制，和input
-
-index_url = str(input("index_url: "))
-downdir = str(input("downdir: "))
-
-if not downdir.endswith('/'):
-    downdir = downdir + "/"
-# 文件路径生成
-if not os.path.exists(downdir):
-    os.makedirs(downdir)
 #------------------------
 
 # 网络请求，直接返回text
 def get_url(url,headers=None,encoding="",return_content_and_reality_url=False):
     # 设置请求头
     if headers is None:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-        }
+        headers = DEFAULT_HEADERS
     # 发送请求
     response = requests.get(url,headers=headers)
     #设置编码
@@ -101,9 +128,15 @@ def remove_tags(text):
 def change_example_code_divs(html_content):
     # 解析HTML内容
     soup = BeautifulSoup(html_content, 'html.parser')
+    replace_example_code_divs(soup, soup)
+
+    # 输出转换后的HTML
+    return((soup.prettify()))
 
+# 在已解析的文档树上原地把实例代码容器替换为 <pre><code>，tree 可以是整个文档或其中的一部分
+def replace_example_code_divs(tree, soup):
     # 查找所有包含代码的容器
-    example_code_divs = soup.find_all('div', class_='example_code')
+    example_code_divs = tree.find_all('div', class_='example_code')
 
     # 如果找到了包含代码的容器，进行处理
     for example_code_div in example_code_divs:
@@ -122,9 +155,6 @@ def change_example_code_divs(html_content):
         # 将原始代码块替换为新的标准代码块
         example_code_div.replace_with(new_code_block)
 
-    # 输出转换后的HTML
-    return((soup.prettify()))
-
 # 退出程序
 def exit_ctrl_c(sig, frame):
     print("\n退出程序...")
@@ -133,21 +163,11 @@ def exit_ctrl_c(sig, frame):
 print('载入函数成功')
 #-------------------------
 
-def main():
-    global index_url
-    global downdir
-    index_response = get_url(index_url,return_content_and_reality_url=True)
-    index_html = index_response[1]
-    index_url = index_response[0]
+# 解析首页，返回标题和侧边栏链接 [(标题, 链接), ...]
+def parse_index(index_html, index_url):
     index_url_root = get_root_url(index_url)
     root_url = get_base_url(index_url)
-
-    # 解析网页内容
-    print("解析网页内容")
-    index_soup = BeautifulSoup(index_html, 'html.parser')
-
-    # 建立 index 列表
-    print("建立 index 列表")
+    index_soup = BeautifulSoup(index_html, HTML_PARSER)
 
     index_links = []
     for link in index_soup.select('div.sidebar-box.gallery-list a'):
@@ -158,61 +178,554 @@ def main():
             list_link = root_url + list_link
         else:
             list_link = index_url_root + list_link
-        index_links.append(list_title + ':::' + list_link)
+        index_links.append((list_title, list_link))
+    return(index_soup.title.string, index_links)
+
+# 解析文章页，返回标题和文件内容
+# 每个页面只解析一次：标题、正文、实例代码替换和 Markdown 转换都在同一棵文档树上完成
+def build_page(link_title, link_url, link_html):
+    link_soup = BeautifulSoup(link_html, HTML_PARSER)
+    # 提取相关信息
+    # title，优先取 h1，其次 h2，过长时使用侧边栏中的标题
+    for heading in ('.article-body h1', '.article-body h2'):
+        heading_tag = link_soup.select_one(heading)
+        if heading_tag is not None:
+            heading_title = heading_tag.get_text().strip()
+            if len(heading_title) <= 35:
+                link_title = heading_title
+            break
+    article = link_soup.select_one('.article-body')
+    replace_example_code_divs(article, link_soup)
+    link_content_markdown = markdownify.MarkdownConverter().convert_soup(article)
+    # 生成文本内容
+    link_file_content = str(f"## [{link_title}]({link_url})\n\n[index](目录.md)\n\n---\n{link_content_markdown}")
+    return(link_title, link_file_content)
+
+# 文章文件名
+def page_file_name(link_title):
+    return(safe_filename(link_title) + ".md")
+
+# 目录条目，link_path 为相对目录文件的路径
+def directory_entry(link_title, link_path):
+    return(f"- [{link_title}]({link_path.replace(os.sep, '/').replace(' ', '%20')})\n")
+
+# 写入文章文件，返回目录条目
+def save_page(link_title, link_file_content, downdir):
+    # 文件路径
+    link_file_name = page_file_name(link_title)
+    # 写入文件
+    write_file(link_file_content, downdir + link_file_name)
+    return(directory_entry(link_title, link_file_name))
+
+# 输出目录统一以 / 结尾，不存在时创建
+def normalize_downdir(downdir):
+    if not downdir.endswith('/'):
+        downdir = downdir + "/"
+    # 文件路径生成
+    if not os.path.exists(downdir):
+        os.makedirs(downdir)
+    return(downdir)
+
+# 多个站点共用一个输出根目录时，每个站点的子目录名
+def site_dirname(index_url):
+    parts = urlsplit(index_url)
+    return(safe_filename((parts.netloc + parts.path).strip('/')))
+
+# 顺序爬取一个站点
+def crawl(index_url, downdir):
+    downdir = normalize_downdir(downdir)
+    index_response = get_url(index_url,return_content_and_reality_url=True)
+    index_html = index_response[1]
+    index_url = index_response[0]
+
+    # 解析网页内容，建立 index 列表
+    print("解析网页内容")
+    print("建立 index 列表")
+    index_title, index_links = parse_index(index_html, index_url)
 
     print("-----------------------------")
     print(index_links)
     print("-----------------------------")
-    # 建立目录文件
-    directory_file = downdir + '目录.md'
-    write_file_a(f"## {index_soup.title.string}\n",directory_file)
-    # with open(directory_file, 'a', encoding='utf-8') as directory_file_x:
-        # directory_file_x.write(f"## {index_soup.title.string}\n")
 
     # 循环爬取
     print("循环爬取")
     index_links_len = len(index_links)
-    for i,link in enumerate(index_links):
-        # print(link)
-        link = link.split(':::')
-        link_url = link[1]
+    entries = []
+    for i,(link_title,link_url) in enumerate(index_links):
         link_html = get_url(link_url)
-        # 解析
-        link_soup = BeautifulSoup(link_html, 'html.parser')
-        # print(link_soup)
-        # 提取相关信息
-        # title
-        link_title_len = len(link_soup.select('.article-body  h1'))
-        if link_title_len == 0:
-            link_title_len = len(link_soup.select('.article-body  h2'))
-            if link_title_len == 0:
-                link_title = link[0]
-            else:
-                link_title = remove_tags(str(link_soup.select('.article-body  h2')[0])).strip()
-                if len(link_title) > 35:
-                    link_title = link[0]
-        else:
-            link_title = remove_tags(str(link_soup.select('.article-body  h1')[0])).strip()
-            if len(link_title) > 35:
-                link_title = link[0]
-        # link_title = link[0]
+        link_title, link_file_content = build_page(link_title, link_url, link_html)
         print(f"[{i+1}/{index_links_len}]:{link_title}")
-        link_content = str(link_soup.select('.article-body')[0])
-        link_content_markdown = to_markdown(link_content)
-        # 生成文本内容
-        link_file_content = str(f"## [{link_title}]({link_url})\n\n[index](目录.md)\n\n---\n{link_content_markdown}")
-        # 文件路径
-        link_file_path = downdir + safe_filename(link_title) + ".md"
         # 写入文件
-        write_file(link_file_content,link_file_path)
-        # 更新目录
-        link_url_top = safe_filename(link_title) + ".md"
-        write_file_a(f"- [{link_title}]({link_url_top.replace('','%%20)')})\n",directory_file)
+        entries.append(save_page(link_title, link_file_content, downdir))
+
+    # 建立目录文件
+    write_directory(downdir, index_title, entries)
 
     print('success !')
-    print("\n退出程序...")
-    sys.exit(0)
+
+#------------------------- 异步爬取
+
+# 按主机限速：同一主机两次请求开始之间至少间隔 interval 秒
+class HostRateLimiter:
+    def __init__(self, interval=PER_HOST_INTERVAL):
+        self.interval = interval
+        self.next_time = {}
+        self.locks = {}
+
+    async def wait(self, url):
+        host = urlsplit(url).netloc
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            start = max(now, self.next_time.get(host, now))
+            self.next_time[host] = start + self.interval
+        if start > now:
+            await asyncio.sleep(start - now)
+
+# 解析 Retry-After 响应头（秒数或 HTTP 日期），返回要等待的秒数，不超过 MAX_RETRY_AFTER；没有或无法解析时返回 None
+def parse_retry_after(value):
+    if not value:
+        return(None)
+    value = value.strip()
+    if value.isdigit():
+        seconds = int(value)
+    else:
+        try:
+            when = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return(None)
+        if when.tzinfo is None:
+            when = when.replace(tzinfo=timezone.utc)
+        seconds = (when - datetime.now(timezone.utc)).total_seconds()
+    return(min(max(seconds, 0), MAX_RETRY_AFTER))
+
+# 异步网络请求，返回 (实际url, 内容, 是否未修改)；连接错误、超时、429 和 5xx 按指数退避重试，
+# 429/503 带有 Retry-After 时至少等待它要求的时间
+# 传入 cache 时带上 ETag/Last-Modified 发送条件请求，304 时返回缓存的内容，200 时更新缓存
+async def fetch_url(session, url, semaphore, limiter, retries=MAX_RETRIES, backoff=RETRY_BACKOFF, cache=None):
+    meta = cache.get(url) if cache is not None else None
+    headers = cache.conditional_headers(meta) if meta else None
+    for attempt in range(retries + 1):
+        await limiter.wait(url)
+        retry_after = None
+        try:
+            async with semaphore:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304 and meta:
+                        return(meta.get('real_url', url), cache.load_body(url), True)
+                    if response.status == 429 or response.status >= 500:
+                        raise aiohttp.ClientResponseError(response.request_info, response.history,
+                                                          status=response.status, message=response.reason,
+                                                          headers=response.headers)
+                    response.raise_for_status()
+                    content = await response.read()
+                    if cache is not None:
+                        cache.store(url, str(response.url), content, response.headers)
+                    return(str(response.url), content, False)
+        except aiohttp.ClientResponseError as e:
+            # 其余 4xx 重试也没有用
+            if e.status != 429 and e.status < 500 or attempt == retries:
+                raise
+            if e.headers is not None:
+                retry_after = parse_retry_after(e.headers.get('Retry-After'))
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == retries:
+                raise
+        delay = backoff * (2 ** attempt) * (0.5 + random.random() / 2)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        print(f"请求失败，{delay:.1f}s 后重试({attempt+1}/{retries}): {url}")
+        await asyncio.sleep(delay)
+
+# 爬取状态：响应内容及 ETag/Last-Modified 缓存，以及本轮已完成链接的检查点
+# 每个链接的缓存单独存放，检查点只追加写入，随时中断都不会损坏
+class CrawlCache:
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        self.pages_dir = os.path.join(cache_dir, 'pages')
+        self.checkpoint_file = os.path.join(cache_dir, 'checkpoint.jsonl')
+        # 流水线模式下检查点由写库线程追加
+        self.lock = threading.Lock()
+        os.makedirs(self.pages_dir, exist_ok=True)
+
+    def _path(self, url, suffix):
+        return(os.path.join(self.pages_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + suffix))
+
+    def get(self, url):
+        try:
+            with open(self._path(url, '.json'), 'r', encoding='utf-8') as f:
+                return(json.load(f))
+        except (OSError, ValueError):
+            return(None)
+
+    def _write_meta(self, url, meta):
+        path = self._path(url, '.json')
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(path + '.tmp', path)
+
+    @staticmethod
+    def conditional_headers(meta):
+        headers = {}
+        if meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+        return(headers)
+
+    def load_body(self, url):
+        with open(self._path(url, '.body'), 'rb') as f:
+            return(f.read())
+
+    def store(self, url, real_url, content, headers):
+        path = self._path(url, '.body')
+        with open(path + '.tmp', 'wb') as f:
+            f.write(content)
+        os.replace(path + '.tmp', path)
+        self._write_meta(url, {
+            'url': url,
+            'real_url': real_url,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+        })
+
+    # 记录页面的标题和生成的文件名，内容未修改时直接复用
+    # sink 为处理该页面的下游（如写入知识图谱），记入 processed；内容更新（store）后记录随之清空
+    def set_page(self, url, page, sink=None):
+        meta = self.get(url) or {'url': url}
+        meta['page'] = page
+        if sink is not None and sink not in meta.setdefault('processed', []):
+            meta['processed'].append(sink)
+        self._write_meta(url, meta)
+
+    # 内容未修改的页面是否已由下游 sink 处理过；sink 为空（只写文件）时看是否生成过页面
+    @staticmethod
+    def is_processed(meta, sink=None):
+        if not meta or not meta.get('page'):
+            return(False)
+        return(sink is None or sink in meta.get('processed', []))
+
+    # 读取检查点：本轮已完成的 {链接: 页面}，入口页或下游不同时视为新的一轮
+    def load_checkpoint(self, index_url, sink=None):
+        done = {}
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        except OSError:
+            return(done)
+        if not lines or json.loads(lines[0]) != {'index_url': index_url, 'sink': sink}:
+            return(done)
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 中断时可能只写了半行
+                continue
+            done[record['url']] = record['page']
+        return(done)
+
+    def start_checkpoint(self, index_url, resume, sink=None):
+        if not resume:
+            with open(self.checkpoint_file, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'index_url': index_url, 'sink': sink}) + '\n')
+
+    def mark_done(self, url, page):
+        with self.lock:
+            with open(self.checkpoint_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'url': url, 'page': page}, ensure_ascii=False) + '\n')
+
+    def clear_checkpoint(self):
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+# 重写目录文件（先写临时文件再替换），重复运行不会产生重复条目
+def write_directory(downdir, index_title, entries):
+    directory_file = downdir + '目录.md'
+    write_file(f"## {index_title}\n" + ''.join(entries), directory_file + '.tmp')
+    os.replace(directory_file + '.tmp', directory_file)
+
+# HTML 转 Markdown 的工作进程池
+def make_convert_pool(workers=CONVERT_WORKERS):
+    return(ProcessPoolExecutor(max_workers=workers))
+
+# 一个待爬取的站点：入口页、输出目录、站点内并发上限及爬取状态
+class CrawlSite:
+    def __init__(self, index_url, downdir, concurrency=PER_SITE_CONCURRENCY, use_cache=True):
+        self.index_url = index_url
+        self.downdir = normalize_downdir(downdir)
+        self.concurrency = concurrency
+        self.cache = CrawlCache(os.path.join(self.downdir, CACHE_DIR)) if use_cache else None
+        self.semaphore = None
+        # 站点达到并发上限时从工作队列中取出的链接，站点有页面完成时再放回工作队列
+        self.waiting = deque()
+        self.title = None
+        self.links = []
+        # 与 links 一一对应的页面 {'title': 标题, 'path': 文章文件路径}，失败时为 None
+        self.pages = []
+        self.done = {}
+        self.failed = []
+        self.stats = {'downloaded': 0, 'not_modified': 0, 'resumed': 0, 'duplicate': 0, 'failed': 0, 'bytes': 0}
+
+    # 按侧边栏顺序生成目录条目；页面由其他站点爬取时链接到那个站点目录中的文件
+    def entries(self):
+        entries = []
+        for page in self.pages:
+            if page is not None:
+                entries.append(directory_entry(page['title'], os.path.relpath(page['path'], self.downdir)))
+        return(entries)
+
+# 异步并发爬取多个站点
+# 各站点侧边栏中的链接放入同一个去重的工作队列，由 concurrency 个工作协程消费，
+# 每个站点同时处理的页面数不超过站点的 concurrency；同一链接只下载、转换一次。
+# 目录文件按侧边栏顺序重写；HTML 转 Markdown 在进程池中进行，与网络请求重叠。
+# 爬取状态保存在各站点输出目录的 CACHE_DIR 中：中断后重新运行会跳过已完成的链接，
+# 全部完成后再运行则对每个页面发送条件请求，未修改的页面不再下载和转换。
+# 传入 on_page 时，每个新转换的页面以 await on_page(site, 链接, 页面, Markdown文本, commit) 交给下游，
+# 下游处理完后调用 commit() 才把页面记入缓存和检查点；write_files 为 False 时不写 Markdown 和目录文件。
+# sink 是下游的名称，缓存和检查点按它分别记录已处理的页面：内容未修改、但这个下游还没处理过的页面
+# （如之前只用爬虫下载过）会从缓存的内容重新转换并交给 on_page。
+# 返回 {入口页: 失败的链接列表}
+async def crawl_sites(sites, concurrency=CONCURRENCY, per_host_interval=PER_HOST_INTERVAL,
+                      retries=MAX_RETRIES, backoff=RETRY_BACKOFF, timeout=REQUEST_TIMEOUT,
+                      convert_workers=CONVERT_WORKERS, on_page=None, write_files=True, sink=None):
+    if aiohttp is None:
+        raise RuntimeError("异步爬取需要安装 aiohttp: pip install aiohttp")
+
+    with make_convert_pool(convert_workers) as convert_pool:
+        return(await _crawl_sites(sites, concurrency, per_host_interval, retries, backoff, timeout, convert_pool,
+                                  on_page, write_files, sink))
+
+# 异步并发爬取一个站点，返回失败的链接列表
+async def crawl_async(index_url, downdir, concurrency=CONCURRENCY, per_host_interval=PER_HOST_INTERVAL,
+                      retries=MAX_RETRIES, backoff=RETRY_BACKOFF, timeout=REQUEST_TIMEOUT,
+                      convert_workers=CONVERT_WORKERS, use_cache=True):
+    site = CrawlSite(index_url, downdir, concurrency, use_cache)
+    failed = await crawl_sites([site], concurrency, per_host_interval, retries, backoff, timeout, convert_workers)
+    return(failed[site.index_url])
+
+async def _crawl_sites(sites, concurrency, per_host_interval, retries, backoff, timeout, convert_pool,
+                       on_page=None, write_files=True, sink=None):
+    loop = asyncio.get_running_loop()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = HostRateLimiter(per_host_interval)
+    # 连接池复用 keep-alive 连接
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout, headers=DEFAULT_HEADERS) as session:
+
+        async def load_index(site):
+            site.semaphore = asyncio.Semaphore(site.concurrency)
+            try:
+                real_url, index_html, _ = await fetch_url(session, site.index_url, semaphore, limiter,
+                                                          retries, backoff, site.cache)
+            except Exception as e:
+                print(f"爬取入口页 {site.index_url} 失败: {e}")
+                site.failed.append(site.index_url)
+                return
+            site.title, site.links = parse_index(index_html, real_url)
+            site.pages = [None] * len(site.links)
+            print(f"{site.title}: 共 {len(site.links)} 个页面")
+
+            if site.cache is not None:
+                site.done = site.cache.load_checkpoint(site.index_url, sink)
+                site.cache.start_checkpoint(site.index_url, resume=bool(site.done), sink=sink)
+                if site.done:
+                    print(f"{site.title}: 从检查点恢复，跳过 {len(site.done)} 个已完成的页面")
+
+        await asyncio.gather(*(load_index(site) for site in sites))
+
+        # 各站点的链接交替入队，工作协程不会长时间卡在同一个站点的并发上限上
+        queue = asyncio.Queue()
+        # 链接 -> 负责爬取它的 (站点, 位置)；重复出现的链接等负责的任务完成后直接引用结果
+        owners = {}
+        duplicates = []
+        site_links = [[(site, i, link) for i, link in enumerate(site.links)] for site in sites]
+        for site, i, (link_title, link_url) in (item for group in zip_longest(*site_links) for item in group if item):
+            if link_url in owners:
+                duplicates.append((site, i, link_url))
+            elif link_url in site.done:
+                owners[link_url] = (site, i)
+                site.pages[i] = dict(site.done[link_url], path=site.downdir + site.done[link_url]['file_name'])
+                site.stats['resumed'] += 1
+            else:
+                owners[link_url] = (site, i)
+                queue.put_nowait((site, i, link_title, link_url))
+
+        async def crawl_page(site, i, link_title, link_url):
+            progress = f"[{site.title} {i+1}/{len(site.links)}]"
+            try:
+                _, link_html, not_modified = await fetch_url(session, link_url, semaphore, limiter,
+                                                             retries, backoff, site.cache)
+                meta = site.cache.get(link_url) if not_modified else None
+                if CrawlCache.is_processed(meta, sink) and (not write_files or
+                                                            os.path.exists(site.downdir + meta['page']['file_name'])):
+                    # 内容未修改且上次已由同一个下游处理（生成的文件还在），不必重新转换
+                    site.stats['not_modified'] += 1
+                    page = meta['page']
+                    if site.cache is not None:
+                        site.cache.mark_done(link_url, page)
+                else:
+                    if not_modified:
+                        site.stats['not_modified'] += 1
+                    else:
+                        site.stats['downloaded'] += 1
+                        site.stats['bytes'] += len(link_html)
+                    link_title, link_file_content = await loop.run_in_executor(
+                        convert_pool, build_page, link_title, link_url, link_html)
+                    if write_files:
+                        save_page(link_title, link_file_content, site.downdir)
+                    page = {'title': link_title, 'file_name': page_file_name(link_title)}
+
+                    def commit(site=site, link_url=link_url, page=page):
+                        if site.cache is not None:
+                            site.cache.set_page(link_url, page, sink)
+                            site.cache.mark_done(link_url, page)
+
+                    if on_page is not None:
+                        await on_page(site, link_url, page, link_file_content, commit)
+                    else:
+                        commit()
+                    print(f"{progress}:{link_title}")
+                site.pages[i] = dict(page, path=site.downdir + page['file_name'])
+            except Exception as e:
+                print(f"{progress}:爬取 {link_url} 失败: {e}")
+                site.failed.append(link_url)
+                site.stats['failed'] += 1
+
+        # 工作协程不在站点的并发上限上等待：取到已达上限的站点的链接时先放到站点的等待队列，
+        # 继续处理其他站点的链接，全局的 concurrency 个名额不会被一个站点占住。
+        # 等待中的链接仍计入工作队列的未完成数，放回工作队列时再 task_done，queue.join() 不会提前返回
+        async def worker():
+            while True:
+                item = await queue.get()
+                site, i, link_title, link_url = item
+                if site.semaphore.locked():
+                    site.waiting.append(item)
+                    continue
+                try:
+                    async with site.semaphore:
+                        await crawl_page(site, i, link_title, link_url)
+                finally:
+                    if site.waiting:
+                        queue.put_nowait(site.waiting.popleft())
+                        queue.task_done()
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    for site, i, link_url in duplicates:
+        owner_site, owner_index = owners[link_url]
+        site.pages[i] = owner_site.pages[owner_index]
+        site.stats['duplicate'] += 1
+
+    failed = {}
+    for site in sites:
+        if site.title is not None and write_files:
+            write_directory(site.downdir, site.title, site.entries())
+        # 全部完成后清除检查点，下一轮从头发送条件请求；有失败时保留，重新运行只处理剩下的链接
+        if site.cache is not None and site.title is not None and not site.failed:
+            site.cache.clear_checkpoint()
+        print(f'{site.title or site.index_url}: {site.stats}')
+        failed[site.index_url] = site.failed
+    return(failed)
+
+# 读取 JSON 配置文件：{"sites": [{"index_url": ..., "downdir": ..., "concurrency": ...}, ...], 以及各项全局参数}
+def load_config(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return(json.load(f))
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="爬取教程网站侧边栏中的页面并转换为 Markdown")
+    parser.add_argument('index_urls', nargs='*', metavar='INDEX_URL', help="入口页（侧边栏所在的页面），可以有多个")
+    parser.add_argument('-o', '--downdir', help="输出目录，默认 ./markdown_files；有多个站点时每个站点使用其中的一个子目录")
+    parser.add_argument('-c', '--config', help="JSON 配置文件，包含站点列表及下列参数")
+    parser.add_argument('--concurrency', type=int, help=f"全局最大并发请求数，默认 {CONCURRENCY}")
+    parser.add_argument('--per-site-concurrency', type=int, help=f"每个站点同时处理的页面数，默认 {PER_SITE_CONCURRENCY}")
+    parser.add_argument('--interval', type=float, help=f"同一主机两次请求之间的最小间隔（秒），默认 {PER_HOST_INTERVAL}")
+    parser.add_argument('--retries', type=int, help=f"失败后的最大重试次数，默认 {MAX_RETRIES}")
+    parser.add_argument('--timeout', type=float, help=f"单次请求超时（秒），默认 {REQUEST_TIMEOUT}")
+    parser.add_argument('--workers', type=int, help=f"HTML 转 Markdown 的进程数，默认 {CONVERT_WORKERS}")
+    parser.add_argument('--no-cache', action='store_true', help="不使用响应缓存和检查点")
+    parser.add_argument('--sync', action='store_true', help="逐个页面顺序爬取，不使用并发")
+    return(parser)
+
+def parse_args(argv=None, parser=None):
+    parser = parser or build_parser()
+    args = parser.parse_args(argv)
+    if not args.index_urls and not args.config:
+        parser.error("需要至少一个入口页或 --config 配置文件")
+    return(args)
+
+# 合并配置文件与命令行参数（命令行优先），返回 (站点列表, 全局参数)
+def resolve_options(args):
+    config = load_config(args.config) if args.config else {}
+    options = {
+        'downdir': './markdown_files',
+        'concurrency': CONCURRENCY,
+        'per_site_concurrency': PER_SITE_CONCURRENCY,
+        'interval': PER_HOST_INTERVAL,
+        'retries': MAX_RETRIES,
+        'timeout': REQUEST_TIMEOUT,
+        'workers': CONVERT_WORKERS,
+        'use_cache': True,
+    }
+    options.update({key: value for key, value in config.items() if key in options})
+    for key in ('downdir', 'concurrency', 'per_site_concurrency', 'interval', 'retries', 'timeout', 'workers'):
+        if getattr(args, key) is not None:
+            options[key] = getattr(args, key)
+    if args.no_cache:
+        options['use_cache'] = False
+
+    sites = [dict(site) if isinstance(site, dict) else {'index_url': site} for site in config.get('sites', [])]
+    sites.extend({'index_url': index_url} for index_url in args.index_urls)
+
+    # 同一入口页只爬一次；只有一个站点且未指定目录时直接输出到 downdir
+    sites = list({site['index_url']: site for site in sites}.values())
+    for site in sites:
+        if 'downdir' not in site:
+            site['downdir'] = options['downdir'] if len(sites) == 1 else \
+                os.path.join(options['downdir'], site_dirname(site['index_url']))
+    return(sites, options)
+
+# 按 resolve_options 的结果创建站点
+def make_sites(sites, options):
+    return([
+        CrawlSite(site['index_url'], site['downdir'], site.get('concurrency', options['per_site_concurrency']),
+                  options['use_cache'])
+        for site in sites
+    ])
+
+# resolve_options 的全局参数对应的 crawl_sites 参数
+def crawl_options(options):
+    return({
+        'concurrency': options['concurrency'],
+        'per_host_interval': options['interval'],
+        'retries': options['retries'],
+        'timeout': options['timeout'],
+        'convert_workers': options['workers'],
+    })
+
+# 命令行入口，返回退出码
+def main(argv=None):
+    args = parse_args(argv)
+    sites, options = resolve_options(args)
+
+    if args.sync:
+        for site in sites:
+            crawl(site['index_url'], site['downdir'])
+        return(0)
+
+    failed = asyncio.run(crawl_sites(make_sites(sites, options), **crawl_options(options)))
+    return(1 if any(failed.values()) else 0)
 
 if __name__ == "__main__":
     signal.signal(signal.SIGINT, exit_ctrl_c)
-    main()
\ No newline at end of file
+    sys.exit(main())
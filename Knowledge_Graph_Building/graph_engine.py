@@ -0,0 +1,640 @@
+import time
+import heapq
+import random
+from collections import Counter
+from itertools import count
+from typing import List, Dict, Tuple, Iterable, Optional, Set
+
+import numpy as np
+
+
+# PageRank 默认参数，与 GDS 的默认值一致
+PAGERANK_DAMPING = 0.85
+PAGERANK_MAX_ITERATIONS = 20
+PAGERANK_TOLERANCE = 1e-7
+
+# 标签传播的最大迭代次数，与 GDS 的默认值一致
+LABEL_PROPAGATION_MAX_ITERATIONS = 10
+
+# 路径搜索默认的最大跳数
+PATH_MAX_DEPTH = 3
+
+# 图谱版本号，构建器每次写库后加一，分析工具据此判断快照是否过期；
+# 服务端（server/utils/redis_to_neo4j.py 的 sync_graph_version）据此清除 Neo4j 查询结果缓存
+GRAPH_VERSION_QUERY = """
+    OPTIONAL MATCH (m:GraphMeta {name: 'knowledge_graph'})
+    RETURN coalesce(m.version, 0) AS version
+"""
+
+BUMP_GRAPH_VERSION_QUERY = """
+    MERGE (m:GraphMeta {name: 'knowledge_graph'})
+    SET m.version = coalesce(m.version, 0) + 1,
+        m.updated_at = timestamp()
+"""
+
+# 读取图快照：实体及其 RELATES_TO 以外的关系数（文档包含实体等），用于和 Cypher 的度数一致
+SNAPSHOT_ENTITIES_QUERY = """
+    MATCH (e:Entity)
+    RETURN e.name AS name, size([(e)-[r]-() WHERE type(r) <> 'RELATES_TO' | r]) AS other_degree
+"""
+
+SNAPSHOT_RELATIONSHIPS_QUERY = """
+    MATCH (e1:Entity)-[r:RELATES_TO]->(e2:Entity)
+    RETURN e1.name AS source, e2.name AS target, r.type AS type, coalesce(r.weight, 1) AS weight
+"""
+
+
+class GraphEngine:
+    """
+    内存中的实体关系图分析引擎
+
+    实体关系图一次性读入，以 CSR（压缩稀疏行）邻接结构存放在 NumPy 数组中，
+    度中心性、PageRank、标签传播社区和连通分量都用向量化运算完成，不依赖 GDS 插件；
+    两个实体之间的 k 条最短路径用双向广度优先搜索在内存中求出，不访问数据库。
+    """
+
+    def __init__(self, names: List[str], sources: Iterable[int], targets: Iterable[int],
+                 weights: Optional[Iterable[float]] = None, other_degree: Optional[Iterable[int]] = None,
+                 types: Optional[Iterable[str]] = None, version: int = 0):
+        """
+        初始化引擎
+
+        Args:
+            names: 实体名，下标即实体编号
+            sources: 每条关系的源实体编号
+            targets: 每条关系的目标实体编号
+            weights: 每条关系的权重（出现次数），默认都为1
+            other_degree: 每个实体 RELATES_TO 以外的关系数，计入度数
+            types: 每条关系的类型
+            version: 读取快照时的图谱版本号
+        """
+        self.version = version
+        self.names = list(names)
+        self._index = {name: i for i, name in enumerate(self.names)}
+        n = len(self.names)
+
+        self.sources = np.asarray(sources, dtype=np.int32).reshape(-1)
+        self.targets = np.asarray(targets, dtype=np.int32).reshape(-1)
+        if weights is None:
+            self.weights = np.ones(len(self.sources), dtype=np.float64)
+        else:
+            self.weights = np.asarray(weights, dtype=np.float64).reshape(-1)
+        if other_degree is None:
+            self.other_degree = np.zeros(n, dtype=np.int64)
+        else:
+            self.other_degree = np.asarray(other_degree, dtype=np.int64).reshape(-1)
+
+        # 关系类型编号表
+        self.relation_types: List[str] = []
+        self._type_ids: Dict[str, int] = {}
+        type_ids = []
+        for relation_type in (types if types is not None else ()):
+            type_id = self._type_ids.get(relation_type)
+            if type_id is None:
+                type_id = self._type_ids[relation_type] = len(self.relation_types)
+                self.relation_types.append(relation_type)
+            type_ids.append(type_id)
+        self.types = np.asarray(type_ids, dtype=np.int32) if types is not None else None
+
+        # 无向邻接：非自环的关系两个方向各存一条，自环只存一条（与 Cypher 无向匹配的计数一致）
+        loops = self.sources == self.targets
+        # edge_ids 记录每个邻接位置对应的关系编号
+        rows = np.concatenate((self.sources, self.targets[~loops]))
+        cols = np.concatenate((self.targets, self.sources[~loops]))
+        edges = np.arange(len(self.sources), dtype=np.int32)
+        edge_ids = np.concatenate((edges, edges[~loops]))
+        self.indptr, self.indices, self.edge_ids = _to_csr(n, rows, cols, edge_ids)
+        self.edge_weights = self.weights[self.edge_ids]
+
+        # 路径搜索用的 Python 邻接表，首次搜索时生成
+        self._adjacency: Optional[List[List[Tuple[int, int]]]] = None
+        self._edge_types: Optional[List[int]] = None
+
+    @classmethod
+    def from_neo4j(cls, driver) -> 'GraphEngine':
+        """
+        从 Neo4j 读取实体关系图快照
+
+        Args:
+            driver: Neo4j 驱动
+
+        Returns:
+            图分析引擎
+        """
+        with driver.session() as session:
+            version = session.run(GRAPH_VERSION_QUERY).single()['version']
+
+            names = []
+            other_degree = []
+            for record in session.run(SNAPSHOT_ENTITIES_QUERY):
+                names.append(record['name'])
+                other_degree.append(record['other_degree'])
+
+            index = {name: i for i, name in enumerate(names)}
+            sources = []
+            targets = []
+            types = []
+            weights = []
+            for record in session.run(SNAPSHOT_RELATIONSHIPS_QUERY):
+                sources.append(index[record['source']])
+                targets.append(index[record['target']])
+                types.append(record['type'])
+                weights.append(record['weight'])
+
+        return cls(names, sources, targets, weights, other_degree, types, version)
+
+    @classmethod
+    def from_store(cls, store) -> 'GraphEngine':
+        """
+        从构建器内存中的 KnowledgeGraphStore 创建引擎，关系的出现次数作为权重
+
+        Args:
+            store: 实体、关系存储
+
+        Returns:
+            图分析引擎
+        """
+        sources, type_ids, targets, counts = zip(*store.iter_edges()) if store.num_relationships else ((), (), (), ())
+        return cls(store.entities, sources, targets, counts,
+                   types=[store.relation_types[type_id] for type_id in type_ids])
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.names)
+
+    @property
+    def num_edges(self) -> int:
+        """关系数（有向，重复关系分别计数）"""
+        return len(self.sources)
+
+    def node_id(self, name: str) -> Optional[int]:
+        """取实体编号，不存在时返回 None"""
+        return self._index.get(name)
+
+    def neighbors(self, node: int) -> np.ndarray:
+        """实体的邻居编号（无向，重复关系重复出现）"""
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def degree(self) -> np.ndarray:
+        """每个实体的度数：与之相连的全部关系数"""
+        return np.diff(self.indptr) + self.other_degree
+
+    def pagerank(self, damping: float = PAGERANK_DAMPING, max_iterations: int = PAGERANK_MAX_ITERATIONS,
+                 tolerance: float = PAGERANK_TOLERANCE, weighted: bool = False) -> np.ndarray:
+        """
+        沿 RELATES_TO 方向计算 PageRank，分数定义与 GDS 一致（不做归一化，没有出边的实体不再分配分数）
+
+        Args:
+            damping: 阻尼系数
+            max_iterations: 最大迭代次数
+            tolerance: 所有分数的变化都小于该值时停止
+            weighted: 是否按关系权重分配分数
+
+        Returns:
+            每个实体的分数
+        """
+        n = self.num_nodes
+        weights = self.weights if weighted else np.ones(self.num_edges)
+        out_weights = np.bincount(self.sources, weights=weights, minlength=n)
+        share = weights / out_weights[self.sources] if self.num_edges else weights
+
+        scores = np.full(n, 1.0 - damping)
+        for _ in range(max_iterations):
+            incoming = np.bincount(self.targets, weights=scores[self.sources] * share, minlength=n)
+            new_scores = (1.0 - damping) + damping * incoming
+            delta = np.abs(new_scores - scores).max() if n else 0.0
+            scores = new_scores
+            if delta < tolerance:
+                break
+        return scores
+
+    def label_propagation(self, max_iterations: int = LABEL_PROPAGATION_MAX_ITERATIONS,
+                          weighted: bool = False) -> np.ndarray:
+        """
+        无向标签传播，所有实体同步更新
+
+        每个实体取邻居（含自身一票）中票数最多的标签，票数相同时取编号最小的标签，
+        自身一票避免同步更新时相邻实体互换标签而不收敛。
+
+        Args:
+            max_iterations: 最大迭代次数
+            weighted: 是否按关系权重计票
+
+        Returns:
+            每个实体的社区编号（社区中某个实体的编号）
+        """
+        n = self.num_nodes
+        labels = np.arange(n, dtype=np.int64)
+        if n == 0:
+            return labels
+
+        offsets = np.repeat(np.arange(n, dtype=np.int64), np.diff(self.indptr)) * n
+        offsets = np.concatenate((offsets, np.arange(n, dtype=np.int64) * n))
+        neighbors = np.concatenate((self.indices, np.arange(n)))
+        votes = None
+        if weighted:
+            # 按权重计票时自身一票取相连关系的最大权重，否则权重大的邻居之间同样会互换标签
+            self_votes = np.ones(n)
+            has_edges = np.diff(self.indptr) > 0
+            if has_edges.any():
+                self_votes[has_edges] = np.maximum.reduceat(self.edge_weights, self.indptr[:-1][has_edges])
+            votes = np.concatenate((self.edge_weights, self_votes))
+
+        for _ in range(max_iterations):
+            # 按 (实体, 标签) 排序后汇总票数，同一实体的标签按编号升序排列
+            keys = offsets + labels[neighbors]
+            if votes is None:
+                keys = np.sort(keys)
+            else:
+                order = np.argsort(keys)
+                keys = keys[order]
+            starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+            if votes is None:
+                totals = np.diff(np.r_[starts, len(keys)])
+            else:
+                totals = np.add.reduceat(votes[order], starts)
+            keys = keys[starts]
+            key_nodes = keys // n
+
+            # 每个实体取票数最多的标签中最靠前（编号最小）的一个
+            node_starts = np.flatnonzero(np.r_[True, key_nodes[1:] != key_nodes[:-1]])
+            best = np.maximum.reduceat(totals, node_starts)
+            candidates = np.flatnonzero(totals == np.repeat(best, np.diff(np.r_[node_starts, len(keys)])))
+            first = candidates[np.r_[True, key_nodes[candidates[1:]] != key_nodes[candidates[:-1]]]]
+            new_labels = keys[first] % n
+
+            if np.array_equal(new_labels, labels):
+                break
+            labels = new_labels
+        return labels
+
+    def connected_components(self) -> np.ndarray:
+        """
+        弱连通分量：把较大的根挂到较小的根下并压缩路径，直到每条关系两端的根相同
+
+        Returns:
+            每个实体所属分量的编号（分量中最小的实体编号）
+        """
+        parent = np.arange(self.num_nodes, dtype=np.int64)
+        sources = self.sources
+        targets = self.targets
+        while True:
+            source_roots = parent[sources]
+            target_roots = parent[targets]
+            low = np.minimum(source_roots, target_roots)
+            high = np.maximum(source_roots, target_roots)
+            merge = low != high
+            if not merge.any():
+                return parent
+            np.minimum.at(parent, high[merge], low[merge])
+
+            # 路径压缩，压缩后每个实体都直接指向根
+            while True:
+                grand = parent[parent]
+                if np.array_equal(grand, parent):
+                    break
+                parent = grand
+
+    def top_k(self, scores: np.ndarray, limit: int) -> np.ndarray:
+        """分数最高的 limit 个实体编号，分数相同时按编号排列"""
+        order = np.lexsort((np.arange(len(scores)), -scores))
+        return order[:limit]
+
+    def central_entities(self, limit: int = 10) -> List[Dict]:
+        """度数最高的实体，结果与 Cypher 查询的格式一致"""
+        degree = self.degree()
+        return [{'entity': self.names[i], 'degree': int(degree[i])} for i in self.top_k(degree, limit)]
+
+    def influential_entities(self, limit: int = 10, weighted: bool = False) -> List[Dict]:
+        """PageRank 分数最高的实体"""
+        scores = self.pagerank(weighted=weighted)
+        return [{'entity': self.names[i], 'score': float(scores[i])} for i in self.top_k(scores, limit)]
+
+    def communities(self, weighted: bool = False) -> List[Dict]:
+        """标签传播社区，按社区大小降序排列，结果与 Cypher 查询的格式一致"""
+        return [{'communityId': label, 'entities': entities}
+                for label, entities in self._group(self.label_propagation(weighted=weighted))]
+
+    def components(self) -> List[Dict]:
+        """连通分量，按分量大小降序排列"""
+        return [{'componentId': label, 'size': len(entities), 'entities': entities}
+                for label, entities in self._group(self.connected_components())]
+
+    def shortest_paths(self, entity1: str, entity2: str, k: int = 1, max_depth: int = PATH_MAX_DEPTH,
+                       relation_types: Optional[Iterable[str]] = None) -> List[Dict]:
+        """
+        两个实体之间按跳数从短到长的 k 条路径（不考虑关系方向，路径中没有重复实体）
+
+        Args:
+            entity1: 起点实体
+            entity2: 终点实体
+            k: 路径条数
+            max_depth: 最大跳数
+            relation_types: 只经过这些类型的关系，为空时不限制
+
+        Returns:
+            路径列表，格式与 Cypher 查询一致：path_nodes 为实体名，relationships 为关系类型
+        """
+        source = self._index.get(entity1)
+        target = self._index.get(entity2)
+        if source is None or target is None or source == target or k < 1 or max_depth < 1:
+            return []
+
+        allowed = None
+        if relation_types is not None:
+            allowed = {self._type_ids[t] for t in relation_types if t in self._type_ids}
+            if not allowed:
+                return []
+
+        names = self.names
+        relation_names = self.relation_types
+        edge_types = self._edge_type_list()
+        return [
+            {'path_nodes': [names[node] for node in nodes],
+             'relationships': [relation_names[edge_types[edge]] if edge_types else None for edge in edges]}
+            for nodes, edges in self._k_shortest_paths(source, target, k, max_depth, allowed)
+        ]
+
+    def _adjacency_lists(self) -> List[List[Tuple[int, int]]]:
+        """每个实体的 (邻居编号, 关系编号) 列表，逐个访问邻居时比 NumPy 数组快得多"""
+        if self._adjacency is None:
+            indptr = self.indptr.tolist()
+            indices = self.indices.tolist()
+            edge_ids = self.edge_ids.tolist()
+            self._adjacency = [list(zip(indices[start:end], edge_ids[start:end]))
+                               for start, end in zip(indptr, indptr[1:])]
+        return self._adjacency
+
+    def _edge_type_list(self) -> List[int]:
+        """每条关系的类型编号，没有类型信息时为空列表"""
+        if self._edge_types is None:
+            self._edge_types = self.types.tolist() if self.types is not None else []
+        return self._edge_types
+
+    def _k_shortest_paths(self, source: int, target: int, k: int, max_depth: int,
+                          allowed: Optional[Set[int]]) -> List[Tuple[List[int], List[int]]]:
+        """
+        Yen 算法：在已找到的路径上逐个选取分叉点，屏蔽已用过的关系后搜索新的最短路径
+
+        Returns:
+            (实体编号列表, 关系编号列表) 列表
+        """
+        first = self._bidirectional_bfs(source, target, max_depth, allowed, set(), set())
+        if first is None:
+            return []
+
+        paths = [first]
+        seen = {tuple(first[1])}
+        candidates = []
+        counter = count()
+        while len(paths) < k:
+            nodes, edges = paths[-1]
+            for i in range(len(edges)):
+                root_edges = edges[:i]
+                banned_edges = {path_edges[i] for _, path_edges in paths
+                                if len(path_edges) > i and path_edges[:i] == root_edges}
+                spur = self._bidirectional_bfs(nodes[i], target, max_depth - i, allowed,
+                                               set(nodes[:i]), banned_edges)
+                if spur is None:
+                    continue
+
+                path_edges = root_edges + spur[1]
+                key = tuple(path_edges)
+                if key not in seen:
+                    seen.add(key)
+                    heapq.heappush(candidates, (len(path_edges), next(counter), (nodes[:i] + spur[0], path_edges)))
+
+            if not candidates:
+                break
+            paths.append(heapq.heappop(candidates)[2])
+        return paths
+
+    def _bidirectional_bfs(self, source: int, target: int, max_depth: int, allowed: Optional[Set[int]],
+                           banned_nodes: Set[int], banned_edges: Set[int]) -> Optional[Tuple[List[int], List[int]]]:
+        """
+        双向广度优先搜索一条最短路径，每次扩展较小的一侧的一整层
+
+        两侧的访问记录第一次相遇时即为最短路径：相遇点在另一侧一定位于最外层，同一层中的相遇长度都相同。
+
+        Returns:
+            (实体编号列表, 关系编号列表)，max_depth 跳内不可达时为 None
+        """
+        adjacency = self._adjacency_lists()
+        edge_types = self._edge_type_list()
+
+        # 实体编号 -> (上一个实体编号, 关系编号)
+        forward = {source: None}
+        backward = {target: None}
+        forward_frontier = [source]
+        backward_frontier = [target]
+
+        for _ in range(max_depth):
+            if not forward_frontier or not backward_frontier:
+                return None
+
+            expand_forward = len(forward_frontier) <= len(backward_frontier)
+            if expand_forward:
+                frontier, parents, others = forward_frontier, forward, backward
+            else:
+                frontier, parents, others = backward_frontier, backward, forward
+
+            next_frontier = []
+            for node in frontier:
+                for neighbor, edge in adjacency[node]:
+                    if neighbor in parents or neighbor in banned_nodes or edge in banned_edges:
+                        continue
+                    if allowed is not None and edge_types[edge] not in allowed:
+                        continue
+                    parents[neighbor] = (node, edge)
+                    if neighbor in others:
+                        return _join_paths(forward, backward, neighbor)
+                    next_frontier.append(neighbor)
+
+            if expand_forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+        return None
+
+    def _group(self, labels: np.ndarray) -> List:
+        """按编号分组实体名，组内按实体编号排列，组按大小降序排列"""
+        if len(labels) == 0:
+            return []
+        order = np.argsort(labels, kind='stable')
+        sorted_labels = labels[order]
+        starts = np.flatnonzero(np.r_[True, sorted_labels[1:] != sorted_labels[:-1]])
+        ends = np.r_[starts[1:], len(order)]
+        groups = sorted(zip(starts, ends), key=lambda group: (group[0] - group[1], sorted_labels[group[0]]))
+        names = self.names
+        return [(int(sorted_labels[start]), [names[i] for i in order[start:end]]) for start, end in groups]
+
+
+def _to_csr(n: int, rows: np.ndarray, cols: np.ndarray, edge_ids: np.ndarray):
+    """边列表按行排序，转成 (indptr, indices, edge_ids)"""
+    order = np.argsort(rows, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=indptr[1:])
+    return indptr, cols[order].astype(np.int32), edge_ids[order]
+
+
+def _join_paths(forward: Dict, backward: Dict, meet: int) -> Tuple[List[int], List[int]]:
+    """从相遇点分别沿两侧的访问记录回溯，拼出完整路径"""
+    nodes = [meet]
+    edges = []
+    node = meet
+    while forward[node] is not None:
+        node, edge = forward[node]
+        nodes.append(node)
+        edges.append(edge)
+    nodes.reverse()
+    edges.reverse()
+
+    node = meet
+    while backward[node] is not None:
+        node, edge = backward[node]
+        nodes.append(node)
+        edges.append(edge)
+    return nodes, edges
+
+
+def _degree_reference(n: int, edges: List, other_degree: List[int]) -> List[int]:
+    """逐条关系计数，对应 Cypher 的 OPTIONAL MATCH (e)-[r]-() 计数"""
+    degree = list(other_degree)
+    for source, target in edges:
+        degree[source] += 1
+        if source != target:
+            degree[target] += 1
+    return degree
+
+
+def _pagerank_reference(n: int, edges: List, damping: float = PAGERANK_DAMPING,
+                        max_iterations: int = PAGERANK_MAX_ITERATIONS,
+                        tolerance: float = PAGERANK_TOLERANCE) -> List[float]:
+    """逐条关系迭代的 PageRank"""
+    out_degree = Counter(source for source, _ in edges)
+    scores = [1.0 - damping] * n
+    for _ in range(max_iterations):
+        incoming = [0.0] * n
+        for source, target in edges:
+            incoming[target] += scores[source] / out_degree[source]
+        new_scores = [(1.0 - damping) + damping * value for value in incoming]
+        delta = max(abs(a - b) for a, b in zip(new_scores, scores))
+        scores = new_scores
+        if delta < tolerance:
+            break
+    return scores
+
+
+def _label_propagation_reference(n: int, edges: List,
+                                 max_iterations: int = LABEL_PROPAGATION_MAX_ITERATIONS) -> List[int]:
+    """逐个实体计票的同步标签传播"""
+    adjacency = [[i] for i in range(n)]
+    for source, target in edges:
+        adjacency[source].append(target)
+        if source != target:
+            adjacency[target].append(source)
+
+    labels = list(range(n))
+    for _ in range(max_iterations):
+        new_labels = []
+        for neighbors in adjacency:
+            votes = Counter(labels[i] for i in neighbors)
+            new_labels.append(min(votes, key=lambda label: (-votes[label], label)))
+        if new_labels == labels:
+            break
+        labels = new_labels
+    return labels
+
+
+def _components_reference(n: int, edges: List) -> List[int]:
+    """并查集求连通分量，以分量中最小的实体编号为分量编号"""
+    parent = list(range(n))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for source, target in edges:
+        a, b = find(source), find(target)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+    return [find(i) for i in range(n)]
+
+
+def benchmark(num_nodes: int = 20000, num_edges: int = 100000, num_clusters: int = 200, seed: int = 42) -> Dict:
+    """
+    在随机生成的聚类图上对比向量化实现与逐条关系计算的参考实现，校验结果一致并计时
+
+    Args:
+        num_nodes: 实体数量
+        num_edges: 关系数量
+        num_clusters: 聚类数量（大部分关系落在聚类内部）
+        seed: 随机种子
+
+    Returns:
+        各算法的耗时
+    """
+    rng = random.Random(seed)
+    cluster_size = max(1, num_nodes // num_clusters)
+    edges = []
+    for _ in range(num_edges):
+        source = rng.randrange(num_nodes)
+        if rng.random() < 0.9:
+            base = source - source % cluster_size
+            target = min(num_nodes - 1, base + rng.randrange(cluster_size))
+        else:
+            target = rng.randrange(num_nodes)
+        edges.append((source, target))
+    other_degree = [rng.randrange(3) for _ in range(num_nodes)]
+    names = [f"实体{i}" for i in range(num_nodes)]
+
+    timings = {}
+
+    def timed(name, func, *args):
+        start = time.perf_counter()
+        value = func(*args)
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+        return value
+
+    sources, targets = zip(*edges)
+    engine = timed('build_ms', GraphEngine, names, sources, targets, None, other_degree)
+    degree = timed('degree_ms', engine.degree)
+    pagerank = timed('pagerank_ms', engine.pagerank)
+    labels = timed('label_propagation_ms', engine.label_propagation)
+    components = timed('components_ms', engine.connected_components)
+    timed('path_index_ms', engine._adjacency_lists)
+    # 起点和终点取自同一聚类，大多在几跳之内可达
+    pairs = []
+    for _ in range(200):
+        source = rng.randrange(num_nodes)
+        target = min(num_nodes - 1, source - source % cluster_size + rng.randrange(cluster_size))
+        pairs.append((names[source], names[target]))
+    start = time.perf_counter()
+    for entity1, entity2 in pairs:
+        engine.shortest_paths(entity1, entity2, k=3)
+    timings['shortest_paths_per_query_ms'] = round((time.perf_counter() - start) * 1000 / len(pairs), 3)
+
+    if degree.tolist() != timed('degree_reference_ms', _degree_reference, num_nodes, edges, other_degree):
+        raise AssertionError("度数与参考实现不一致")
+    if not np.allclose(pagerank, timed('pagerank_reference_ms', _pagerank_reference, num_nodes, edges)):
+        raise AssertionError("PageRank 与参考实现不一致")
+    if labels.tolist() != timed('label_propagation_reference_ms', _label_propagation_reference, num_nodes, edges):
+        raise AssertionError("标签传播与参考实现不一致")
+    if components.tolist() != timed('components_reference_ms', _components_reference, num_nodes, edges):
+        raise AssertionError("连通分量与参考实现不一致")
+
+    result = {
+        'nodes': num_nodes,
+        'edges': num_edges,
+        'communities': len(set(labels.tolist())),
+        'components': len(set(components.tolist())),
+        **timings
+    }
+    print(f"基准测试: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    benchmark()
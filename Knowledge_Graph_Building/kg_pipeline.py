@@ -0,0 +1,177 @@
+import os
+import sys
+import queue
+import signal
+import asyncio
+import threading
+from typing import List, Dict, Iterator, Callable
+
+import data_crawler
+from md_kg_builder import MDKnowledgeGraphBuilder, STREAM_FLUSH_DOCS, BULK_BATCH_SIZE
+
+
+# 爬虫与写库线程之间最多排队的页面数，队列满时爬虫暂停下载和转换
+PIPELINE_QUEUE_SIZE = 64
+
+# 每批一起抽取（一起送入 nlp.pipe）的最大页面数
+PIPELINE_CHUNK_SIZE = 16
+
+# 爬虫缓存中记录已入库页面时用的下游名称，不同的图数据库应使用不同的名称
+PIPELINE_SINK = 'neo4j'
+
+# 队列结束标记
+_DONE = object()
+
+
+def crawl_into_graph(builder: MDKnowledgeGraphBuilder, sites: List['data_crawler.CrawlSite'],
+                     queue_size: int = PIPELINE_QUEUE_SIZE, chunksize: int = PIPELINE_CHUNK_SIZE,
+                     flush_docs: int = STREAM_FLUSH_DOCS, batch_size: int = BULK_BATCH_SIZE,
+                     keep_cache: bool = True, write_files: bool = False, sink: str = PIPELINE_SINK,
+                     **crawl_options) -> Dict:
+    """
+    爬虫直接向知识图谱构建器供稿：转换好的页面经有界队列交给写库线程，
+    抽取实体和关系后按批写入Neo4j，不再先写出Markdown文件、再遍历目录重新读取解析
+
+    队列满时爬虫的工作协程会阻塞在入队上，下载和转换随之暂停，写库跟不上时整条流水线自动减速。
+    页面写入Neo4j后才按 sink 记入爬虫的缓存和检查点，中断后重新运行不会漏掉已下载但未入库的页面；
+    之前只用 data_crawler 下载过的页面即使得到 304，也会从缓存的内容重新转换并入库。
+
+    Args:
+        builder: 知识图谱构建器
+        sites: 要爬取的站点
+        queue_size: 队列中最多排队的页面数
+        chunksize: 每批一起抽取的最大页面数
+        flush_docs: 每次写库的文档数
+        batch_size: 每个事务的行数
+        keep_cache: 是否把实体和关系合并到构建器的缓存
+        write_files: 是否同时写出Markdown和目录文件
+        sink: 在爬虫缓存中记录已入库页面时用的下游名称
+        **crawl_options: 传给 data_crawler.crawl_sites 的其他参数
+
+    Returns:
+        各站点失败的链接及写库统计
+    """
+    pages = queue.Queue(maxsize=queue_size)
+    # 写库线程取到结束标记后设置，之后出错时不必再等结束标记
+    drained = threading.Event()
+    errors = []
+    stats = {}
+
+    # 文档路径 -> 写库后要调用的确认函数，只在写库线程中访问
+    pending = {}
+
+    def commit_batch(batch: List[Dict]):
+        for result in batch:
+            for commit in pending.pop(result['doc_info']['file_path'], []):
+                commit()
+
+    def consume():
+        try:
+            results = _iter_page_results(builder, pages, chunksize, pending, drained)
+            stats.update(builder.write_stream(results, flush_docs, batch_size, keep_cache, on_flush=commit_batch))
+        except BaseException as e:
+            errors.append(e)
+            # 继续取走页面直到结束标记，爬虫不会阻塞在入队上；
+            # 最后一次写库或最后一批抽取出错时结束标记已经取走，不能再等
+            if not drained.is_set():
+                while pages.get() is not _DONE:
+                    pass
+
+    async def on_page(site, link_url: str, page: Dict, content: str, commit: Callable[[], None]):
+        if errors:
+            raise RuntimeError("写库线程已出错，不再提交页面") from errors[0]
+        md_file_path = os.path.abspath(site.downdir + page['file_name'])
+        await asyncio.get_running_loop().run_in_executor(None, pages.put, (content, md_file_path, commit))
+
+    consumer = threading.Thread(target=consume, name='kg-writer', daemon=True)
+    consumer.start()
+    try:
+        failed = asyncio.run(data_crawler.crawl_sites(sites, on_page=on_page, write_files=write_files, sink=sink,
+                                                      **crawl_options))
+    finally:
+        pages.put(_DONE)
+        consumer.join()
+
+    if errors:
+        raise errors[0]
+
+    return {'failed': failed, **stats}
+
+
+def _iter_page_results(builder: MDKnowledgeGraphBuilder, pages: queue.Queue, chunksize: int,
+                       pending: Dict, drained: threading.Event) -> Iterator[Dict]:
+    """
+    从队列中取出页面批量抽取，按入队顺序给出抽取结果；不等凑满一批，只取队列中已有的页面
+
+    取到结束标记时设置 drained
+    """
+    while True:
+        item = pages.get()
+        if item is _DONE:
+            drained.set()
+            return
+
+        chunk = [item]
+        done = False
+        while len(chunk) < chunksize:
+            try:
+                item = pages.get_nowait()
+            except queue.Empty:
+                break
+            if item is _DONE:
+                drained.set()
+                done = True
+                break
+            chunk.append(item)
+
+        for _, md_file_path, commit in chunk:
+            pending.setdefault(md_file_path, []).append(commit)
+
+        results = builder.extract_texts([(content, md_file_path) for content, md_file_path, _ in chunk])
+        for (_, md_file_path, _), result in zip(chunk, results):
+            if result:
+                yield result
+            else:
+                # 解析失败的页面不确认，下次运行时重新处理
+                pending.pop(md_file_path, None)
+
+        if done:
+            return
+
+
+def parse_args(argv=None):
+    parser = data_crawler.build_parser()
+    parser.description = "爬取教程网站并直接写入知识图谱"
+    parser.add_argument('--write-markdown', action='store_true', help="同时写出Markdown和目录文件")
+    parser.add_argument('--queue-size', type=int, default=PIPELINE_QUEUE_SIZE, help="爬虫与写库之间最多排队的页面数")
+    parser.add_argument('--flush-docs', type=int, default=STREAM_FLUSH_DOCS, help="每次写库的文档数")
+    parser.add_argument('--neo4j-uri', default="bolt://localhost:7687", help="Neo4j地址")
+    parser.add_argument('--neo4j-user', default="neo4j", help="用户名")
+    parser.add_argument('--neo4j-password', default="password", help="密码")
+    args = data_crawler.parse_args(argv, parser)
+    if args.sync:
+        parser.error("流水线模式不支持 --sync")
+    return args
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    sites, options = data_crawler.resolve_options(args)
+
+    kg_builder = MDKnowledgeGraphBuilder(args.neo4j_uri, args.neo4j_user, args.neo4j_password)
+    try:
+        result = crawl_into_graph(kg_builder, data_crawler.make_sites(sites, options),
+                                  queue_size=args.queue_size, flush_docs=args.flush_docs,
+                                  write_files=args.write_markdown, sink=f'{PIPELINE_SINK}:{args.neo4j_uri}',
+                                  **data_crawler.crawl_options(options))
+        print(f"提取到 {kg_builder.kg_store.num_entities} 个实体")
+        print(f"提取到 {kg_builder.kg_store.num_relationships} 个关系")
+    finally:
+        kg_builder.close()
+
+    return 1 if any(result['failed'].values()) else 0
+
+
+if __name__ == "__main__":
+    signal.signal(signal.SIGINT, data_crawler.exit_ctrl_c)
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import sys
+import time
+import random
+import tracemalloc
+from array import array
+from typing import Callable, List, Dict, Tuple, Iterable, Iterator, KeysView, Optional
+
+from entity_matcher import RELATION_KEYWORDS
+
+
+# 关系类型编号用一个字节存放
+MAX_RELATION_TYPES = 256
+
+
+class KnowledgeGraphStore:
+    """
+    紧凑的实体、关系存储
+
+    实体名驻留为整数编号，关系类型是一张很小的编号表；
+    关系三元组去重后按列存放在 array 中，并记录出现次数作为边权重。
+    去重用的字典以三元组本身为键（其中的字符串都是驻留的那一份），重复出现的关系只需查一次字典。
+    """
+
+    def __init__(self, relation_types: Iterable[str] = RELATION_KEYWORDS):
+        """
+        初始化存储
+
+        Args:
+            relation_types: 预先编号的关系类型（默认使用关系关键词表），其他类型出现时再追加
+        """
+        # 实体编号 -> 实体名，以及反向索引（按首次出现的顺序编号）
+        self.entities: List[str] = []
+        self._entity_ids: Dict[str, int] = {}
+
+        # 关系类型编号表
+        self.relation_types: List[str] = []
+        self._relation_ids: Dict[str, int] = {}
+        for relation_type in relation_types:
+            self.relation_type_id(relation_type)
+
+        # 去重后的关系三元组，按列存放：源实体、关系类型、目标实体、出现次数
+        self._sources = array('I')
+        self._types = array('B')
+        self._targets = array('I')
+        self._counts = array('I')
+
+        # (实体1, 关系类型, 实体2) -> 行号
+        self._rows: Dict[Tuple[str, str, str], int] = {}
+
+    def entity_id(self, name: str) -> int:
+        """
+        取实体编号，不存在时新建
+
+        Args:
+            name: 实体名
+
+        Returns:
+            实体编号
+        """
+        entity_id = self._entity_ids.get(name)
+        if entity_id is None:
+            entity_id = len(self.entities)
+            name = sys.intern(name)
+            self.entities.append(name)
+            self._entity_ids[name] = entity_id
+        return entity_id
+
+    def get_entity_id(self, name: str) -> Optional[int]:
+        """取实体编号，不存在时返回 None"""
+        return self._entity_ids.get(name)
+
+    def relation_type_id(self, relation_type: str) -> int:
+        """
+        取关系类型编号，不存在时追加
+
+        Args:
+            relation_type: 关系类型
+
+        Returns:
+            关系类型编号
+        """
+        type_id = self._relation_ids.get(relation_type)
+        if type_id is None:
+            type_id = len(self.relation_types)
+            if type_id >= MAX_RELATION_TYPES:
+                raise ValueError(f"关系类型超过 {MAX_RELATION_TYPES} 种: {relation_type}")
+            self.relation_types.append(relation_type)
+            self._relation_ids[relation_type] = type_id
+        return type_id
+
+    def add_entities(self, names: Iterable[str]):
+        """
+        添加实体
+
+        Args:
+            names: 实体名
+        """
+        for name in names:
+            self.entity_id(name)
+
+    def add_relationship(self, entity1: str, relation_type: str, entity2: str, count: int = 1) -> int:
+        """
+        添加一条关系，已存在时只累加出现次数
+
+        Args:
+            entity1: 源实体
+            relation_type: 关系类型
+            entity2: 目标实体
+            count: 出现次数
+
+        Returns:
+            关系所在的行号
+        """
+        row = self._rows.get((entity1, relation_type, entity2))
+        if row is None:
+            source = self.entity_id(entity1)
+            type_id = self.relation_type_id(relation_type)
+            target = self.entity_id(entity2)
+            row = len(self._counts)
+            self._rows[self.entities[source], self.relation_types[type_id], self.entities[target]] = row
+            self._sources.append(source)
+            self._types.append(type_id)
+            self._targets.append(target)
+            self._counts.append(count)
+        else:
+            self._counts[row] += count
+        return row
+
+    def add_relationships(self, relationships: Iterable[Tuple[str, str, str]]):
+        """
+        添加关系
+
+        Args:
+            relationships: (实体1, 关系类型, 实体2) 关系，须为元组
+        """
+        # 大部分关系是重复出现的，命中时只累加次数，不经过 add_relationship
+        rows = self._rows
+        counts = self._counts
+        for relationship in relationships:
+            row = rows.get(relationship)
+            if row is None:
+                self.add_relationship(*relationship)
+            else:
+                counts[row] += 1
+
+    def weight(self, entity1: str, relation_type: str, entity2: str) -> int:
+        """
+        关系的出现次数（边权重），不存在时为0
+
+        Args:
+            entity1: 源实体
+            relation_type: 关系类型
+            entity2: 目标实体
+
+        Returns:
+            出现次数
+        """
+        row = self._rows.get((entity1, relation_type, entity2))
+        return 0 if row is None else self._counts[row]
+
+    def iter_relationships(self) -> Iterator[Tuple[str, str, str]]:
+        """按首次出现的顺序给出去重后的关系三元组"""
+        return iter(self._rows)
+
+    def entity_names(self) -> KeysView[str]:
+        """所有实体名的只读集合视图（按首次出现的顺序），随存储更新，成员判断为 O(1)"""
+        return self._entity_ids.keys()
+
+    def relationship_set(self) -> KeysView[Tuple[str, str, str]]:
+        """去重后关系三元组的只读集合视图（按首次出现的顺序），随存储更新，成员判断为 O(1)"""
+        return self._rows.keys()
+
+    def iter_weighted_relationships(self) -> Iterator[Tuple[str, str, str, int]]:
+        """按首次出现的顺序给出 (实体1, 关系类型, 实体2, 出现次数)"""
+        for (entity1, relation_type, entity2), count in zip(self.iter_relationships(), self._counts):
+            yield entity1, relation_type, entity2, count
+
+    def iter_edges(self) -> Iterator[Tuple[int, int, int, int]]:
+        """按首次出现的顺序给出 (源实体编号, 关系类型编号, 目标实体编号, 出现次数)"""
+        return zip(self._sources, self._types, self._targets, self._counts)
+
+    @property
+    def num_entities(self) -> int:
+        return len(self.entities)
+
+    @property
+    def num_relationships(self) -> int:
+        """去重后的关系数"""
+        return len(self._counts)
+
+    @property
+    def num_occurrences(self) -> int:
+        """关系的总出现次数（去重前的关系数）"""
+        return sum(self._counts)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._entity_ids
+
+    def memory_bytes(self) -> int:
+        """估算存储本身占用的字节数（含实体名字符串）"""
+        size = sys.getsizeof(self.entities) + sys.getsizeof(self._entity_ids) + sys.getsizeof(self._rows)
+        size += sum(sys.getsizeof(name) for name in self.entities)
+        # 行号字典里的键是每种关系一个的元组，其中的字符串已计入实体名
+        size += sum(sys.getsizeof(key) for key in self._rows)
+        for column in (self._sources, self._types, self._targets, self._counts):
+            size += sys.getsizeof(column)
+        return size
+
+
+def _best_of(func: Callable, repeat: int = 3) -> float:
+    """多次运行取最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(num_entities: int = 5000, num_docs: int = 5000, rels_per_doc: int = 200,
+              num_distinct: int = 20000, seed: int = 42) -> Dict:
+    """
+    模拟大量文档重复抽取出相同关系的情况，对比 set + 元组列表与紧凑存储的内存占用和构建耗时
+
+    Args:
+        num_entities: 实体数量
+        num_docs: 文档数量
+        rels_per_doc: 每个文档抽取出的关系数
+        num_distinct: 语料中不同关系三元组的数量
+        seed: 随机种子
+
+    Returns:
+        两种方式的内存占用、要 MERGE 的关系行数及耗时
+    """
+    rng = random.Random(seed)
+    # 实体名逐个拼接生成，模拟从不同文档中解析出的、内容相同但对象不同的字符串
+    entities = [f"实体{i}" for i in range(num_entities)]
+    distinct = [
+        (rng.randrange(num_entities), rng.choice(RELATION_KEYWORDS), rng.randrange(num_entities))
+        for _ in range(num_distinct)
+    ]
+    docs = [
+        [distinct[rng.randrange(num_distinct)] for _ in range(rels_per_doc)]
+        for _ in range(num_docs)
+    ]
+
+    def extracted():
+        for doc in docs:
+            yield [(''.join(('实体', entities[s][2:])), t, ''.join(('实体', entities[e][2:]))) for s, t, e in doc]
+
+    def build_legacy():
+        entities_cache = set()
+        relationships_cache = []
+        for relationships in extracted():
+            for entity1, _, entity2 in relationships:
+                entities_cache.add(entity1)
+                entities_cache.add(entity2)
+            relationships_cache.extend(relationships)
+        return entities_cache, relationships_cache
+
+    def build_store():
+        store = KnowledgeGraphStore()
+        for relationships in extracted():
+            store.add_relationships(relationships)
+        return store
+
+    # 耗时和内存分开测：tracemalloc 会拖慢分配对象多的一方，计时不开启它
+    legacy_seconds = _best_of(build_legacy)
+    store_seconds = _best_of(build_store)
+
+    tracemalloc.start()
+    entities_cache, relationships_cache = build_legacy()
+    legacy_bytes = tracemalloc.get_traced_memory()[0]
+    legacy_rows = len(relationships_cache)
+    del entities_cache, relationships_cache
+    tracemalloc.stop()
+
+    tracemalloc.start()
+    store = build_store()
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    if store.num_occurrences != legacy_rows:
+        raise AssertionError("紧凑存储的关系总出现次数与原实现不一致")
+
+    result = {
+        'occurrences': legacy_rows,
+        'legacy_merge_rows': legacy_rows,
+        'store_merge_rows': store.num_relationships,
+        'legacy_mb': round(legacy_bytes / (1 << 20), 1),
+        'store_mb': round(store_bytes / (1 << 20), 1),
+        'memory_ratio': round(legacy_bytes / store_bytes, 1) if store_bytes else None,
+        'legacy_seconds': round(legacy_seconds, 3),
+        'store_seconds': round(store_seconds, 3),
+        'top_weighted': sorted(store.iter_weighted_relationships(), key=lambda rel: -rel[3])[:3]
+    }
+    print(f"基准测试: {result}")
+    return result
+
+
+if __name__ == "__main__":
+    benchmark()
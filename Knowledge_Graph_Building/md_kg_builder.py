@@ -1,14 +1,52 @@
 import os
 import re
+import hashlib
+import time
 import frontmatter
 from neo4j import GraphDatabase
 import spacy
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Iterable, Iterator, Callable, KeysView
 import json
+import heapq
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, islice
+
+from entity_matcher import extract_cooccurrence_relationships
+from markdown_cleaner import clean_markdown
+from kg_store import KnowledgeGraphStore
+from graph_engine import BUMP_GRAPH_VERSION_QUERY
+
+
+# 批量写入时每个事务提交的行数
+BULK_BATCH_SIZE = 1000
+
+# nlp.pipe 每批处理的文档数
+NLP_BATCH_SIZE = 64
+
+# nlp.pipe 使用多进程的最少文本数；每个进程都要重新加载模型，文本少时开进程池比单进程处理还慢
+NLP_MULTIPROCESS_MIN_TEXTS = 4 * NLP_BATCH_SIZE
+
+# 实体抽取只用到命名实体和名词短语（依存句法），其余组件在 nlp.pipe 中禁用
+NLP_KEEP_COMPONENTS = ('tok2vec', 'transformer', 'tagger', 'morphologizer', 'attribute_ruler', 'parser', 'ner')
+
+# 增量构建清单
+MANIFEST_FILE = ".kg_manifest.json"
+MANIFEST_VERSION = 1
+
+# 流式构建时每次写库的文档数
+STREAM_FLUSH_DOCS = 200
+
+# pyvis 可视化最多渲染的实体数
+VISUALIZE_MAX_NODES = 500
+
+# 导出给前端分块加载时每块的实体数
+GRAPH_CHUNK_SIZE = 1000
 
 
 class MDKnowledgeGraphBuilder:
-    def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str):
+    def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str,
+                 nlp_batch_size: int = NLP_BATCH_SIZE, nlp_n_process: int = 1):
         """
         初始化知识图谱构建器
 
@@ -16,8 +54,16 @@ class MDKnowledgeGraphBuilder:
             neo4j_uri: Neo4j数据库地址，如 "bolt://localhost:7687"
             neo4j_user: 用户名
             neo4j_password: 密码
+            nlp_batch_size: nlp.pipe 每批处理的文档数
+            nlp_n_process: nlp.pipe 最多使用的进程数，文本少于 NLP_MULTIPROCESS_MIN_TEXTS 时只用单进程
         """
         self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+        self._init_extractor(nlp_batch_size, nlp_n_process)
+
+    def _init_extractor(self, nlp_batch_size: int = NLP_BATCH_SIZE, nlp_n_process: int = 1):
+        """加载spacy模型并初始化实体、关系缓存"""
+        self.nlp_batch_size = nlp_batch_size
+        self.nlp_n_process = nlp_n_process
 
         # 加载spacy模型（用于实体识别）
         try:
@@ -29,9 +75,34 @@ class MDKnowledgeGraphBuilder:
                 self.nlp = None
                 print("未找到spacy模型，将使用基于规则的方法")
 
-        # 实体和关系缓存
-        self.entities_cache = set()
-        self.relationships_cache = []
+        # 实体和关系缓存（实体名驻留为编号，关系去重并记录出现次数）
+        self.kg_store = KnowledgeGraphStore()
+
+    @property
+    def entities_cache(self) -> KeysView[str]:
+        """所有实体名的只读集合视图（按首次出现的顺序），兼容原先的实体缓存，成员判断为 O(1)"""
+        return self.kg_store.entity_names()
+
+    @property
+    def relationships_cache(self) -> KeysView[Tuple[str, str, str]]:
+        """去重后的 (实体1, 关系类型, 实体2) 关系的只读集合视图，兼容原先的关系缓存，成员判断为 O(1)"""
+        return self.kg_store.relationship_set()
+
+    @classmethod
+    def create_extractor(cls, nlp_batch_size: int = NLP_BATCH_SIZE):
+        """
+        创建只做内容抽取、不连接数据库的实例（供多进程工作进程使用）
+
+        Args:
+            nlp_batch_size: nlp.pipe 每批处理的文档数
+
+        Returns:
+            未连接Neo4j的构建器实例
+        """
+        builder = cls.__new__(cls)
+        builder.driver = None
+        builder._init_extractor(nlp_batch_size)
+        return builder
 
     def extract_markdown_content(self, md_file_path: str) -> Dict:
         """
@@ -47,65 +118,53 @@ class MDKnowledgeGraphBuilder:
             with open(md_file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
 
-            # 解析frontmatter
-            post = frontmatter.loads(content)
-
-            # 获取文件名和路径
-            file_name = os.path.basename(md_file_path)
-            file_path = os.path.abspath(md_file_path)
-
-            # 提取纯文本内容（去除markdown标记）
-            text_content = self._clean_markdown(post.content)
-
-            return {
-                'file_name': file_name,
-                'file_path': file_path,
-                'frontmatter': post.metadata,
-                'content': text_content,
-                'full_content': content,
-                'title': post.metadata.get('title', file_name.replace('.md', '')),
-                'tags': post.metadata.get('tags', []),
-                'categories': post.metadata.get('categories', []),
-                'created_date': post.metadata.get('date', post.metadata.get('created', ''))
-            }
+            return self.parse_markdown(content, md_file_path)
         except Exception as e:
             print(f"解析文件 {md_file_path} 时出错: {e}")
 
-    def _clean_markdown(self, text: str) -> str:
+    def parse_markdown(self, content: str, md_file_path: str) -> Dict:
         """
-        清理Markdown格式，提取纯文本
+        解析Markdown文本，包括frontmatter和正文（文本不必来自磁盘上的文件）
 
         Args:
-            text: Markdown文本
+            content: Markdown文本
+            md_file_path: 文档对应的文件路径，作为文档的唯一标识
 
         Returns:
-            清理后的纯文本
+            包含文件信息的字典
         """
-        # 移除代码块
-        text = re.sub(r'```[\s\S]*?```', '', text)
-        text = re.sub(r'`.*?`', '', text)
-
-        # 移除图片和链接
-        text = re.sub(r'!\[.*?\]\(.*?\)', '', text)
-        text = re.sub(r'\[.*?\]\(.*?\)', '', text)
+        # 解析frontmatter
+        post = frontmatter.loads(content)
 
-        # 移除标题标记
-        text = re.sub(r'#{1,6}\s*', '', text)
+        # 获取文件名和路径
+        file_name = os.path.basename(md_file_path)
+        file_path = os.path.abspath(md_file_path)
 
-        # 移除列表标记
-        text = re.sub(r'^[\s]*[-*+]\s+', '', text, flags=re.MULTILINE)
+        # 提取纯文本内容（去除markdown标记）
+        text_content = self._clean_markdown(post.content)
 
-        # 移除引用
-        text = re.sub(r'^>\s+', '', text, flags=re.MULTILINE)
+        return {
+            'file_name': file_name,
+            'file_path': file_path,
+            'frontmatter': post.metadata,
+            'content': text_content,
+            'title': post.metadata.get('title', file_name.replace('.md', '')),
+            'tags': post.metadata.get('tags', []),
+            'categories': post.metadata.get('categories', []),
+            'created_date': post.metadata.get('date', post.metadata.get('created', ''))
+        }
 
-        # 移除表格标记
-        text = re.sub(r'\|.*?\|', '', text)
+    def _clean_markdown(self, text: str) -> str:
+        """
+        清理Markdown格式，提取纯文本
 
-        # 移除多余的空格和换行
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        text = re.sub(r'\s{2,}', ' ', text)
+        Args:
+            text: Markdown文本
 
-        return text.strip()
+        Returns:
+            清理后的纯文本
+        """
+        return clean_markdown(text)
 
     def extract_entities_rule_based(self, text: str) -> List[str]:
         """
@@ -131,8 +190,8 @@ class MDKnowledgeGraphBuilder:
         colon_entities = re.findall(r'^(.*?):', text, re.MULTILINE)
         entities.extend([e.strip() for e in colon_entities])
 
-        # 去重和清理
-        entities = list(set([e.strip() for e in entities if len(e.strip()) > 1]))
+        # 去重和清理（保留首次出现的顺序，保证结果可复现）
+        entities = list(dict.fromkeys(e.strip() for e in entities if len(e.strip()) > 1))
 
         return entities
 
@@ -146,10 +205,58 @@ class MDKnowledgeGraphBuilder:
         Returns:
             实体列表
         """
+        return self.extract_entities_batch([text])[0]
+
+    def extract_entities_batch(self, texts: List[str]) -> List[List[str]]:
+        """
+        使用 nlp.pipe 批量提取实体，只运行命名实体识别和名词短语所需的组件
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            与 texts 一一对应的实体列表
+        """
         if not self.nlp:
-            return self.extract_entities_rule_based(text)
+            return [self.extract_entities_rule_based(text) for text in texts]
+
+        disabled = [name for name in self.nlp.pipe_names if name not in NLP_KEEP_COMPONENTS]
+        docs = self.nlp.pipe(texts,
+                             batch_size=self.nlp_batch_size,
+                             n_process=self._pipe_n_process(len(texts)),
+                             disable=disabled)
+
+        return [self._entities_from_doc(doc) for doc in docs]
+
+    def _pipe_n_process(self, num_texts: int) -> int:
+        """
+        nlp.pipe 处理 num_texts 个文本时使用的进程数
+
+        单个文本和小批量（如单个文档、含日期的句子）不开进程池；
+        批量足够大时也不超过完整批次的数量，避免进程只加载模型而分不到文本。
+
+        Args:
+            num_texts: 文本数
+
+        Returns:
+            进程数
+        """
+        n_process = (os.cpu_count() or 1) if self.nlp_n_process == -1 else self.nlp_n_process
+        if n_process <= 1 or num_texts < NLP_MULTIPROCESS_MIN_TEXTS:
+            return 1
+        return max(1, min(n_process, num_texts // self.nlp_batch_size))
+
+    @staticmethod
+    def _entities_from_doc(doc) -> List[str]:
+        """
+        从spacy文档中取出命名实体和名词短语
 
-        doc = self.nlp(text)
+        Args:
+            doc: spacy Doc 对象
+
+        Returns:
+            实体列表
+        """
         entities = []
 
         # 提取命名实体
@@ -162,12 +269,12 @@ class MDKnowledgeGraphBuilder:
             if len(chunk.text) > 2 and chunk.text.lower() not in ['this', 'that', 'these', 'those']:
                 entities.append(chunk.text)
 
-        # 去重
-        return list(set(entities))
+        # 去重（保留首次出现的顺序）
+        return list(dict.fromkeys(entities))
 
     def extract_relationships(self, text: str, entities: List[str]) -> List[Tuple]:
         """
-        提取实体间的关系
+        提取实体间的关系（基于 Aho-Corasick 自动机一次扫描，见 entity_matcher）
 
         Args:
             text: 文本内容
@@ -176,82 +283,113 @@ class MDKnowledgeGraphBuilder:
         Returns:
             关系列表，每个关系为 (实体1, 关系类型, 实体2)
         """
-        relationships = []
+        return extract_cooccurrence_relationships(text, entities)
 
-        # 常见关系关键词
-        relation_keywords = [
-            '是', '属于', '包含', '包括', '有', '需要', '使用', '基于',
-            '的', '和', '与', '或', '及', '等',
-            'is', 'has', 'contains', 'includes', 'uses', 'based on',
-            'of', 'and', 'or', 'with', 'in'
-        ]
+    def process_markdown_file(self, md_file_path: str) -> Dict:
+        """
+        处理单个Markdown文件
 
-        # 寻找实体共现的句子
-        sentences = re.split(r'[。！？.!?]', text)
+        Args:
+            md_file_path: Markdown文件路径
 
-        for sentence in sentences:
-            if len(sentence.strip()) < 10:
-                continue
+        Returns:
+            处理结果
+        """
+        result = self.extract_document(md_file_path)
+        self._merge_result(result)
+        return result
 
-            # 找到句子中出现的实体
-            sentence_entities = [e for e in entities if e in sentence]
+    def extract_document(self, md_file_path: str) -> Dict:
+        """
+        抽取单个Markdown文件的实体和关系，不修改缓存
 
-            if len(sentence_entities) >= 2:
-                # 提取实体间的关系
-                for i in range(len(sentence_entities)):
-                    for j in range(i + 1, len(sentence_entities)):
-                        entity1 = sentence_entities[i]
-                        entity2 = sentence_entities[j]
+        Args:
+            md_file_path: Markdown文件路径
 
-                        # 提取两个实体之间的文本
-                        start = sentence.find(entity1) + len(entity1)
-                        end = sentence.find(entity2)
+        Returns:
+            处理结果
+        """
+        return self.extract_documents([md_file_path])[0]
 
-                        if start < end:
-                            between_text = sentence[start:end].strip()
-                            # 检查是否有关系关键词
-                            for keyword in relation_keywords:
-                                if keyword in between_text:
-                                    relationships.append((entity1, keyword, entity2))
-                                    break
+    def extract_documents(self, md_file_paths: List[str]) -> List[Dict]:
+        """
+        批量抽取多个Markdown文件，正文一起送入 nlp.pipe，不修改缓存
 
-        return relationships
+        Args:
+            md_file_paths: Markdown文件路径列表
 
-    def process_markdown_file(self, md_file_path: str) -> Dict:
+        Returns:
+            与 md_file_paths 一一对应的处理结果，解析失败的文件对应空字典
         """
-        处理单个Markdown文件
+        # 提取内容
+        return self._extract_doc_infos([self.extract_markdown_content(path) for path in md_file_paths])
+
+    def extract_texts(self, items: List[Tuple[str, str]]) -> List[Dict]:
+        """
+        批量抽取内存中的Markdown文本（如爬虫刚转换好的页面），不读写磁盘，不修改缓存
 
         Args:
-            md_file_path: Markdown文件路径
+            items: (Markdown文本, 文档对应的文件路径) 列表
 
         Returns:
-            处理结果
+            与 items 一一对应的处理结果，解析失败的文本对应空字典
         """
-        # 提取内容
-        doc_info = self.extract_markdown_content(md_file_path)
-        if not doc_info:
-            return {}
+        doc_infos = []
+        for content, md_file_path in items:
+            try:
+                doc_infos.append(self.parse_markdown(content, md_file_path))
+            except Exception as e:
+                print(f"解析文档 {md_file_path} 时出错: {e}")
+                doc_infos.append({})
+        return self._extract_doc_infos(doc_infos)
 
-        # 提取实体
-        if self.nlp:
-            entities = self.extract_entities_spacy(doc_info['content'])
-        else:
-            entities = self.extract_entities_rule_based(doc_info['content'])
+    def _extract_doc_infos(self, doc_infos: List[Dict]) -> List[Dict]:
+        """
+        对解析好的文档批量抽取实体和关系
 
-        # 提取关系
-        relationships = self.extract_relationships(doc_info['content'], entities)
+        Args:
+            doc_infos: parse_markdown 的返回值列表，解析失败的为空
 
-        # 添加到缓存
-        for entity in entities:
-            self.entities_cache.add(entity)
+        Returns:
+            与 doc_infos 一一对应的处理结果
+        """
+        # 批量提取实体
+        entities_list = iter(self.extract_entities_batch(
+            [doc_info['content'] for doc_info in doc_infos if doc_info]
+        ))
+
+        results = []
+        for doc_info in doc_infos:
+            if not doc_info:
+                results.append({})
+                continue
 
-        self.relationships_cache.extend(relationships)
+            entities = next(entities_list)
 
-        return {
-            'doc_info': doc_info,
-            'entities': entities,
-            'relationships': relationships
-        }
+            # 提取关系
+            relationships = self.extract_relationships(doc_info['content'], entities)
+
+            results.append({
+                'doc_info': doc_info,
+                'entities': entities,
+                'relationships': relationships
+            })
+
+        return results
+
+    def _merge_result(self, result: Dict):
+        """
+        将单个文档的处理结果合并到实体和关系缓存
+
+        Args:
+            result: extract_document 的返回值
+        """
+        if not result:
+            return
+
+        # 添加到缓存
+        self.kg_store.add_entities(result['entities'])
+        self.kg_store.add_relationships(result['relationships'])
 
     def create_neo4j_schema(self):
         """
@@ -266,13 +404,18 @@ class MDKnowledgeGraphBuilder:
             session.run("CREATE INDEX IF NOT EXISTS FOR (e:Entity) ON (e.type)")
             session.run("CREATE INDEX IF NOT EXISTS FOR (d:Document) ON (d.title)")
 
-    def save_to_neo4j(self, processed_docs: List[Dict]):
+    def save_to_neo4j(self, processed_docs: List[Dict], bulk: bool = False, batch_size: int = BULK_BATCH_SIZE):
         """
         将处理结果保存到Neo4j
 
         Args:
             processed_docs: 处理过的文档列表
+            bulk: 是否使用 UNWIND 批量写入模式
+            batch_size: 批量写入模式下每个事务的行数
         """
+        if bulk:
+            return self.save_to_neo4j_bulk(processed_docs, batch_size=batch_size)
+
         with self.driver.session() as session:
             # 创建模式
             self.create_neo4j_schema()
@@ -308,7 +451,7 @@ class MDKnowledgeGraphBuilder:
                             created_date=doc_info['created_date'])
 
             # 保存实体节点
-            for entity in self.entities_cache:
+            for entity in self.kg_store.entities:
                 session.run("""
                     MERGE (e:Entity {name: $name})
                     SET e.type = 'Concept'
@@ -332,24 +475,207 @@ class MDKnowledgeGraphBuilder:
                                 entity_name=entity)
 
             # 保存实体间关系
-            for rel in self.relationships_cache:
-                entity1, relation_type, entity2 = rel
-
+            for entity1, relation_type, entity2, weight in self.kg_store.iter_weighted_relationships():
                 session.run("""
                     MATCH (e1:Entity {name: $entity1})
                     MATCH (e2:Entity {name: $entity2})
                     MERGE (e1)-[r:RELATES_TO {type: $relation_type}]->(e2)
+                    SET r.weight = $weight
                 """,
                             entity1=entity1,
                             entity2=entity2,
-                            relation_type=relation_type)
+                            relation_type=relation_type,
+                            weight=weight)
 
-    def visualize_graph(self, output_file: str = "knowledge_graph.html"):
+            self._bump_graph_version(session)
+
+    def _write_rows(self, session, query: str, rows: List[Dict], batch_size: int) -> int:
+        """
+        将参数列表按固定大小分块，每块通过 UNWIND 在一个显式事务中写入
+
+        Args:
+            session: Neo4j会话
+            query: 以 UNWIND $rows AS row 开头的Cypher语句
+            rows: 参数列表
+            batch_size: 每个事务的行数
+
+        Returns:
+            写入的行数
+        """
+        for start in range(0, len(rows), batch_size):
+            chunk = rows[start:start + batch_size]
+            session.execute_write(lambda tx: tx.run(query, rows=chunk).consume())
+        return len(rows)
+
+    @staticmethod
+    def _bump_graph_version(session):
+        """图谱写入后更新版本号，分析工具据此判断内存中的快照是否过期，服务端据此清除 Neo4j 查询结果缓存"""
+        session.execute_write(lambda tx: tx.run(BUMP_GRAPH_VERSION_QUERY).consume())
+
+    def save_to_neo4j_bulk(self, processed_docs: List[Dict], batch_size: int = BULK_BATCH_SIZE) -> Dict:
+        """
+        批量写入模式：按块发送参数列表，用 UNWIND 在显式事务中写入
+
+        Args:
+            processed_docs: 处理过的文档列表
+            batch_size: 每个事务的行数
+
+        Returns:
+            各阶段写入行数及速率
+        """
+        self.create_neo4j_schema()
+
+        stages = self._bulk_write_stages(processed_docs, self.kg_store.entities,
+                                         self.kg_store.iter_relationships(), self.kg_store)
+        return self._run_write_stages(stages, batch_size)
+
+    def _bulk_write_stages(self, processed_docs: List[Dict], entities, relationships,
+                           store: KnowledgeGraphStore = None) -> List[Tuple]:
+        """
+        生成批量写入文档、实体、文档-实体关系和实体间关系的各个阶段
+
+        Args:
+            processed_docs: 处理过的文档列表
+            entities: 要写入的实体名称
+            relationships: 要写入的 (实体1, 关系类型, 实体2) 关系
+            store: 提供边权重（关系出现次数）的存储，为空时不修改已有权重
+
+        Returns:
+            (阶段名, Cypher语句, 参数列表) 列表
+        """
+        doc_rows = []
+        doc_entity_rows = []
+        for doc in processed_docs:
+            if not doc:
+                continue
+
+            doc_info = doc['doc_info']
+            doc_rows.append({
+                'file_path': doc_info['file_path'],
+                'title': doc_info['title'],
+                'file_name': doc_info['file_name'],
+                'content': doc_info['content'][:500],  # 只保存前500字符
+                'tags': doc_info['tags'],
+                'categories': doc_info['categories'],
+                'created_date': doc_info['created_date']
+            })
+            doc_entity_rows.extend(
+                {'file_path': doc_info['file_path'], 'name': entity} for entity in doc['entities']
+            )
+
+        entity_rows = [{'name': entity} for entity in entities]
+
+        # 相同的关系只需 MERGE 一次
+        rel_rows = [
+            {'source': entity1, 'type': relation_type, 'target': entity2,
+             'weight': store.weight(entity1, relation_type, entity2) if store is not None else None}
+            for entity1, relation_type, entity2 in dict.fromkeys(relationships)
+        ]
+
+        return [
+            ('documents', """
+                UNWIND $rows AS row
+                MERGE (d:Document {file_path: row.file_path})
+                SET d.title = row.title,
+                    d.file_name = row.file_name,
+                    d.content = row.content,
+                    d.tags = row.tags,
+                    d.categories = row.categories,
+                    d.created_date = row.created_date
+            """, doc_rows),
+            ('entities', """
+                UNWIND $rows AS row
+                MERGE (e:Entity {name: row.name})
+                SET e.type = 'Concept'
+            """, entity_rows),
+            ('document_entities', """
+                UNWIND $rows AS row
+                MATCH (d:Document {file_path: row.file_path})
+                MATCH (e:Entity {name: row.name})
+                MERGE (d)-[:CONTAINS_ENTITY]->(e)
+            """, doc_entity_rows),
+            ('relationships', """
+                UNWIND $rows AS row
+                MATCH (e1:Entity {name: row.source})
+                MATCH (e2:Entity {name: row.target})
+                MERGE (e1)-[r:RELATES_TO {type: row.type}]->(e2)
+                SET r.weight = coalesce(row.weight, r.weight)
+            """, rel_rows),
+        ]
+
+    def _run_write_stages(self, stages: List[Tuple], batch_size: int) -> Dict:
+        """
+        依次执行写入阶段，并统计每个阶段的写入速率
+
+        Args:
+            stages: (阶段名, Cypher语句, 参数列表) 列表
+            batch_size: 每个事务的行数
+
+        Returns:
+            各阶段写入行数及速率
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size 必须大于0")
+
+        stats = {}
+        total_rows = 0
+        total_start = time.perf_counter()
+        with self.driver.session() as session:
+            for stage, query, rows in stages:
+                start = time.perf_counter()
+                written = self._write_rows(session, query, rows, batch_size)
+                elapsed = time.perf_counter() - start
+                rate = written / elapsed if elapsed > 0 else 0.0
+                stats[stage] = {'rows': written, 'seconds': round(elapsed, 3), 'rows_per_second': round(rate, 1)}
+                total_rows += written
+                print(f"写入 {stage}: {written} 行, 耗时 {elapsed:.2f}s, {rate:.0f} 行/秒")
+
+            if total_rows:
+                self._bump_graph_version(session)
+
+        total_elapsed = time.perf_counter() - total_start
+        total_rate = total_rows / total_elapsed if total_elapsed > 0 else 0.0
+        stats['total'] = {'rows': total_rows, 'seconds': round(total_elapsed, 3), 'rows_per_second': round(total_rate, 1)}
+        print(f"批量写入完成: 共 {total_rows} 行, 耗时 {total_elapsed:.2f}s, {total_rate:.0f} 行/秒")
+        return stats
+
+    def rank_entities(self, rank_by: str = 'degree', limit: int = None) -> List[Tuple[int, float]]:
+        """
+        按度数或边权重给实体排序
+
+        Args:
+            rank_by: 'degree' 按相连的（去重后）关系数，'weight' 按相连关系的出现次数之和
+            limit: 只返回前若干个，为空时返回全部
+
+        Returns:
+            (实体编号, 得分) 列表，得分高的在前，得分相同时先出现的在前
+        """
+        if rank_by not in ('degree', 'weight'):
+            raise ValueError(f"不支持的排序方式: {rank_by}")
+
+        scores = [0] * self.kg_store.num_entities
+        for source, _, target, count in self.kg_store.iter_edges():
+            score = count if rank_by == 'weight' else 1
+            scores[source] += score
+            scores[target] += score
+
+        ranked = enumerate(scores)
+        if limit is None:
+            return sorted(ranked, key=_rank_key)
+        return heapq.nsmallest(limit, ranked, key=_rank_key)
+
+    def visualize_graph(self, output_file: str = "knowledge_graph.html",
+                        max_nodes: int = VISUALIZE_MAX_NODES, rank_by: str = 'degree'):
         """
         生成知识图谱的可视化HTML文件
 
+        实体较多时只渲染得分最高的 max_nodes 个实体及它们之间的关系；
+        更大的图请用 export_graph_json 导出给前端分块加载。
+
         Args:
             output_file: 输出HTML文件路径
+            max_nodes: 最多渲染的实体数，为空时渲染全部
+            rank_by: 选取实体的依据，'degree' 或 'weight'
         """
         try:
             from pyvis.network import Network
@@ -360,26 +686,88 @@ class MDKnowledgeGraphBuilder:
         # 创建网络图
         net = Network(height="750px", width="100%", bgcolor="#222222", font_color="white")
 
-        # 添加实体节点
-        entity_nodes = list(self.entities_cache)
-        for i, entity in enumerate(entity_nodes):
-            net.add_node(i, label=entity, color="#3498db", shape="dot", size=20)
-
-        # 添加关系边
-        edge_set = set()  # 用于去重
-        for rel in self.relationships_cache:
-            entity1, relation_type, entity2 = rel
-            if entity1 in entity_nodes and entity2 in entity_nodes:
-                idx1 = entity_nodes.index(entity1)
-                idx2 = entity_nodes.index(entity2)
-                edge_key = f"{idx1}-{idx2}-{relation_type}"
-                if edge_key not in edge_set:
-                    net.add_edge(idx1, idx2, title=relation_type, color="#95a5a6")
-                    edge_set.add(edge_key)
+        # 添加实体节点（节点编号直接使用存储中的实体编号）
+        entities = self.kg_store.entities
+        selected = set()
+        for entity_id, _ in self.rank_entities(rank_by, max_nodes):
+            net.add_node(entity_id, label=entities[entity_id], color="#3498db", shape="dot", size=20)
+            selected.add(entity_id)
+
+        # 添加关系边（存储中的关系已经去重）
+        relation_types = self.kg_store.relation_types
+        for source, type_id, target, count in self.kg_store.iter_edges():
+            if source in selected and target in selected:
+                net.add_edge(source, target, title=f"{relation_types[type_id]} ({count})",
+                             value=count, color="#95a5a6")
 
         # 生成HTML
         net.show(output_file)
-        print(f"可视化图已保存到 {output_file}")
+        print(f"可视化图已保存到 {output_file}（{len(selected)}/{self.kg_store.num_entities} 个实体）")
+
+    def export_graph_json(self, output_dir: str = "graph_export", chunk_size: int = GRAPH_CHUNK_SIZE,
+                          max_nodes: int = None, rank_by: str = 'degree') -> Dict:
+        """
+        导出供前端分块加载的紧凑JSON
+
+        实体按得分从高到低排列并切成若干块，每块文件包含这一段实体，以及另一端已在
+        本块或之前的块中的关系。前端先读取 graph_meta.json，再依次加载各块，
+        每加载一块就能直接渲染，不必等整个图下载完。
+
+        块文件格式：
+            nodes: [[实体编号, 实体名, 得分], ...]
+            edges: [[源实体编号, 目标实体编号, 关系类型编号, 出现次数], ...]
+
+        Args:
+            output_dir: 输出目录
+            chunk_size: 每块的实体数
+            max_nodes: 最多导出的实体数，为空时导出全部
+            rank_by: 实体排序依据，'degree' 或 'weight'
+
+        Returns:
+            元数据（实体数、关系数、关系类型表、块文件列表）
+        """
+        if chunk_size < 1:
+            raise ValueError("chunk_size 必须大于0")
+
+        ranked = self.rank_entities(rank_by, max_nodes)
+        rank = {entity_id: position for position, (entity_id, _) in enumerate(ranked)}
+
+        # 按两端中较晚加载的一端把关系分到各块
+        chunk_edges = [[] for _ in range(0, len(ranked), chunk_size)]
+        for source, type_id, target, count in self.kg_store.iter_edges():
+            source_rank = rank.get(source)
+            target_rank = rank.get(target)
+            if source_rank is None or target_rank is None:
+                continue
+            chunk_edges[max(source_rank, target_rank) // chunk_size].append([source, target, type_id, count])
+
+        os.makedirs(output_dir, exist_ok=True)
+        entities = self.kg_store.entities
+        chunks = []
+        num_edges = 0
+        for index, edges in enumerate(chunk_edges):
+            part = ranked[index * chunk_size:(index + 1) * chunk_size]
+            file_name = f"graph_part_{index}.json"
+            with open(os.path.join(output_dir, file_name), 'w', encoding='utf-8') as f:
+                json.dump({
+                    'nodes': [[entity_id, entities[entity_id], score] for entity_id, score in part],
+                    'edges': edges
+                }, f, ensure_ascii=False, separators=(',', ':'))
+            chunks.append({'file': file_name, 'nodes': len(part), 'edges': len(edges)})
+            num_edges += len(edges)
+
+        meta = {
+            'rank_by': rank_by,
+            'total_nodes': len(ranked),
+            'total_edges': num_edges,
+            'relation_types': self.kg_store.relation_types,
+            'chunks': chunks
+        }
+        with open(os.path.join(output_dir, 'graph_meta.json'), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+
+        print(f"图数据已导出到 {output_dir}: {len(ranked)} 个实体, {num_edges} 条关系, {len(chunks)} 块")
+        return meta
 
     def query_entities(self, entity_name: str) -> List[Dict]:
         """
@@ -419,34 +807,381 @@ class MDKnowledgeGraphBuilder:
 
             return [record.data() for record in result]
 
-    def process_directory(self, directory_path: str) -> List[Dict]:
+    @staticmethod
+    def iter_markdown_files(directory_path: str) -> Iterator[str]:
+        """
+        按固定顺序逐个给出目录下的Markdown文件，不预先收集整个文件列表
+
+        Args:
+            directory_path: 目录路径
+
+        Returns:
+            Markdown文件路径迭代器
+        """
+        # 遍历目录（排序保证每次运行顺序一致）
+        for root, dirs, files in os.walk(directory_path):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith('.md'):
+                    yield os.path.join(root, file)
+
+    @staticmethod
+    def find_markdown_files(directory_path: str) -> List[str]:
+        """
+        按固定顺序列出目录下的所有Markdown文件
+
+        Args:
+            directory_path: 目录路径
+
+        Returns:
+            Markdown文件路径列表
+        """
+        return list(MDKnowledgeGraphBuilder.iter_markdown_files(directory_path))
+
+    def process_directory(self, directory_path: str, workers: int = 1, chunksize: int = 16) -> List[Dict]:
         """
         处理目录下的所有Markdown文件
 
         Args:
             directory_path: 目录路径
+            workers: 抽取进程数，大于1时使用进程池并行抽取
+            chunksize: 每批一起抽取（一起送入 nlp.pipe）的文件数
 
         Returns:
             处理结果列表
         """
-        processed_docs = []
+        return self.process_files(self.find_markdown_files(directory_path), workers, chunksize)
 
-        # 遍历目录
-        for root, dirs, files in os.walk(directory_path):
-            for file in files:
-                if file.endswith('.md'):
-                    md_file_path = os.path.join(root, file)
-                    print(f"处理文件: {md_file_path}")
+    def process_files(self, md_files: Iterable[str], workers: int = 1, chunksize: int = 16) -> List[Dict]:
+        """
+        处理给定的Markdown文件列表
+
+        Args:
+            md_files: Markdown文件路径列表
+            workers: 抽取进程数，大于1时使用进程池并行抽取
+            chunksize: 每批一起抽取（一起送入 nlp.pipe）的文件数
+
+        Returns:
+            处理结果列表
+        """
+        processed_docs = []
 
-                    try:
-                        result = self.process_markdown_file(md_file_path)
-                        if result:
-                            processed_docs.append(result)
-                    except Exception as e:
-                        print(f"处理文件 {md_file_path} 时出错: {e}")
+        for result in self.iter_documents(md_files, workers, chunksize):
+            self._merge_result(result)
+            processed_docs.append(result)
 
         return processed_docs
 
+    def iter_documents(self, md_files: Iterable[str], workers: int = 1, chunksize: int = 16) -> Iterator[Dict]:
+        """
+        按文件顺序逐个给出抽取结果（跳过解析失败的文件），不合并到缓存
+
+        文件路径按需从 md_files 中读取，任何时刻只有少量批次在抽取或等待消费，
+        内存占用与语料规模无关。
+
+        Args:
+            md_files: Markdown文件路径（可以是生成器）
+            workers: 抽取进程数，大于1时使用进程池并行抽取
+            chunksize: 每批一起抽取（一起送入 nlp.pipe）的文件数
+
+        Returns:
+            处理结果迭代器
+        """
+        if chunksize < 1:
+            raise ValueError("chunksize 必须大于0")
+
+        chunks = _iter_chunks(md_files, chunksize)
+
+        # 先取出前两批：只有一批时不必启动进程池
+        head = list(islice(chunks, 2))
+        chunks = chain(head, chunks)
+
+        if workers > 1 and len(head) > 1:
+            results = self._iter_documents_parallel(chunks, workers)
+        else:
+            results = (result for chunk in chunks for result in _extract_chunk(self, chunk))
+
+        for result in results:
+            if result:
+                yield result
+
+    def _iter_documents_parallel(self, chunks: Iterator[List[str]], workers: int) -> Iterator[Dict]:
+        """
+        使用进程池并行抽取，按提交顺序给出结果
+
+        同时在途的批次不超过进程数的两倍，消费者处理得慢时不会无限制地提交和缓存结果。
+
+        Args:
+            chunks: 按批分好的Markdown文件路径
+            workers: 进程数
+
+        Returns:
+            处理结果迭代器
+        """
+        print(f"使用 {workers} 个进程并行处理")
+        max_pending = workers * 2
+        with ProcessPoolExecutor(max_workers=workers,
+                                 initializer=_init_extract_worker,
+                                 initargs=(type(self), self.nlp_batch_size)) as executor:
+            pending = deque()
+            for chunk in chunks:
+                pending.append(executor.submit(_extract_in_worker, chunk))
+                if len(pending) >= max_pending:
+                    # 按提交顺序取结果，保证合并顺序确定
+                    yield from pending.popleft().result()
+            while pending:
+                yield from pending.popleft().result()
+
+    def build_streaming(self, directory_path: str, workers: int = 1, chunksize: int = 16,
+                        flush_docs: int = STREAM_FLUSH_DOCS, batch_size: int = BULK_BATCH_SIZE,
+                        keep_cache: bool = True) -> Dict:
+        """
+        流式构建：遍历目录、读取清理、抽取和写入Neo4j串成一条生成器流水线，
+        每攒够 flush_docs 个文档就写一次库，写完即丢弃这批文档
+
+        不再先把所有文档的内容保存在列表中，内存占用只取决于 flush_docs 和 chunksize，
+        第一批文档处理完后图中就能看到节点。
+
+        Args:
+            directory_path: 目录路径
+            workers: 抽取进程数
+            chunksize: 每批一起抽取（一起送入 nlp.pipe）的文件数
+            flush_docs: 每次写库的文档数
+            batch_size: 每个事务的行数
+            keep_cache: 是否把实体和关系合并到缓存（供可视化、统计和边权重使用）；
+                关闭后内存占用与语料规模完全无关，但不写入边权重
+
+        Returns:
+            写入的文档数、批次数及各阶段写入行数
+        """
+        documents = self.iter_documents(self.iter_markdown_files(directory_path), workers, chunksize)
+        return self.write_stream(documents, flush_docs, batch_size, keep_cache)
+
+    def write_stream(self, documents: Iterable[Dict], flush_docs: int = STREAM_FLUSH_DOCS,
+                     batch_size: int = BULK_BATCH_SIZE, keep_cache: bool = True,
+                     on_flush: Callable[[List[Dict]], None] = None) -> Dict:
+        """
+        把抽取结果流按批写入Neo4j，每攒够 flush_docs 个文档写一次库
+
+        Args:
+            documents: 抽取结果（可以是生成器，如 iter_documents 的返回值）
+            flush_docs: 每次写库的文档数
+            batch_size: 每个事务的行数
+            keep_cache: 是否把实体和关系合并到缓存（供可视化、统计和边权重使用）
+            on_flush: 每批写库成功后以这批结果调用，供上游确认已入库的文档
+
+        Returns:
+            写入的文档数、批次数及各阶段写入行数
+        """
+        if flush_docs < 1:
+            raise ValueError("flush_docs 必须大于0")
+
+        self.create_neo4j_schema()
+
+        stats = {'documents': 0, 'flushes': 0, 'rows': {}}
+        start = time.perf_counter()
+        with self.driver.session() as session:
+            for batch in _iter_chunks(documents, flush_docs):
+                if keep_cache:
+                    for result in batch:
+                        self._merge_result(result)
+
+                # 每批只写本批文档涉及的实体和关系，MERGE 保证跨批次重复写入是幂等的
+                entities = dict.fromkeys(entity for doc in batch for entity in doc['entities'])
+                relationships = [rel for doc in batch for rel in doc['relationships']]
+                # 一条关系最后一次被写入时，缓存中的出现次数已经是它在整个语料中的总数
+                stages = self._bulk_write_stages(batch, entities, relationships,
+                                                 self.kg_store if keep_cache else None)
+
+                for stage, query, rows in stages:
+                    written = self._write_rows(session, query, rows, batch_size)
+                    stats['rows'][stage] = stats['rows'].get(stage, 0) + written
+                self._bump_graph_version(session)
+
+                if on_flush is not None:
+                    on_flush(batch)
+
+                stats['documents'] += len(batch)
+                stats['flushes'] += 1
+                elapsed = time.perf_counter() - start
+                print(f"已写入 {stats['documents']} 个文档, 耗时 {elapsed:.2f}s")
+
+        stats['seconds'] = round(time.perf_counter() - start, 3)
+        print(f"流式构建完成: {stats}")
+        return stats
+
+    def build_incremental(self, directory_path: str, manifest_path: str = MANIFEST_FILE,
+                          workers: int = 1, batch_size: int = BULK_BATCH_SIZE) -> Dict:
+        """
+        增量构建：根据本地清单（路径、修改时间、内容哈希及各文件产生的实体和关系）
+        跳过未变化的文件，只更新新增、修改、删除文件对应的文档节点和边
+
+        Args:
+            directory_path: 目录路径
+            manifest_path: 清单文件路径
+            workers: 抽取进程数
+            batch_size: 批量写入时每个事务的行数
+
+        Returns:
+            新增、修改、删除、未变化的文件数
+        """
+        manifest = self._load_manifest(manifest_path)
+        old_files = manifest['files']
+        new_files = {}
+        to_extract = []
+
+        for md_file_path in self.find_markdown_files(directory_path):
+            file_path = os.path.abspath(md_file_path)
+            stat = os.stat(md_file_path)
+            entry = old_files.get(file_path)
+
+            # 修改时间和大小都没变，直接视为未变化
+            if entry and entry['mtime'] == stat.st_mtime and entry['size'] == stat.st_size:
+                new_files[file_path] = entry
+                continue
+
+            # 修改时间变了但内容没变，只更新清单
+            digest = _file_digest(md_file_path)
+            if entry and entry['sha256'] == digest:
+                new_files[file_path] = dict(entry, mtime=stat.st_mtime, size=stat.st_size)
+                continue
+
+            to_extract.append((md_file_path, file_path, stat, digest))
+
+        extracting = {item[1] for item in to_extract}
+        deleted = [file_path for file_path in old_files
+                   if file_path not in new_files and file_path not in extracting]
+
+        print(f"增量构建: {len(to_extract)} 个文件需要处理, {len(deleted)} 个文件已删除")
+
+        results = {}
+        if to_extract:
+            for result in self.process_files([item[0] for item in to_extract], workers=workers):
+                results[result['doc_info']['file_path']] = result
+
+        changed_docs = []
+        for md_file_path, file_path, stat, digest in to_extract:
+            result = results.get(file_path)
+            if not result:
+                # 解析失败：保留旧记录，下次运行时重试
+                if file_path in old_files:
+                    new_files[file_path] = old_files[file_path]
+                continue
+
+            changed_docs.append(result)
+            new_files[file_path] = {
+                'mtime': stat.st_mtime,
+                'size': stat.st_size,
+                'sha256': digest,
+                'entities': result['entities'],
+                'relationships': [list(rel) for rel in result['relationships']]
+            }
+
+        replaced = [doc['doc_info']['file_path'] for doc in changed_docs
+                    if doc['doc_info']['file_path'] in old_files]
+
+        # 只有不再被任何文件引用的实体和关系才从图中删除
+        old_entities, old_relationships = _manifest_references(old_files)
+        new_entities, new_relationships = _manifest_references(new_files)
+        stale_entities = old_entities - new_entities
+        stale_relationships = old_relationships - new_relationships
+
+        changed_entities = list(dict.fromkeys(
+            entity for doc in changed_docs for entity in doc['entities']
+        ))
+        # 被修改、删除的文件原先引用、现在仍然存在的关系，出现次数可能变了，要一起更新权重
+        changed_relationships = [
+            rel for doc in changed_docs for rel in doc['relationships']
+        ] + [
+            tuple(rel) for file_path in replaced + deleted for rel in old_files[file_path]['relationships']
+            if tuple(rel) in new_relationships
+        ]
+
+        # 缓存反映整个语料，供可视化、统计和边权重使用
+        self.kg_store = KnowledgeGraphStore()
+        for file_path in sorted(new_files):
+            entry = new_files[file_path]
+            self.kg_store.add_entities(entry['entities'])
+            self.kg_store.add_relationships(tuple(rel) for rel in entry['relationships'])
+
+        stages = [
+            ('deleted_documents', """
+                UNWIND $rows AS row
+                MATCH (d:Document {file_path: row.file_path})
+                DETACH DELETE d
+            """, [{'file_path': file_path} for file_path in deleted]),
+            ('replaced_document_entities', """
+                UNWIND $rows AS row
+                MATCH (d:Document {file_path: row.file_path})-[r:CONTAINS_ENTITY]->()
+                DELETE r
+            """, [{'file_path': file_path} for file_path in replaced]),
+            ('stale_relationships', """
+                UNWIND $rows AS row
+                MATCH (e1:Entity {name: row.source})-[r:RELATES_TO {type: row.type}]->(e2:Entity {name: row.target})
+                DELETE r
+            """, [{'source': entity1, 'type': relation_type, 'target': entity2}
+                  for entity1, relation_type, entity2 in sorted(stale_relationships)]),
+            ('stale_entities', """
+                UNWIND $rows AS row
+                MATCH (e:Entity {name: row.name})
+                DETACH DELETE e
+            """, [{'name': entity} for entity in sorted(stale_entities)]),
+        ]
+        stages.extend(self._bulk_write_stages(changed_docs, changed_entities, changed_relationships, self.kg_store))
+
+        if changed_docs or deleted:
+            self.create_neo4j_schema()
+            self._run_write_stages(stages, batch_size)
+
+        # 写库成功后再保存清单
+        manifest['files'] = new_files
+        self._save_manifest(manifest, manifest_path)
+
+        summary = {
+            'added': len(changed_docs) - len(replaced),
+            'changed': len(replaced),
+            'deleted': len(deleted),
+            'unchanged': len(new_files) - len(changed_docs)
+        }
+        print(f"增量构建完成: {summary}")
+        return summary
+
+    @staticmethod
+    def _load_manifest(manifest_path: str) -> Dict:
+        """
+        读取增量构建清单，不存在或版本不符时返回空清单
+
+        Args:
+            manifest_path: 清单文件路径
+
+        Returns:
+            清单字典
+        """
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path, 'r', encoding='utf-8') as f:
+                    manifest = json.load(f)
+                if manifest.get('version') == MANIFEST_VERSION:
+                    return manifest
+            except (OSError, ValueError) as e:
+                print(f"读取清单 {manifest_path} 时出错，将全量重建: {e}")
+
+        return {'version': MANIFEST_VERSION, 'files': {}}
+
+    @staticmethod
+    def _save_manifest(manifest: Dict, manifest_path: str):
+        """
+        原子地保存增量构建清单
+
+        Args:
+            manifest: 清单字典
+            manifest_path: 清单文件路径
+        """
+        tmp_path = manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, manifest_path)
+
     def export_statistics(self, output_file: str = "kg_statistics.json"):
         """
         导出知识图谱统计信息
@@ -455,10 +1190,11 @@ class MDKnowledgeGraphBuilder:
             output_file: 输出文件路径
         """
         stats = {
-            "total_entities": len(self.entities_cache),
-            "total_relationships": len(self.relationships_cache),
-            "entities_sample": list(self.entities_cache)[:20],
-            "relationships_sample": self.relationships_cache[:20]
+            "total_entities": self.kg_store.num_entities,
+            "total_relationships": self.kg_store.num_relationships,
+            "total_relationship_occurrences": self.kg_store.num_occurrences,
+            "entities_sample": self.kg_store.entities[:20],
+            "relationships_sample": list(islice(self.kg_store.iter_weighted_relationships(), 20))
         }
 
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -472,12 +1208,82 @@ class MDKnowledgeGraphBuilder:
         self.driver.close()
 
 
+def _file_digest(path: str) -> str:
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _manifest_references(files: Dict) -> Tuple[set, set]:
+    """汇总清单中所有文件引用的实体和关系"""
+    entities = set()
+    relationships = set()
+    for entry in files.values():
+        entities.update(entry['entities'])
+        relationships.update(tuple(rel) for rel in entry['relationships'])
+    return entities, relationships
+
+
+# 工作进程内的抽取器，每个进程只加载一次spacy模型
+_worker_builder = None
+
+
+def _init_extract_worker(builder_cls=MDKnowledgeGraphBuilder, nlp_batch_size: int = NLP_BATCH_SIZE):
+    """进程池初始化函数：在工作进程中创建抽取器"""
+    global _worker_builder
+    _worker_builder = builder_cls.create_extractor(nlp_batch_size)
+
+
+def _rank_key(item: Tuple[int, float]) -> Tuple[float, int]:
+    """实体排序键：得分高的在前，得分相同时编号小（先出现）的在前"""
+    return -item[1], item[0]
+
+
+def _iter_chunks(items: Iterable, size: int) -> Iterator[List]:
+    """把可迭代对象按固定大小分块，按需读取，不预先展开"""
+    iterator = iter(items)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _extract_chunk(builder: MDKnowledgeGraphBuilder, md_file_paths: List[str]) -> List[Dict]:
+    """批量抽取一组文件，整批出错时退回逐个文件抽取以定位出错的文件"""
+    for md_file_path in md_file_paths:
+        print(f"处理文件: {md_file_path}")
+
+    try:
+        return builder.extract_documents(md_file_paths)
+    except Exception:
+        results = []
+        for md_file_path in md_file_paths:
+            try:
+                results.append(builder.extract_document(md_file_path))
+            except Exception as e:
+                print(f"处理文件 {md_file_path} 时出错: {e}")
+                results.append({})
+        return results
+
+
+def _extract_in_worker(md_file_paths: List[str]) -> List[Dict]:
+    """在工作进程中抽取一批文件"""
+    return _extract_chunk(_worker_builder, md_file_paths)
+
+
 def main():
     # 配置参数
     NEO4J_URI = "bolt://localhost:7687"  # Neo4j地址
     NEO4J_USER = "neo4j"  # 用户名
     NEO4J_PASSWORD = "password"  # 密码
     MD_DIRECTORY = "./markdown_files"  # Markdown文件目录
+    EXTRACT_WORKERS = os.cpu_count() or 1  # 抽取进程数
+    INCREMENTAL = True  # 是否增量构建（只处理新增、修改、删除的文件）
+    STREAMING = False  # 非增量构建时是否流式写入（边抽取边写库，内存占用不随语料增长）
 
     # 创建构建器实例
     kg_builder = MDKnowledgeGraphBuilder(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
@@ -485,27 +1291,34 @@ def main():
     try:
         # 处理目录下的所有Markdown文件
         print("开始处理Markdown文件...")
-        processed_docs = kg_builder.process_directory(MD_DIRECTORY)
+        if INCREMENTAL:
+            # 增量构建会直接同步到Neo4j
+            kg_builder.build_incremental(MD_DIRECTORY, workers=EXTRACT_WORKERS, batch_size=BULK_BATCH_SIZE)
+        elif STREAMING:
+            kg_builder.build_streaming(MD_DIRECTORY, workers=EXTRACT_WORKERS, batch_size=BULK_BATCH_SIZE)
+        else:
+            processed_docs = kg_builder.process_directory(MD_DIRECTORY, workers=EXTRACT_WORKERS)
+            print(f"处理完成！共处理 {len(processed_docs)} 个文件")
 
-        print(f"处理完成！共处理 {len(processed_docs)} 个文件")
-        print(f"提取到 {len(kg_builder.entities_cache)} 个实体")
-        print(f"提取到 {len(kg_builder.relationships_cache)} 个关系")
+            # 保存到Neo4j
+            print("保存到Neo4j数据库...")
+            kg_builder.save_to_neo4j(processed_docs, bulk=True, batch_size=BULK_BATCH_SIZE)
 
-        # 保存到Neo4j
-        print("保存到Neo4j数据库...")
-        kg_builder.save_to_neo4j(processed_docs)
+        print(f"提取到 {kg_builder.kg_store.num_entities} 个实体")
+        print(f"提取到 {kg_builder.kg_store.num_relationships} 个关系")
 
         # 生成可视化
         print("生成可视化...")
         kg_builder.visualize_graph()
+        kg_builder.export_graph_json()
 
         # 导出统计信息
         stats = kg_builder.export_statistics()
         print(f"知识图谱统计: {stats}")
 
         # 示例查询
-        if kg_builder.entities_cache:
-            sample_entity = list(kg_builder.entities_cache)[0]
+        if kg_builder.kg_store.entities:
+            sample_entity = kg_builder.kg_store.entities[0]
             print(f"\n查询实体 '{sample_entity}' 的文档:")
             docs = kg_builder.query_documents_with_entity(sample_entity)
             for doc in docs[:3]:
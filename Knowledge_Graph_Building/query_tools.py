@@ -1,11 +1,69 @@
+import time
+import threading
+from typing import Optional, Iterable
+
+from graph_engine import GraphEngine, GRAPH_VERSION_QUERY, PATH_MAX_DEPTH
+
+
+# 两次检查图谱版本号之间的最短间隔（秒），间隔内的查询直接使用内存中的快照
+VERSION_CHECK_INTERVAL = 5.0
+
+
 class KnowledgeGraphAnalyzer:
     """知识图谱分析工具"""
 
-    def __init__(self, driver):
+    def __init__(self, driver, use_engine: bool = True,
+                 version_check_interval: Optional[float] = VERSION_CHECK_INTERVAL):
+        """
+        Args:
+            driver: Neo4j 驱动
+            use_engine: 是否用内存中的图分析引擎计算（不依赖 GDS 插件），否则在 Neo4j 中执行查询
+            version_check_interval: 检查图谱版本号的最短间隔（秒），版本号变化时重新读取快照；
+                为 None 时不自动检查，只在调用 refresh 后重新读取
+        """
         self.driver = driver
+        self.use_engine = use_engine
+        self.version_check_interval = version_check_interval
+        self._engine: Optional[GraphEngine] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def engine(self) -> GraphEngine:
+        """图分析引擎，首次使用或图谱版本号变化后从 Neo4j 读取实体关系图快照"""
+        engine = self._engine
+        if engine is not None and not self._version_check_due():
+            return engine
+
+        with self._lock:
+            if self._engine is not None and self._version_check_due():
+                self._checked_at = time.monotonic()
+                if self.graph_version() != self._engine.version:
+                    self._engine = None
+            if self._engine is None:
+                self._engine = GraphEngine.from_neo4j(self.driver)
+                self._checked_at = time.monotonic()
+            return self._engine
+
+    def _version_check_due(self) -> bool:
+        interval = self.version_check_interval
+        return interval is not None and time.monotonic() - self._checked_at >= interval
+
+    def graph_version(self) -> int:
+        """数据库中的图谱版本号"""
+        with self.driver.session() as session:
+            return session.run(GRAPH_VERSION_QUERY).single()['version']
+
+    def refresh(self):
+        """丢弃快照，下次分析时重新读取"""
+        with self._lock:
+            self._engine = None
 
     def find_central_entities(self, limit: int = 10):
         """查找中心性最高的实体"""
+        if self.use_engine:
+            return self.engine.central_entities(limit)
+
         with self.driver.session() as session:
             result = session.run("""
                 MATCH (e:Entity)
@@ -18,8 +76,15 @@ class KnowledgeGraphAnalyzer:
 
             return [record.data() for record in result]
 
+    def find_influential_entities(self, limit: int = 10, weighted: bool = False):
+        """查找 PageRank 分数最高的实体"""
+        return self.engine.influential_entities(limit, weighted)
+
     def find_communities(self):
         """发现实体社区"""
+        if self.use_engine:
+            return self.engine.communities()
+
         with self.driver.session() as session:
             result = session.run("""
                 CALL gds.labelPropagation.stream({
@@ -34,13 +99,39 @@ class KnowledgeGraphAnalyzer:
 
             return [record.data() for record in result]
 
-    def search_related_paths(self, entity1: str, entity2: str, max_depth: int = 3):
-        """查找两个实体之间的路径"""
+    def find_connected_components(self):
+        """查找互不相连的实体分量"""
+        return self.engine.components()
+
+    def search_related_paths(self, entity1: str, entity2: str, max_depth: int = PATH_MAX_DEPTH, k: int = 1,
+                             relation_types: Optional[Iterable[str]] = None):
+        """
+        查找两个实体之间按跳数从短到长的 k 条路径
+
+        Args:
+            entity1: 起点实体
+            entity2: 终点实体
+            max_depth: 最大跳数
+            k: 路径条数（Cypher 查询时返回最多 k 条同样最短的路径）
+            relation_types: 只经过这些类型的关系，为空时不限制
+        """
+        max_depth = int(max_depth)
+        if max_depth < 1:
+            raise ValueError("max_depth 必须大于0")
+
+        if self.use_engine:
+            return self.engine.shortest_paths(entity1, entity2, k, max_depth, relation_types)
+
+        # 变长模式的跳数上限不能参数化，校验为整数后写入语句
+        shortest = 'shortestPath' if k <= 1 else 'allShortestPaths'
         with self.driver.session() as session:
-            result = session.run("""
-                MATCH path = shortestPath((e1:Entity {name: $entity1})-[*1..$max_depth]-(e2:Entity {name: $entity2}))
+            result = session.run(f"""
+                MATCH path = {shortest}((e1:Entity {{name: $entity1}})-[:RELATES_TO*1..{max_depth}]-(e2:Entity {{name: $entity2}}))
+                WHERE $relation_types IS NULL OR all(rel IN relationships(path) WHERE rel.type IN $relation_types)
                 RETURN [node in nodes(path) | node.name] as path_nodes,
                        [rel in relationships(path) | rel.type] as relationships
-            """, entity1=entity1, entity2=entity2, max_depth=max_depth)
+                LIMIT $k
+            """, entity1=entity1, entity2=entity2, k=max(k, 1),
+                                 relation_types=list(relation_types) if relation_types is not None else None)
 
             return [record.data() for record in result]
\ No newline at end of file
@@ -0,0 +1,291 @@
+"""
+data_crawler 异步爬取的离线测试：在本机起一个 aiohttp 服务模拟站点，不访问外网
+- 全局并发上限：同时在服务端处理的请求数不超过 concurrency
+- 某个站点达到自己的并发上限时，工作协程继续处理其他站点，不占着全局名额等待
+- 5xx/429 按退避重试，带 Retry-After 时至少等待它要求的时间，其余 4xx 不重试
+- ETag/304：第二次爬取发送条件请求，未修改的页面不再转换和写文件
+用法（在 Knowledge_Graph_Building 目录下）：
+    python -m pytest -q test_data_crawler.py
+"""
+import os
+import time
+import asyncio
+import email.utils
+
+import pytest
+
+aiohttp = pytest.importorskip('aiohttp')
+from aiohttp import web
+
+import data_crawler
+from data_crawler import CrawlSite, HostRateLimiter, crawl_sites, fetch_url, parse_retry_after
+
+PAGES = 12
+
+
+def make_page(i):
+    return (f'<html><head><title>P{i}</title></head><body><div class="article-body">'
+            f'<h1>页面 {i}</h1><p>第 {i} 页的内容</p>'
+            f'<div class="example_code">print({i})<br></div></div></body></html>')
+
+
+class FakeSite:
+    """模拟站点：入口页列出 PAGES 个文章页，文章页带 ETag 并记录请求情况"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        # 第一次启动时随机分配，之后沿用，多次爬取的链接（缓存键）保持不变
+        self.port = 0
+        self.active = 0
+        self.max_active = 0
+        self.hits = {}
+        self.not_modified = 0
+        # 路径 -> 依次返回的错误状态码或 (状态码, Retry-After)，用完后正常返回
+        self.failures = {}
+
+    async def index(self, request):
+        # 第二个站点 /u/ 的文章页编号从 100 开始，与 /t/ 的链接不重复
+        start = 100 if request.path == '/u/' else 0
+        links = ''.join(f'<a href="p{i}.html">Page {i}</a>' for i in range(start, start + PAGES))
+        return web.Response(text=f'<html><head><title>Fixture</title></head><body>'
+                                 f'<div class="sidebar-box gallery-list">{links}</div></body></html>',
+                            content_type='text/html')
+
+    async def page(self, request):
+        path = request.path
+        self.hits[path] = self.hits.get(path, 0) + 1
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.failures.get(path):
+                failure = self.failures[path].pop(0)
+                status, retry_after = failure if isinstance(failure, tuple) else (failure, None)
+                return web.Response(status=status, headers={'Retry-After': retry_after} if retry_after else None)
+            i = int(request.match_info['i'])
+            etag = f'"v{i}"'
+            if request.headers.get('If-None-Match') == etag:
+                self.not_modified += 1
+                return web.Response(status=304, headers={'ETag': etag})
+            return web.Response(text=make_page(i), content_type='text/html', headers={'ETag': etag})
+        finally:
+            self.active -= 1
+
+
+async def start_site(site: FakeSite):
+    """启动模拟站点，返回 (runner, 入口页)"""
+    app = web.Application()
+    app.router.add_get('/t/', site.index)
+    app.router.add_get('/t/p{i}.html', site.page)
+    app.router.add_get('/u/', site.index)
+    app.router.add_get('/u/p{i}.html', site.page)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    tcp_site = web.TCPSite(runner, '127.0.0.1', site.port)
+    await tcp_site.start()
+    site.port = tcp_site._server.sockets[0].getsockname()[1]
+    return runner, f'http://127.0.0.1:{site.port}/t/'
+
+
+def crawl(site: FakeSite, downdir, concurrency=3, per_site_concurrency=PAGES, **options):
+    """爬取一遍模拟站点，返回 (CrawlSite, 失败的链接)"""
+    async def main():
+        runner, index_url = await start_site(site)
+        try:
+            crawl_site = CrawlSite(index_url, str(downdir), per_site_concurrency)
+            failed = await crawl_sites([crawl_site], concurrency=concurrency, per_host_interval=0, backoff=0,
+                                       convert_workers=1, **options)
+            return crawl_site, failed[index_url]
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def crawl_two_sites(site: FakeSite, downdir, concurrency, per_site_concurrency):
+    """同时爬取模拟服务上的 /t/ 和 /u/ 两个站点，per_site_concurrency 为两个站点各自的并发上限"""
+    async def main():
+        runner, index_url = await start_site(site)
+        try:
+            targets = [CrawlSite(url, os.path.join(str(downdir), name), limit)
+                            for url, name, limit in zip((index_url, index_url[:-2] + 'u/'), ('t', 'u'),
+                                                        per_site_concurrency)]
+            failed = await crawl_sites(targets, concurrency=concurrency, per_host_interval=0, backoff=0,
+                                       convert_workers=1)
+            return targets, failed
+        finally:
+            await runner.cleanup()
+
+    return asyncio.run(main())
+
+
+def fetch(site: FakeSite, path, retries):
+    """用 fetch_url 请求模拟站点的一个页面，返回 (内容或异常, 服务端收到的请求数, 耗时)"""
+    async def main():
+        runner, index_url = await start_site(site)
+        try:
+            async with aiohttp.ClientSession() as session:
+                try:
+                    _, content, _ = await fetch_url(session, index_url + path, asyncio.Semaphore(1),
+                                                    HostRateLimiter(0), retries=retries, backoff=0)
+                    return content
+                except aiohttp.ClientResponseError as e:
+                    return e
+        finally:
+            await runner.cleanup()
+
+    start = time.monotonic()
+    result = asyncio.run(main())
+    return result, site.hits.get('/t/' + path, 0), time.monotonic() - start
+
+
+def test_concurrency_limit(tmp_path):
+    site = FakeSite()
+    crawl_site, failed = crawl(site, tmp_path, concurrency=3)
+
+    assert failed == []
+    assert len(site.hits) == PAGES
+    assert site.max_active == 3
+
+
+def test_per_site_concurrency_limit(tmp_path):
+    site = FakeSite()
+    crawl(site, tmp_path, concurrency=8, per_site_concurrency=2)
+
+    assert site.max_active == 2
+
+
+def test_site_at_its_limit_does_not_hold_global_slots(tmp_path):
+    # /t/ 同时只能处理一个页面，其余两个全局名额应一直用于 /u/，而不是等在 /t/ 的上限上
+    site = FakeSite()
+    sites, failed = crawl_two_sites(site, tmp_path, concurrency=3, per_site_concurrency=(1, PAGES))
+
+    assert failed == {crawl_site.index_url: [] for crawl_site in sites}
+    assert [crawl_site.stats['downloaded'] for crawl_site in sites] == [PAGES, PAGES]
+    assert site.max_active == 3
+
+
+@pytest.mark.parametrize('status, retry_after', [(500, None), (503, None), (429, None), (503, '1'), (429, '1')])
+def test_retries_on_5xx_and_429(status, retry_after):
+    site = FakeSite(delay=0)
+    site.failures['/t/p1.html'] = [(status, retry_after)] * 2
+
+    content, hits, elapsed = fetch(site, 'p1.html', retries=2)
+
+    assert content == make_page(1).encode()
+    assert hits == 3
+    # backoff 为 0，只有 Retry-After 会让重试前等待
+    if retry_after:
+        assert elapsed >= 2
+    else:
+        assert elapsed < 1
+
+
+def test_retry_after_http_date():
+    site = FakeSite(delay=0)
+    site.failures['/t/p1.html'] = [(429, email.utils.formatdate(time.time() + 2, usegmt=True))]
+
+    content, hits, elapsed = fetch(site, 'p1.html', retries=1)
+
+    assert content == make_page(1).encode()
+    assert hits == 2
+    assert elapsed >= 1
+
+
+def test_retry_after_is_capped(monkeypatch):
+    monkeypatch.setattr(data_crawler, 'MAX_RETRY_AFTER', 0.1)
+    site = FakeSite(delay=0)
+    site.failures['/t/p1.html'] = [(503, '3600')]
+
+    content, hits, elapsed = fetch(site, 'p1.html', retries=1)
+
+    assert content == make_page(1).encode()
+    assert elapsed < 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('5') == 5
+    assert parse_retry_after(' 7 ') == 7
+    assert parse_retry_after('86400') == data_crawler.MAX_RETRY_AFTER
+    assert parse_retry_after(email.utils.formatdate(time.time() - 60, usegmt=True)) == 0
+    assert 8 <= parse_retry_after(email.utils.formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+def test_gives_up_after_retries():
+    site = FakeSite(delay=0)
+    site.failures['/t/p1.html'] = [503] * 3
+
+    error, hits, _ = fetch(site, 'p1.html', retries=2)
+
+    assert isinstance(error, aiohttp.ClientResponseError) and error.status == 503
+    assert hits == 3
+
+
+def test_client_error_is_not_retried():
+    site = FakeSite(delay=0)
+    site.failures['/t/p1.html'] = [404]
+
+    error, hits, _ = fetch(site, 'p1.html', retries=2)
+
+    assert isinstance(error, aiohttp.ClientResponseError) and error.status == 404
+    assert hits == 1
+
+
+def test_failed_page_is_retried_on_next_run(tmp_path):
+    site = FakeSite(delay=0)
+    site.failures['/t/p2.html'] = [503] * 3
+    crawl_site, failed = crawl(site, tmp_path, retries=2)
+    assert failed == [crawl_site.links[2][1]]
+    assert crawl_site.stats['downloaded'] == PAGES - 1
+
+    # 检查点保留，重新运行只请求失败的页面
+    site.hits.clear()
+    crawl_site, failed = crawl(site, tmp_path, retries=2)
+    assert failed == []
+    assert site.hits == {'/t/p2.html': 1}
+    assert crawl_site.stats['resumed'] == PAGES - 1
+
+
+def test_etag_304_skips_conversion(tmp_path, monkeypatch):
+    site = FakeSite(delay=0)
+    crawl_site, _ = crawl(site, tmp_path)
+    assert crawl_site.stats['downloaded'] == PAGES
+    assert site.not_modified == 0
+    page_file = os.path.join(tmp_path, '页面 0.md')
+    assert os.path.exists(page_file)
+    written_at = os.stat(page_file).st_mtime_ns
+
+    # 第二次爬取：每个页面都发送条件请求并得到 304，不再写文件
+    saved = []
+    monkeypatch.setattr(data_crawler, 'save_page', lambda *args: saved.append(args))
+    crawl_site, failed = crawl(site, tmp_path)
+
+    assert failed == []
+    assert site.not_modified == PAGES
+    assert crawl_site.stats['not_modified'] == PAGES
+    assert crawl_site.stats['downloaded'] == 0
+    assert saved == []
+    assert os.stat(page_file).st_mtime_ns == written_at
+    assert os.path.exists(os.path.join(tmp_path, '目录.md'))
+
+
+def test_304_page_goes_to_sink_that_has_not_seen_it(tmp_path):
+    site = FakeSite(delay=0)
+    crawl(site, tmp_path)
+
+    received = []
+
+    async def on_page(crawl_site, link_url, page, content, commit):
+        received.append(link_url)
+        commit()
+
+    # 只写过文件的页面得到 304 时仍交给新的下游；下游处理过之后不再重复
+    crawl(site, tmp_path, on_page=on_page, write_files=False, sink='graph')
+    assert len(received) == PAGES
+    assert site.not_modified == PAGES
+
+    received.clear()
+    crawl(site, tmp_path, on_page=on_page, write_files=False, sink='graph')
+    assert received == []
@@ -0,0 +1,109 @@
+"""
+kg_pipeline.crawl_into_graph 的离线测试：用假爬虫和假构建器代替网络和 Neo4j
+- 写库线程出错时（包括已经取到结束标记之后的最后一次写库、最后一批抽取）错误要抛出，不能卡住
+用法（在 Knowledge_Graph_Building 目录下）：
+    python -m pytest -q test_kg_pipeline.py
+"""
+import time
+import threading
+
+import pytest
+
+import kg_pipeline
+
+PAGES = 5
+
+
+class FakeSite:
+    downdir = '/tmp/kg_pipeline_test/'
+
+
+class StubBuilder:
+    """
+    只实现流水线用到的 extract_texts 和 write_stream
+
+    write_stream 等爬虫全部入队之后才开始取页面，页面和结束标记因此会被一起取走
+    """
+
+    def __init__(self, crawled: threading.Event, fail_extract=False, fail_flush=False):
+        self.crawled = crawled
+        self.fail_extract = fail_extract
+        self.fail_flush = fail_flush
+        self.written = []
+
+    def extract_texts(self, items):
+        if self.fail_extract:
+            raise RuntimeError("抽取失败")
+        return [{'doc_info': {'file_path': path}} for _, path in items]
+
+    def write_stream(self, documents, flush_docs, batch_size, keep_cache, on_flush=None):
+        self.crawled.wait(5)
+        time.sleep(0.1)
+        for document in documents:
+            self.written.append(document)
+        if self.fail_flush:
+            raise RuntimeError("写库失败")
+        on_flush(self.written)
+        return {'documents': len(self.written)}
+
+
+@pytest.fixture
+def crawled(monkeypatch):
+    """假爬虫：依次提交 PAGES 个页面后返回"""
+    crawled = threading.Event()
+    commits = []
+
+    async def crawl_sites(sites, on_page=None, **options):
+        for i in range(PAGES):
+            await on_page(FakeSite(), f'http://example.com/p{i}.html', {'file_name': f'p{i}.md'},
+                          f'# 页面 {i}', lambda i=i: commits.append(i))
+        crawled.set()
+        return {}
+
+    monkeypatch.setattr(kg_pipeline.data_crawler, 'crawl_sites', crawl_sites)
+    crawled.commits = commits
+    return crawled
+
+
+def run_pipeline(builder):
+    """在线程中运行流水线，返回 (结果或异常, 是否在限定时间内结束)"""
+    outcome = []
+
+    def run():
+        try:
+            outcome.append(kg_pipeline.crawl_into_graph(builder, [], chunksize=16))
+        except Exception as e:
+            outcome.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(10)
+    return (outcome[0] if outcome else None), not thread.is_alive()
+
+
+def test_pages_are_committed_after_write(crawled):
+    builder = StubBuilder(crawled)
+    result, finished = run_pipeline(builder)
+
+    assert finished
+    assert result == {'failed': {}, 'documents': PAGES}
+    assert sorted(crawled.commits) == list(range(PAGES))
+
+
+def test_failing_final_flush_raises_instead_of_hanging(crawled):
+    builder = StubBuilder(crawled, fail_flush=True)
+    error, finished = run_pipeline(builder)
+
+    assert finished, "写库线程取到结束标记后出错，流水线卡住"
+    assert isinstance(error, RuntimeError) and str(error) == "写库失败"
+    assert len(builder.written) == PAGES
+    assert crawled.commits == []
+
+
+def test_failing_last_extract_raises_instead_of_hanging(crawled):
+    builder = StubBuilder(crawled, fail_extract=True)
+    error, finished = run_pipeline(builder)
+
+    assert finished, "最后一批抽取出错，流水线卡住"
+    assert isinstance(error, RuntimeError) and str(error) == "抽取失败"
+    assert crawled.commits == []
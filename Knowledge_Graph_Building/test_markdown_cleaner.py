@@ -0,0 +1,47 @@
+"""
+markdown_cleaner.clean_markdown 与原实现 clean_markdown_legacy 输出一致的校验
+- 样例：quick_start 的示例文档、爬虫生成的教程页面以及各类边界情况（GOLDEN_SAMPLES）
+- 随机输入：一半是由常见Markdown行拼成的文档，一半是由标记符号和各类空白组成的随机字符串
+用法（在 Knowledge_Graph_Building 目录下）：
+    python -m pytest -q test_markdown_cleaner.py
+"""
+import random
+
+import pytest
+
+from markdown_cleaner import GOLDEN_SAMPLES, clean_markdown, clean_markdown_legacy
+
+# 随机生成的行式Markdown用到的行
+RANDOM_LINES = [
+    '# 标题', '## 二级 ', '- 项', '* [链接](a.md)', '+ `code`', '> 引用', '>不是', ' > x', '| a | b |', '|---|---|',
+    '```', '```py', 'code line', '![img](p.png)', 'text [a](b) more', '  - nested', '', '   ', '#tag C#', 'a | b',
+    '`x` and `y`', '[x] (y)', '****', '- # h', '> - q', '1. ord'
+]
+
+# 随机字符串用到的字符：各类标记符号和空白
+RANDOM_ALPHABET = '`![]()#->*+| \n\ta\u3000\xa0\r\x0c'
+
+# 每类随机输入的数量，分成几组以便出错时缩小范围
+RANDOM_COUNT = 50000
+RANDOM_GROUPS = 10
+
+
+@pytest.mark.parametrize('sample', GOLDEN_SAMPLES)
+def test_golden_samples(sample):
+    assert clean_markdown(sample) == clean_markdown_legacy(sample)
+
+
+@pytest.mark.parametrize('seed', range(RANDOM_GROUPS))
+def test_random_inputs(seed):
+    rng = random.Random(seed)
+    for i in range(RANDOM_COUNT // RANDOM_GROUPS):
+        lines = rng.choices(RANDOM_LINES, k=rng.randint(0, 12))
+        generated = ('\n'.join(lines) + rng.choice(('', '\n', '\n\n\n')),
+                     ''.join(rng.choices(RANDOM_ALPHABET, k=rng.randint(0, 30))))
+        for sample in generated:
+            assert clean_markdown(sample) == clean_markdown_legacy(sample), f"随机输入 {i}: {sample!r}"
+
+
+def test_large_document():
+    text = '\n\n'.join(GOLDEN_SAMPLES) * 50
+    assert clean_markdown(text) == clean_markdown_legacy(text)
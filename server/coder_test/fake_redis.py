@@ -0,0 +1,186 @@
+"""
+测试用的进程内 Redis：只实现缓存代码用到的命令，多个客户端（同步或异步）共享同一个 FakeRedisServer，模拟多个进程连同一个 Redis
+"""
+import time
+import threading
+
+
+class FakeRedisServer:
+    """保存数据和过期时间，命令都在锁内执行"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.lock = threading.RLock()
+        # 执行 SET 之前调用，测试用它控制并发时序
+        self.before_set = None
+
+    def _alive(self, key):
+        expires = self.expires.get(key)
+        if expires is not None and expires <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return key in self.data
+
+    def get(self, key):
+        with self.lock:
+            return self.data[key] if self._alive(key) else None
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        if self.before_set is not None:
+            self.before_set(key, nx)
+        with self.lock:
+            if nx and self._alive(key):
+                return None
+            self.data[key] = value.encode() if isinstance(value, str) else value
+            self.expires.pop(key, None)
+            if ex is not None:
+                self.expires[key] = time.time() + ex
+            elif px is not None:
+                self.expires[key] = time.time() + px / 1000
+            return True
+
+    def delete(self, *keys):
+        with self.lock:
+            deleted = sum(1 for key in keys if self._alive(key))
+            for key in keys:
+                self.data.pop(key, None)
+                self.expires.pop(key, None)
+            return deleted
+
+    def sadd(self, key, *members):
+        with self.lock:
+            members = {member.encode() if isinstance(member, str) else member for member in members}
+            if not self._alive(key):
+                self.data[key] = set()
+            current = self.data[key]
+            added = len(members - current)
+            current.update(members)
+            return added
+
+    def scard(self, key):
+        with self.lock:
+            return len(self.data[key]) if self._alive(key) else 0
+
+    def srem(self, key, *members):
+        with self.lock:
+            if not self._alive(key):
+                return 0
+            members = {member.encode() if isinstance(member, str) else member for member in members}
+            removed = len(members & self.data[key])
+            self.data[key] -= members
+            return removed
+
+    def smembers(self, key):
+        with self.lock:
+            return set(self.data[key]) if self._alive(key) else set()
+
+    def exists(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if self._alive(key.decode() if isinstance(key, bytes) else key))
+
+    def expire(self, key, seconds):
+        with self.lock:
+            if not self._alive(key):
+                return False
+            self.expires[key] = time.time() + seconds
+            return True
+
+    def release_lock(self, key, token):
+        with self.lock:
+            if self.get(key) == (token.encode() if isinstance(token, str) else token):
+                return self.delete(key)
+            return 0
+
+
+class FakePipeline:
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+        self.commands = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.commands.append((name, args, kwargs))
+            return self
+        return command
+
+    def execute(self):
+        commands, self.commands = self.commands, []
+        return [getattr(self.server, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+
+class FakeRedis:
+    """同步客户端（redis.Redis 的子集）"""
+
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+
+    def get(self, key):
+        return self.server.get(key)
+
+    def mget(self, keys):
+        return [self.server.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        return self.server.set(key, value, ex=ex, px=px, nx=nx)
+
+    def delete(self, *keys):
+        return self.server.delete(*keys)
+
+    def srem(self, key, *members):
+        return self.server.srem(key, *members)
+
+    def sscan_iter(self, key, count=None):
+        return iter(self.server.smembers(key))
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self.server)
+
+    def register_script(self, script):
+        # 缓存代码只注册了释放锁的脚本
+        return lambda keys, args: self.server.release_lock(keys[0], args[0])
+
+
+class FakeAsyncPipeline(FakePipeline):
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.commands = []
+
+    async def execute(self):
+        return FakePipeline.execute(self)
+
+
+class FakeAsyncRedis:
+    """异步客户端（redis.asyncio.Redis 的子集），与 FakeRedis 共用 FakeRedisServer 时模拟同步和异步的进程共用 Redis"""
+
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+
+    async def get(self, key):
+        return self.server.get(key)
+
+    async def mget(self, keys):
+        return [self.server.get(key) for key in keys]
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        return self.server.set(key, value, ex=ex, px=px, nx=nx)
+
+    async def delete(self, *keys):
+        return self.server.delete(*keys)
+
+    async def srem(self, key, *members):
+        return self.server.srem(key, *members)
+
+    async def sscan_iter(self, key, count=None):
+        for member in self.server.smembers(key):
+            yield member
+
+    def pipeline(self, transaction=True):
+        return FakeAsyncPipeline(self.server)
+
+    def register_script(self, script):
+        async def release(keys, args):
+            return self.server.release_lock(keys[0], args[0])
+        return release
@@ -0,0 +1,113 @@
+"""
+对比阻塞与异步两种数据访问方式在并发请求下的吞吐量和延迟
+
+在同一个事件循环中挂两个接口：
+- /blocking：async 接口中直接调用同步的 DatabaseManager（改造前的写法），查询期间事件循环被占住
+- /async：调用 AsyncDatabaseManager，等待 Neo4j/Redis 返回时事件循环继续处理其他请求
+
+用法（在 server 目录下，需要能连上 .env 中配置的 Neo4j，--cached 时还需要 Redis）：
+    python -m coder_test.load_test --requests 2000 --concurrency 100
+    python -m coder_test.load_test --cached
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI
+
+from utils.redis_to_neo4j import DatabaseManager
+from utils.async_redis_to_neo4j import AsyncDatabaseManager
+
+
+DEFAULT_QUERY = "MATCH (n) RETURN count(n) AS node_count"
+
+
+def build_app(query: str, cached: bool) -> FastAPI:
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # 不走缓存时只需要 Neo4j，不启动进程内缓存和失效订阅
+        app.state.sync_db = DatabaseManager(local_cache=cached)
+        app.state.async_db = AsyncDatabaseManager(local_cache=cached)
+        await app.state.async_db.start()
+        yield
+        await app.state.async_db.close()
+        app.state.sync_db.close()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.get("/blocking")
+    async def blocking():
+        db = app.state.sync_db
+        if cached:
+            return db.cached_query(query, ttl=60)
+        return db.run_read_query(query)
+
+    @app.get("/async")
+    async def non_blocking():
+        db = app.state.async_db
+        if cached:
+            return await db.cached_query(query, ttl=60)
+        return await db.run_read_query(query)
+
+    return app
+
+
+async def run_load(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> dict:
+    """
+    用 concurrency 个并发协程一共发送 requests 个请求
+    :return: 吞吐量和延迟分位数
+    """
+    latencies = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'path': path,
+        'requests': requests,
+        'errors': errors,
+        'rps': round(requests / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2)
+    }
+
+
+async def main(args):
+    app = build_app(args.query, args.cached)
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://load-test') as client:
+            for path in ('/blocking', '/async'):
+                # 预热连接池和缓存
+                await run_load(client, path, args.concurrency, args.concurrency)
+                result = await run_load(client, path, args.requests, args.concurrency)
+                print(result)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="阻塞与异步数据访问的并发压测")
+    parser.add_argument("--requests", type=int, default=2000, help="每个接口的请求数")
+    parser.add_argument("--concurrency", type=int, default=100, help="并发请求数")
+    parser.add_argument("--query", default=DEFAULT_QUERY, help="每个请求执行的 Cypher 语句")
+    parser.add_argument("--cached", action="store_true", help="通过读穿缓存查询（需要 Redis）")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
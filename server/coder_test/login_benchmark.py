@@ -0,0 +1,160 @@
+"""
+登录接口的并发压测：对比在事件循环中直接校验密码哈希与放到 PasswordHasher 线程池中校验
+
+在同一个事件循环中挂三个接口：
+- /login-inline：async 接口中直接调用 verify_password，计算哈希期间事件循环被占住
+- /login-offload：await PasswordHasher.verify，计算在线程池中进行
+- /ping：不做任何事，压测登录的同时测它的延迟，反映其他请求被拖慢的程度
+
+服务端的事件循环跑在单独的线程中，客户端在主线程的事件循环中计时，
+服务端事件循环被占住时排队的时间也计入延迟。
+不需要数据库，用户的密码哈希预先算好放在内存中。用法（在 server 目录下）：
+    python -m coder_test.login_benchmark --requests 200 --concurrency 50
+"""
+import time
+import asyncio
+import threading
+import argparse
+import statistics
+from contextlib import asynccontextmanager
+
+import httpx
+from fastapi import FastAPI, HTTPException
+
+from utils.password_hasher import PasswordHasher, HASH_WORKERS, hash_password, verify_password
+
+
+PASSWORD = 'correct horse battery staple'
+
+
+def build_app(max_workers: int) -> FastAPI:
+    stored = hash_password(PASSWORD)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        app.state.hasher = PasswordHasher(max_workers)
+        yield
+        app.state.hasher.close()
+
+    app = FastAPI(lifespan=lifespan)
+
+    @app.post("/login-inline")
+    async def login_inline():
+        if not verify_password(PASSWORD, stored):
+            raise HTTPException(status_code=401)
+        return {'ok': True}
+
+    @app.post("/login-offload")
+    async def login_offload():
+        if not await app.state.hasher.verify(PASSWORD, stored):
+            raise HTTPException(status_code=401)
+        return {'ok': True}
+
+    @app.get("/ping")
+    async def ping():
+        return {'ok': True}
+
+    return app
+
+
+def summarize(latencies, elapsed=None) -> dict:
+    latencies = sorted(latencies)
+    summary = {
+        'count': len(latencies),
+        'p50_ms': round(statistics.median(latencies) * 1000, 2),
+        'p99_ms': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000, 2)
+    }
+    if elapsed is not None:
+        summary['rps'] = round(len(latencies) / elapsed, 1)
+    return summary
+
+
+class Server:
+    """在单独线程的事件循环中运行应用，供主线程发送请求"""
+
+    def __init__(self, app: FastAPI):
+        self.app = app
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.client = None
+        self._lifespan = None
+
+    def start(self):
+        self.thread.start()
+        self.submit(self._start()).result()
+
+    def submit(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    async def request(self, method: str, path: str) -> httpx.Response:
+        return await asyncio.wrap_future(self.submit(self.client.request(method, path)))
+
+    def stop(self):
+        self.submit(self._stop()).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def _start(self):
+        self._lifespan = self.app.router.lifespan_context(self.app)
+        await self._lifespan.__aenter__()
+        transport = httpx.ASGITransport(app=self.app)
+        self.client = httpx.AsyncClient(transport=transport, base_url='http://benchmark')
+
+    async def _stop(self):
+        await self.client.aclose()
+        await self._lifespan.__aexit__(None, None, None)
+
+
+async def run_load(server: Server, path: str, requests: int, concurrency: int) -> dict:
+    """
+    用 concurrency 个并发协程一共发送 requests 个登录请求，同时每 10ms 请求一次 /ping
+    :return: 登录和 /ping 的延迟分位数
+    """
+    login_latencies, ping_latencies = [], []
+    remaining = iter(range(requests))
+    done = asyncio.Event()
+
+    async def worker():
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await server.request('POST', path)
+            response.raise_for_status()
+            login_latencies.append(time.perf_counter() - start)
+
+    async def prober():
+        while not done.is_set():
+            start = time.perf_counter()
+            await server.request('GET', '/ping')
+            ping_latencies.append(time.perf_counter() - start)
+            await asyncio.sleep(0.01)
+
+    probe = asyncio.create_task(prober())
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe
+
+    return {'path': path, 'login': summarize(login_latencies, elapsed), 'ping': summarize(ping_latencies)}
+
+
+async def main(args):
+    server = Server(build_app(args.workers))
+    server.start()
+    try:
+        for path in ('/login-inline', '/login-offload'):
+            print(await run_load(server, path, args.requests, args.concurrency))
+    finally:
+        server.stop()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="登录密码校验的并发压测")
+    parser.add_argument("--requests", type=int, default=200, help="每个接口的登录请求数")
+    parser.add_argument("--concurrency", type=int, default=50, help="并发请求数")
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS, help="PasswordHasher 的线程数")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,86 @@
+"""
+CacheCodec 的往返测试：时间类型读回后类型和时区不变，用户数据中的 $t 键不会被当成类型标记
+用法（在 server 目录下）：
+    python -m pytest -q coder_test/test_cache_codec.py
+"""
+import datetime
+import zoneinfo
+
+import orjson
+import pytest
+import pytz
+from neo4j import time as neo4j_time
+
+from utils.cache_codec import CacheCodec, FORMAT_VERSION, OrjsonSerializer, EXT_NEO4J_DATETIME
+
+SERIALIZERS = ['orjson', 'msgpack']
+
+BERLIN = pytz.timezone('Europe/Berlin')
+
+
+def round_trip(value, serializer):
+    codec = CacheCodec(serializer)
+    return codec.loads(codec.dumps(value))
+
+
+@pytest.mark.parametrize('serializer', SERIALIZERS)
+def test_neo4j_datetime_keeps_named_zone(serializer):
+    value = BERLIN.localize(neo4j_time.DateTime(2024, 3, 30, 12, 0, 0, 123456789))
+
+    result = round_trip(value, serializer)
+
+    assert isinstance(result, neo4j_time.DateTime)
+    assert result == value
+    assert result.nanosecond == 123456789
+    assert result.tzinfo.zone == 'Europe/Berlin'
+    # 跨过夏令时切换后按时区规则换算，偏移量从 +1 变为 +2
+    later = datetime.datetime(2024, 3, 31, 12, tzinfo=datetime.timezone.utc).astimezone(result.tzinfo)
+    assert later.utcoffset() == datetime.timedelta(hours=2)
+
+
+@pytest.mark.parametrize('serializer', SERIALIZERS)
+@pytest.mark.parametrize('value', [
+    BERLIN.localize(datetime.datetime(2024, 7, 1, 8, 30)),
+    datetime.datetime(2024, 1, 1, 9, tzinfo=zoneinfo.ZoneInfo('Asia/Shanghai')),
+    datetime.datetime(2024, 1, 1, 9, tzinfo=pytz.utc),
+    datetime.datetime(2024, 1, 1, 9, tzinfo=datetime.timezone(datetime.timedelta(hours=8))),
+    datetime.datetime(2024, 1, 1, 9),
+    neo4j_time.DateTime(2024, 1, 1, 9, 0, 0, 1, tzinfo=pytz.FixedOffset(120)),
+], ids=['pytz', 'zoneinfo', 'pytz-utc', 'fixed-offset', 'naive', 'neo4j-fixed-offset'])
+def test_datetime_round_trips_with_its_zone(serializer, value):
+    result = round_trip(value, serializer)
+
+    assert type(result) is type(value)
+    assert result == value
+    assert repr(result.tzinfo) == repr(value.tzinfo)
+
+
+@pytest.mark.parametrize('serializer', SERIALIZERS)
+def test_user_dict_shaped_like_type_mark_is_kept(serializer):
+    value = {
+        '$t': EXT_NEO4J_DATETIME,
+        'v': '2024-01-01T00:00:00+00:00',
+        'nested': [{'$t': 1, 'v': 'x'}, {'$$t': 2}],
+        'when': neo4j_time.Date(2024, 1, 1),
+    }
+
+    assert round_trip(value, serializer) == value
+    assert round_trip({'$t': 1, 'v': '2020-01-01'}, serializer) == {'$t': 1, 'v': '2020-01-01'}
+
+
+def test_orjson_without_type_marks_is_encoded_once():
+    serializer = OrjsonSerializer()
+    value = {'$price': 1, 'name': 'x'}
+
+    assert serializer.dumps(value) == orjson.dumps(value)
+
+
+def test_orjson_reads_entries_written_before_zone_names():
+    # 之前的版本：时间只存 ISO 字符串，也没有外层的转义标记
+    data = orjson.dumps({'when': {'$t': EXT_NEO4J_DATETIME, 'v': '2024-07-01T12:30:00+02:00'}, '$k': 1})
+    payload = bytes((FORMAT_VERSION, OrjsonSerializer.id)) + data
+
+    result = CacheCodec().loads(payload)
+
+    assert result['when'] == neo4j_time.DateTime(2024, 7, 1, 12, 30, 0, tzinfo=pytz.FixedOffset(120))
+    assert result['$k'] == 1
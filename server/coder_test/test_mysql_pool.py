@@ -0,0 +1,286 @@
+"""
+MySQLPool / AsyncMySQLPool 的测试
+
+- 复用连接时的读一致性：同一个池中连接先后两次读取，中间另一个连接写入并提交，第二次必须读到新数据
+- 取连接超时、空闲过期、健康检查失败、连接出错后丢弃，以及 AsyncMySQLPool.run 的等待和超时
+- 不需要数据库的用例用假连接模拟 REPEATABLE READ：关闭自动提交时第一次读取开启事务并固定快照，提交或回滚后结束
+- 能连上 MYSQL_CONFIG 配置的 MySQL 时再在真实数据库上验证一遍，连不上时跳过
+用法（在 server 目录下）：
+    python -m pytest -q coder_test/test_mysql_pool.py
+"""
+import time
+import asyncio
+import threading
+
+import pymysql
+import pytest
+from pymysql.constants import SERVER_STATUS
+
+from utils import mysql_client
+from utils.mysql_client import MySQLPool, AsyncMySQLPool, PoolTimeoutError, MYSQL_CONFIG
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.users = []
+        # 每次建立连接时传给 pymysql.connect 的参数
+        self.connects = []
+
+
+class FakeConnection:
+    """按 REPEATABLE READ 的行为模拟 pymysql 连接，只支持读写用户列表"""
+
+    def __init__(self, fake_database: FakeDatabase, autocommit: bool = False, **_):
+        self.database = fake_database
+        self.autocommit_mode = autocommit
+        self.open = True
+        self.rollbacks = 0
+        # 设置后 ping 抛出该异常，模拟已被服务端断开的连接
+        self.ping_error = None
+        self._snapshot = None
+
+    @property
+    def server_status(self):
+        status = SERVER_STATUS.SERVER_STATUS_AUTOCOMMIT if self.autocommit_mode else 0
+        if self._snapshot is not None:
+            status |= SERVER_STATUS.SERVER_STATUS_IN_TRANS
+        return status
+
+    def read_users(self):
+        if self.autocommit_mode:
+            return list(self.database.users)
+        if self._snapshot is None:
+            self._snapshot = list(self.database.users)
+        return list(self._snapshot)
+
+    def insert_user(self, username):
+        self.database.users.append(username)
+
+    def commit(self):
+        self._snapshot = None
+
+    def rollback(self):
+        self.rollbacks += 1
+        self._snapshot = None
+
+    def ping(self, reconnect=False):
+        if self.ping_error is not None:
+            raise self.ping_error
+
+    def close(self):
+        self.open = False
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+
+    def connect(**kwargs):
+        database.connects.append(kwargs)
+        return FakeConnection(database, **kwargs)
+
+    monkeypatch.setattr(mysql_client.pymysql, 'connect', connect)
+    return database
+
+
+def _read_twice_with_commit_between(pool: MySQLPool, writer) -> tuple:
+    with pool.connection() as connection:
+        first_connection = connection
+        before = connection.read_users()
+    writer()
+    with pool.connection() as connection:
+        assert connection is first_connection, "连接池上限为 1，第二次应取到同一个连接"
+        after = connection.read_users()
+    return before, after
+
+
+@pytest.mark.parametrize('autocommit', [True, False])
+def test_reused_connection_sees_committed_rows(database, autocommit):
+    pool = MySQLPool(max_size=1, autocommit=autocommit)
+    writer = FakeConnection(database, autocommit=True)
+
+    before, after = _read_twice_with_commit_between(pool, lambda: writer.insert_user('new_user'))
+
+    assert before == []
+    assert after == ['new_user']
+    pool.close()
+
+
+def test_release_rolls_back_open_transaction(database):
+    pool = MySQLPool(max_size=1, autocommit=False)
+    connection = pool.acquire()
+    connection.read_users()
+    pool.release(connection)
+
+    assert connection.rollbacks == 1
+    assert not connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS
+    pool.close()
+
+
+def test_default_config_uses_autocommit():
+    assert MYSQL_CONFIG['autocommit'] is True
+
+
+def test_connect_kwargs_override_config(database):
+    pool = MySQLPool(max_size=1, autocommit=False)
+    pool.release(pool.acquire())
+
+    assert database.connects == [dict(MYSQL_CONFIG, autocommit=False)]
+    pool.close()
+
+
+def test_acquire_times_out_when_pool_is_exhausted(database):
+    pool = MySQLPool(max_size=1)
+    held = pool.acquire()
+
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire(timeout=0.05)
+    assert time.monotonic() - start >= 0.05
+
+    report = pool.report()
+    assert report['timeouts'] == 1
+    assert report['in_use'] == 1
+    pool.release(held)
+    pool.close()
+
+
+def test_waiter_gets_connection_released_by_another_thread(database):
+    pool = MySQLPool(max_size=1)
+    held = pool.acquire()
+    threading.Timer(0.05, pool.release, args=(held,)).start()
+
+    connection = pool.acquire(timeout=5)
+
+    assert connection is held
+    assert pool.report()['max_wait_ms'] >= 40
+    pool.release(connection)
+    pool.close()
+
+
+def test_idle_connection_expires(database):
+    pool = MySQLPool(max_size=1, max_idle_time=0.01)
+    first = pool.acquire()
+    pool.release(first)
+    time.sleep(0.02)
+
+    second = pool.acquire()
+
+    assert second is not first
+    assert not first.open
+    report = pool.report()
+    assert (report['idle_expired'], report['created'], report['size']) == (1, 2, 1)
+    pool.release(second)
+    pool.close()
+
+
+def test_connection_failing_health_check_is_replaced(database):
+    pool = MySQLPool(max_size=1, health_check_interval=0)
+    first = pool.acquire()
+    first.ping_error = pymysql.err.OperationalError(2006, 'MySQL server has gone away')
+    pool.release(first)
+
+    second = pool.acquire()
+
+    assert second is not first
+    assert not first.open
+    report = pool.report()
+    assert (report['health_check_failures'], report['created'], report['size']) == (1, 2, 1)
+    pool.release(second)
+    pool.close()
+
+
+def test_connection_is_dropped_after_operational_error(database):
+    pool = MySQLPool(max_size=1)
+    with pytest.raises(pymysql.err.OperationalError):
+        with pool.connection() as connection:
+            broken = connection
+            raise pymysql.err.OperationalError(2013, 'Lost connection to MySQL server during query')
+
+    assert not broken.open
+    assert pool.report()['size'] == 0
+    with pool.connection() as connection:
+        assert connection is not broken
+    pool.close()
+
+
+def test_async_run_waits_for_free_connection(database):
+    async def main():
+        pool = AsyncMySQLPool(MySQLPool(max_size=1))
+        used = []
+
+        def query(connection, name):
+            used.append(connection)
+            time.sleep(0.05)
+            return name
+
+        results = await asyncio.gather(pool.run(query, 'a'), pool.run(query, 'b'))
+
+        assert results == ['a', 'b']
+        assert used[0] is used[1]
+        report = pool.report()
+        assert report['async']['acquires'] == 2
+        assert report['async']['max_wait_ms'] >= 40
+        pool.close()
+        pool.pool.close()
+
+    asyncio.run(main())
+
+
+def test_async_run_times_out(database):
+    async def main():
+        pool = AsyncMySQLPool(MySQLPool(max_size=1))
+        slow = asyncio.ensure_future(pool.run(lambda connection: time.sleep(0.2)))
+        await asyncio.sleep(0.02)
+
+        with pytest.raises(PoolTimeoutError):
+            await pool.run(lambda connection: None, timeout=0.05)
+
+        await slow
+        assert pool.report()['async']['timeouts'] == 1
+        pool.close()
+        pool.pool.close()
+
+    asyncio.run(main())
+
+
+def _connect_or_skip(**overrides):
+    try:
+        return pymysql.connect(**dict(MYSQL_CONFIG, connect_timeout=2, **overrides))
+    except pymysql.MySQLError as e:
+        pytest.skip(f"连不上 MySQL：{e}")
+
+
+@pytest.mark.parametrize('autocommit', [True, False])
+def test_reused_connection_sees_committed_rows_on_mysql(autocommit):
+    writer = _connect_or_skip(autocommit=True)
+    table = 'mysql_pool_snapshot_test'
+    try:
+        with writer.cursor() as cursor:
+            cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INT PRIMARY KEY)")
+            cursor.execute(f"DELETE FROM {table}")
+
+        pool = MySQLPool(max_size=1, **dict(MYSQL_CONFIG, autocommit=autocommit))
+
+        def count(connection):
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT COUNT(*) AS n FROM {table}")
+                return cursor.fetchone()['n']
+
+        def insert():
+            with writer.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {table} (id) VALUES (1)")
+            writer.commit()
+
+        with pool.connection() as connection:
+            before = count(connection)
+        insert()
+        with pool.connection() as connection:
+            after = count(connection)
+        pool.close()
+
+        assert (before, after) == (0, 1)
+    finally:
+        with writer.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        writer.close()
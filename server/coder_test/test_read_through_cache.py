@@ -0,0 +1,211 @@
+"""
+ReadThroughCache / AsyncReadThroughCache 合并并发加载的回归测试，用 fake_redis 模拟多个进程共用的 Redis
+用法（在 server 目录下）：
+    python -m pytest -q coder_test/test_read_through_cache.py
+"""
+import time
+import asyncio
+import threading
+
+from coder_test.fake_redis import FakeRedisServer, FakeRedis, FakeAsyncRedis
+from utils.read_through_cache import ReadThroughCache, AsyncReadThroughCache, LOCK_PREFIX
+
+
+def _wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        time.sleep(0.005)
+
+
+def _hold_lock_and_pause_first_attempt(server: FakeRedisServer, key: str) -> threading.Event:
+    """另一个进程持有 key 的计算锁；本进程第一次抢锁时停住，直到返回的事件被设置"""
+    server.set(LOCK_PREFIX + key, b'other-worker', px=60000)
+    resume = threading.Event()
+    paused = []
+
+    def before_set(lock_key, nx):
+        if nx and not paused:
+            paused.append(lock_key)
+            resume.wait(5)
+
+    server.before_set = before_set
+    return resume
+
+
+def test_waiter_of_background_refresh_that_lost_lock_gets_value():
+    server = FakeRedisServer()
+    cache = ReadThroughCache(FakeRedis(server), beta=0, lock_wait=0.1)
+    resume = _hold_lock_and_pause_first_attempt(server, 'k')
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return {'n': len(loads)}
+
+    # 后台刷新先登记为该键的加载者，停在抢锁处
+    refresher = threading.Thread(target=cache._background_load, args=('k', loader, 60, 60, ()))
+    refresher.start()
+    _wait_until(lambda: 'k' in cache._inflight)
+
+    # 未命中的请求合并到后台刷新上等待
+    results = []
+    reader = threading.Thread(target=lambda: results.append(cache.get('k', loader, ttl=60)))
+    reader.start()
+    _wait_until(lambda: cache.stats['coalesced'] == 1)
+
+    # 后台刷新没抢到锁直接返回，等待者必须自己加载，而不是拿到 None
+    resume.set()
+    refresher.join(5)
+    reader.join(5)
+
+    assert results == [{'n': 1}]
+    assert loads == [1]
+    cache.close()
+
+
+def test_batch_waiter_of_background_refresh_that_lost_lock_gets_value():
+    server = FakeRedisServer()
+    cache = ReadThroughCache(FakeRedis(server), beta=0, lock_wait=0.1)
+    resume = _hold_lock_and_pause_first_attempt(server, 'a')
+
+    refresher = threading.Thread(target=cache._background_load, args=('a', lambda: 'stale', 60, 60, ()))
+    refresher.start()
+    _wait_until(lambda: 'a' in cache._inflight)
+
+    results = []
+
+    def load(keys):
+        return {key: key.upper() for key in keys}
+
+    reader = threading.Thread(target=lambda: results.append(cache.get_many(['a', 'b'], load, ttl=60)))
+    reader.start()
+    _wait_until(lambda: cache.stats['coalesced'] == 1)
+
+    resume.set()
+    refresher.join(5)
+    reader.join(5)
+
+    assert results == [{'a': 'A', 'b': 'B'}]
+    cache.close()
+
+
+class PausingAsyncRedis(FakeAsyncRedis):
+    """第一次抢锁时停住，直到 resume 被设置"""
+
+    def __init__(self, server: FakeRedisServer):
+        super().__init__(server)
+        self.resume = asyncio.Event()
+        self.paused = False
+
+    async def set(self, key, value, ex=None, px=None, nx=False):
+        if nx and not self.paused:
+            self.paused = True
+            await self.resume.wait()
+        return await super().set(key, value, ex=ex, px=px, nx=nx)
+
+
+async def _wait_until_async(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("等待超时")
+        await asyncio.sleep(0.005)
+
+
+def test_async_waiter_of_background_refresh_that_lost_lock_gets_value():
+    async def main():
+        server = FakeRedisServer()
+        server.set(LOCK_PREFIX + 'k', b'other-worker', px=60000)
+        client = PausingAsyncRedis(server)
+        cache = AsyncReadThroughCache(client, beta=0, lock_wait=0.1)
+        loads = []
+
+        async def loader():
+            loads.append(1)
+            return {'n': len(loads)}
+
+        refresher = asyncio.create_task(cache._background_load('k', loader, 60, 60, ()))
+        await _wait_until_async(lambda: client.paused)
+        reader = asyncio.create_task(cache.get('k', loader, ttl=60))
+        await _wait_until_async(lambda: cache.stats['coalesced'] == 1)
+
+        client.resume.set()
+        await refresher
+        assert await reader == {'n': 1}
+        assert loads == [1]
+        await cache.close()
+
+    asyncio.run(main())
+
+
+def test_async_coalesces_and_shares_entries_with_sync_cache():
+    async def main():
+        server = FakeRedisServer()
+        cache = AsyncReadThroughCache(FakeAsyncRedis(server), beta=0)
+        loads = []
+
+        async def loader():
+            loads.append(1)
+            await asyncio.sleep(0.05)
+            return [{'name': 'f'}]
+
+        results = await asyncio.gather(*(cache.get('q', loader, ttl=60) for _ in range(20)))
+        assert results == [[{'name': 'f'}]] * 20
+        assert loads == [1]
+        assert cache.report()['coalesced'] == 19
+
+        # 同步的进程读到异步进程写入的条目，不再计算
+        sync_cache = ReadThroughCache(FakeRedis(server), beta=0)
+        assert sync_cache.get('q', lambda: 'recomputed', ttl=60) == [{'name': 'f'}]
+        sync_cache.close()
+
+        async def load(keys):
+            return {key: key.upper() for key in keys if key != 'none'}
+
+        assert await cache.get_many(['q', 'a', 'none'], load, ttl=60) == {'q': [{'name': 'f'}], 'a': 'A'}
+        await cache.close()
+
+    asyncio.run(main())
+
+
+def _expire_all_entries(server: FakeRedisServer):
+    """让已写入的缓存条目全部过期，标签集合保留"""
+    for key in list(server.data):
+        if not key.startswith('tag:'):
+            server.expires[key] = 0
+
+
+def test_tag_set_is_pruned_when_it_grows_past_limit():
+    server = FakeRedisServer()
+    cache = ReadThroughCache(FakeRedis(server), beta=0, tag_max_members=5)
+    for i in range(5):
+        cache.get(f'k{i}', lambda: i, ttl=60, tags=('neo4j',))
+    _expire_all_entries(server)
+
+    # 第6个成员让集合超过上限，后台清理掉已过期的5个
+    cache.get('k5', lambda: 5, ttl=60, tags=('neo4j',))
+    cache.close()
+
+    assert server.smembers('tag:neo4j') == {b'k5'}
+    assert cache.report()['tag_prunes'] == 1
+
+
+def test_async_tag_set_is_pruned_when_it_grows_past_limit():
+    async def main():
+        server = FakeRedisServer()
+        cache = AsyncReadThroughCache(FakeAsyncRedis(server), beta=0, tag_max_members=5)
+
+        async def load(keys):
+            return {key: key for key in keys}
+
+        await cache.get_many([f'k{i}' for i in range(5)], load, ttl=60, tags=lambda key: ('neo4j',))
+        _expire_all_entries(server)
+        await cache.get_many(['k5', 'k6'], load, ttl=60, tags=lambda key: ('neo4j',))
+        await cache.close()
+
+        assert server.smembers('tag:neo4j') == {b'k5', b'k6'}
+        assert cache.report()['tag_prunes'] == 1
+
+    asyncio.run(main())
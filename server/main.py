@@ -1,10 +1,31 @@
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from module.index import index_resource
 from configs import c_ors
+from utils.async_redis_to_neo4j import AsyncDatabaseManager
+from utils.mysql_client import close_mysql_pools
+from utils.password_hasher import close_password_hasher
+from utils.session_store import SessionStore
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 每个 worker 启动时创建异步的 Redis/Neo4j 连接池，退出时关闭
+    app.state.db = AsyncDatabaseManager()
+    # 登录会话与缓存共用 Redis 连接池和失效通知
+    app.state.sessions = SessionStore(app.state.db.cache_client, app.state.db.codec,
+                                      bus=app.state.db.invalidation_bus)
+    await app.state.db.start()
+    yield
+    await app.state.db.close()
+    close_mysql_pools()
+    close_password_hasher()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # 配置跨域请求
 app.add_middleware(
@@ -1,15 +1,23 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status
 from .models import *
 from .service import *
+from utils.mysql_client import PoolTimeoutError
+from utils.session_store import SessionStore, get_current_user, get_session_store, get_token
 
 
 router = APIRouter()
 
 
 @router.post("/login", response_model=LoginResponse)
-async def login(login_request: LoginRequest):
+async def login(login_request: LoginRequest, sessions: SessionStore = Depends(get_session_store)):
     """用户登录接口"""
-    user = authenticate_user(login_request.username, login_request.password)
+    try:
+        user = await authenticate_user_async(login_request.username, login_request.password)
+    except PoolTimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后重试"
+        )
 
     if not user:
         raise HTTPException(
@@ -18,13 +26,28 @@ async def login(login_request: LoginRequest):
         )
 
     user_info = get_user_info(user)
+    token = await sessions.create(get_session_info(user))
 
     return LoginResponse(
         message="登录成功",
-        user=user_info
+        user=user_info,
+        token=token
     )
 
 
+@router.post("/logout")
+async def logout(token: str = Depends(get_token), sessions: SessionStore = Depends(get_session_store)):
+    """退出登录接口"""
+    await sessions.revoke(token)
+    return {"message": "已退出登录"}
+
+
+@router.get("/me")
+async def me(current_user: dict = Depends(get_current_user)):
+    """当前登录用户"""
+    return {"username": current_user["username"]}
+
+
 @router.post("/reg", response_model=LoginResponse)
 async def reg(reg_request: RegRequest):
     """用户注册接口"""
@@ -36,7 +59,13 @@ async def reg(reg_request: RegRequest):
             detail="两次密码不一致"
         )
 
-    user = reg_user(reg_request.username, reg_request.password)
+    try:
+        user = await reg_user_async(reg_request.username, reg_request.password)
+    except PoolTimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="服务繁忙，请稍后重试"
+        )
 
     if not user:
         raise HTTPException(
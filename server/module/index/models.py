@@ -9,7 +9,7 @@ class User(BaseModel):
 
 class UserInDB(User):
     # 拓展用户模型用于数据库存储
-    pass
+    id: Optional[int] = None
 
 
 class LoginRequest(BaseModel):
@@ -20,6 +20,8 @@ class LoginRequest(BaseModel):
 class LoginResponse(BaseModel):
     message: str
     user: Optional[dict] = None
+    # 登录成功时返回，之后的请求放在请求头 Authorization: Bearer <token> 中
+    token: Optional[str] = None
 
 
 class RegRequest(LoginRequest):
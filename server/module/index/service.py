@@ -1,23 +1,65 @@
 from typing import Optional, Dict
 from .models import UserInDB
-from utils.mysql_client import get_mysql_connection
+from utils.mysql_client import get_mysql_pool, get_async_mysql_pool
+from utils.password_hasher import hash_password, verify_password, needs_rehash, get_password_hasher
+
+
+def _find_user(connection, username: str) -> Optional[Dict]:
+    with connection.cursor() as cursor:
+        query_sql = "SELECT id, username, password FROM users WHERE username=%s"
+        cursor.execute(query_sql, (username,))
+        return cursor.fetchone()
+
+
+def _insert_user(connection, username: str, password_hash: str) -> Optional[UserInDB]:
+    with connection.cursor() as cursor:
+        insert_sql = "INSERT INTO users(username,password) VALUES (%s,%s)"
+        result = cursor.execute(insert_sql, (username, password_hash))
+        connection.commit()
+        if result:
+            return UserInDB(id=cursor.lastrowid, username=username, password=password_hash)
+        else:
+            return None
+
+
+def _update_password(connection, user_id: int, old_password: str, password_hash: str):
+    """更新密码哈希；密码字段已被其他请求改过时不覆盖"""
+    with connection.cursor() as cursor:
+        update_sql = "UPDATE users SET password=%s WHERE id=%s AND password=%s"
+        cursor.execute(update_sql, (password_hash, user_id, old_password))
+        connection.commit()
 
 
 # 登录
 def authenticate_user(username:str, password:str) -> Optional[UserInDB]:
     """验证用户凭证"""
-    connection = get_mysql_connection()
-    try:
-        with connection.cursor() as cursor:
-            query_sql = "SELECT * FROM users WHERE username=%s AND password=%s"
-            cursor.execute(query_sql,(username,password))
-            result = cursor.fetchone()
-            if result:
-                return UserInDB(**result)
-            else:
-                return None
-    finally:
-        connection.close()
+    with get_mysql_pool().connection() as connection:
+        row = _find_user(connection, username)
+        if not row or not verify_password(password, row['password']):
+            return None
+        if needs_rehash(row['password']):
+            password_hash = hash_password(password)
+            _update_password(connection, row['id'], row['password'], password_hash)
+            row['password'] = password_hash
+        return UserInDB(**row)
+
+
+async def authenticate_user_async(username: str, password: str) -> Optional[UserInDB]:
+    """
+    验证用户凭证：查询在 MySQL 线程池中执行，哈希校验在密码哈希线程池中执行，都不阻塞事件循环；
+    旧的明文密码或参数过时的哈希在登录成功后重新计算并写回
+    """
+    mysql_pool = get_async_mysql_pool()
+    hasher = get_password_hasher()
+
+    row = await mysql_pool.run(_find_user, username)
+    if not await hasher.verify(password, row['password'] if row else None):
+        return None
+    if needs_rehash(row['password']):
+        password_hash = await hasher.hash(password)
+        await mysql_pool.run(_update_password, row['id'], row['password'], password_hash)
+        row['password'] = password_hash
+    return UserInDB(**row)
 
 
 def get_user_info(user: UserInDB) -> dict:
@@ -26,18 +68,22 @@ def get_user_info(user: UserInDB) -> dict:
         "username": user.username
     }
 
+
+def get_session_info(user: UserInDB) -> dict:
+    """登录会话中保存的用户信息，之后的请求由它识别用户，不再查询 users 表"""
+    return {
+        "user_id": user.id,
+        "username": user.username
+    }
+
 # 注册
 def reg_user(username:str, password:str):
     """验证用户凭证"""
-    connection = get_mysql_connection()
-    try:
-        with connection.cursor() as cursor:
-            insert_sql = "INSERT INTO users(username,password) VALUES (%s,%s)"
-            result = cursor.execute(insert_sql, (username, password))
-            connection.commit()
-            if result:
-                return UserInDB(username=username, password=password)
-            else:
-                return None
-    finally:
-        connection.close()
\ No newline at end of file
+    with get_mysql_pool().connection() as connection:
+        return _insert_user(connection, username, hash_password(password))
+
+
+async def reg_user_async(username: str, password: str) -> Optional[UserInDB]:
+    """注册用户，密码哈希在线程池中计算"""
+    password_hash = await get_password_hasher().hash(password)
+    return await get_async_mysql_pool().run(_insert_user, username, password_hash)
@@ -0,0 +1,244 @@
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import redis.asyncio as aioredis
+from fastapi import Request
+from neo4j import AsyncGraphDatabase
+
+from utils.cache_codec import CacheCodec, CacheDecodeError
+from utils.local_cache import LocalCache, AsyncInvalidationBus, MISSING
+from utils.cache_invalidation import add_to_tags, AsyncCacheInvalidator
+from utils.read_through_cache import AsyncReadThroughCache, make_cache_key, STALE_TTL, XFETCH_BETA, LOCK_TTL, LOCK_WAIT
+from utils.redis_to_neo4j import (REDIS_HOST, REDIS_PORT, REDIS_PASSWORD, REDIS_DB, REDIS_MAX_CONNECTIONS,
+                                  REDIS_POOL_TIMEOUT, NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD, NEO4J_MAX_CONNECTIONS,
+                                  GRAPH_CACHE_TAG, GRAPH_VERSION_QUERY, GRAPH_VERSION_KEY,
+                                  GRAPH_VERSION_CHECK_INTERVAL, FRIENDS_QUERY, FRIENDS_BATCH_QUERY)
+
+
+class AsyncDatabaseManager:
+    """
+    DatabaseManager 的异步版本，基于 redis.asyncio 和 Neo4j 异步驱动，供 FastAPI 的 async 接口使用，
+    等待 Redis/Neo4j 返回时不阻塞事件循环
+
+    与 DatabaseManager 使用相同的缓存键和缓存格式，同步和异步的进程可以共用缓存：
+    - 进程内缓存（L1）在 Redis 前面，通过发布/订阅同步失效
+    - 查询结果经 AsyncReadThroughCache 读写，与 DatabaseManager 的 ReadThroughCache 是同一套缓存策略
+      （合并并发加载、Redis 计算锁、XFetch 提前刷新、过期后先返回旧值）
+
+    连接池与事件循环绑定，需在 FastAPI 的 lifespan 中创建、start() 并在退出时 close()（见 main.py）。
+    """
+
+    def __init__(self, codec: CacheCodec = None, local_cache: bool = True, stale_ttl: int = STALE_TTL,
+                 beta: float = XFETCH_BETA, lock_ttl: int = LOCK_TTL, lock_wait: float = LOCK_WAIT):
+        """
+        :param codec: 缓存编解码器
+        :param local_cache: 是否使用进程内缓存
+        :param stale_ttl: 过期后仍可返回旧值的时间（秒）
+        :param beta: 提前刷新的激进程度，为0时不提前刷新
+        :param lock_ttl: 计算锁的过期时间（秒）
+        :param lock_wait: 未抢到锁时等待其他进程写入缓存的最长时间（秒）
+        """
+        # 缓存值是编码后的二进制数据，不自动解码
+        self.redis_pool = aioredis.BlockingConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            password=REDIS_PASSWORD,
+            db=REDIS_DB,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=REDIS_POOL_TIMEOUT
+        )
+        self.cache_client = aioredis.Redis(connection_pool=self.redis_pool)
+        self.codec = codec or CacheCodec()
+
+        self.local_cache = LocalCache() if local_cache else None
+        self.invalidation_bus = None
+        if self.local_cache is not None:
+            self.invalidation_bus = AsyncInvalidationBus(self.cache_client)
+            self.invalidation_bus.attach(self.local_cache)
+
+        self.neo4j_driver = AsyncGraphDatabase.driver(
+            NEO4J_URI,
+            auth=(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=NEO4J_MAX_CONNECTIONS
+        )
+
+        # 查询结果的读穿缓存
+        self.query_cache = AsyncReadThroughCache(self.cache_client, self.codec, stale_ttl=stale_ttl, beta=beta,
+                                                 lock_ttl=lock_ttl, lock_wait=lock_wait, local=self.local_cache,
+                                                 bus=self.invalidation_bus)
+
+        # 按标签失效缓存，不阻塞 Redis
+        self.invalidator = AsyncCacheInvalidator(self.cache_client, self.local_cache, self.invalidation_bus)
+
+        # 上次检查图谱版本号的时间，见 sync_graph_version
+        self._graph_checked_at = float('-inf')
+
+    async def start(self):
+        """开始接收缓存失效通知"""
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.start()
+
+    async def test_connections(self) -> Dict[str, bool]:
+        """测试 redis 和 neo4j 连接"""
+        status = {}
+        try:
+            status['redis'] = bool(await self.cache_client.ping())
+        except aioredis.ConnectionError:
+            status['redis'] = False
+        try:
+            await self.neo4j_driver.verify_connectivity()
+            status['neo4j'] = True
+        except Exception as e:
+            print(f"Neo4j 连接失败：{e}")
+            status['neo4j'] = False
+        return status
+
+    async def get_cached(self, cache_key: str) -> Any:
+        """
+        读取缓存
+        :param cache_key: Redis 缓存键
+        :return: 缓存的值，不存在或无法解码时返回 None
+        """
+        if self.local_cache is not None:
+            value = self.local_cache.get(cache_key)
+            if value is not MISSING:
+                return value
+
+        async with self.cache_client.pipeline(transaction=False) as pipe:
+            pipe.get(cache_key)
+            pipe.ttl(cache_key)
+            payload, remaining = await pipe.execute()
+        if payload is None:
+            return None
+        try:
+            value = self.codec.loads(payload)
+        except CacheDecodeError as e:
+            print(f"缓存无法解码，按未命中处理：{cache_key}（{e}）")
+            return None
+
+        if self.local_cache is not None and remaining and remaining > 0:
+            self.local_cache.set(cache_key, value, remaining)
+        return value
+
+    async def set_cached(self, cache_key: str, ttl: int, value: Any, tags: Iterable[str] = ()):
+        """
+        写入缓存
+        :param cache_key: Redis 缓存键
+        :param ttl: 缓存过期时间
+        :param value: 要缓存的值
+        :param tags: 登记的标签，供按标签失效
+        """
+        async with self.cache_client.pipeline(transaction=False) as pipe:
+            pipe.setex(cache_key, ttl, self.codec.dumps(value))
+            add_to_tags(pipe, cache_key, tags, ttl)
+            await pipe.execute()
+        if self.local_cache is not None:
+            self.local_cache.set(cache_key, value, ttl)
+            await self.invalidation_bus.publish([cache_key])
+
+    async def run_read_query(self, query: str, params: Optional[Dict] = None) -> List[Dict]:
+        """
+        直接在 Neo4j 中执行只读查询
+        :param query: Neo4j 查询语句
+        :param params: 查询参数
+        :return: 查询结果
+        """
+        async with self.neo4j_driver.session() as session:
+            result = await session.run(query, params or {})
+            return [record.data() async for record in result]
+
+    async def cached_query(self, query: str, params: Optional[Dict] = None, ttl: int = 3600,
+                           cache_key: str = None, tags: Iterable[str] = ()) -> Any:
+        """
+        通过读穿缓存执行只读查询，缓存键与 DatabaseManager.cached_query 相同
+        :param query: Neo4j 查询语句
+        :param params: 查询参数
+        :param ttl: 缓存有效时间
+        :param cache_key: 指定缓存键（一般不需要）
+        :param tags: 额外的标签；总会带上 GRAPH_CACHE_TAG
+        :return: 查询结果
+        """
+        await self._check_graph_version()
+        if cache_key is None:
+            cache_key = make_cache_key(query, params)
+        return await self.query_cache.get(cache_key, lambda: self.run_read_query(query, params), ttl,
+                                          tags=(GRAPH_CACHE_TAG, *tags))
+
+    async def get_user_friends(self, user_email: str) -> List[Dict]:
+        """
+        获取用户的朋友列表，与 DatabaseManager.get_user_friends 共用缓存
+        :param user_email: 用户邮箱
+        :return: 朋友列表
+        """
+        return await self.cached_query(FRIENDS_QUERY, {'email': user_email}, ttl=300, tags=(f"user:{user_email}",))
+
+    async def get_users_friends(self, user_emails: Iterable[str]) -> Dict[str, List[Dict]]:
+        """
+        批量获取多个用户的朋友列表：一次 MGET，未命中的用户用一条 UNWIND 查询，再用一个管道写回
+        :param user_emails: 用户邮箱
+        :return: {邮箱: 朋友列表}
+        """
+        await self._check_graph_version()
+        emails = {make_cache_key(FRIENDS_QUERY, {'email': email}): email for email in user_emails}
+
+        async def load(cache_keys):
+            rows = await self.run_read_query(FRIENDS_BATCH_QUERY, {'emails': [emails[key] for key in cache_keys]})
+            friends = {row['email']: row['friends'] for row in rows}
+            # 没有朋友的用户也缓存空列表
+            return {key: friends.get(emails[key], []) for key in cache_keys}
+
+        values = await self.query_cache.get_many(emails, load, ttl=300,
+                                                 tags=lambda key: (GRAPH_CACHE_TAG, f"user:{emails[key]}"))
+        return {emails[key]: value for key, value in values.items()}
+
+    async def invalidate_tags(self, *tags: str) -> int:
+        """
+        删除打了这些标签的缓存
+        :param tags: 标签
+        :return: 删除的键数
+        """
+        deleted = await self.invalidator.invalidate_tags(tags)
+        print(f"按标签清除缓存：{', '.join(tags)}，{deleted}个键")
+        return deleted
+
+    async def sync_graph_version(self) -> int:
+        """
+        图谱版本号变化时删除全部 Neo4j 查询结果缓存，与 DatabaseManager.sync_graph_version 相同
+        :return: 删除的键数
+        """
+        version = (await self.run_read_query(GRAPH_VERSION_QUERY))[0]['version']
+        previous = await self.cache_client.set(GRAPH_VERSION_KEY, version, get=True)
+        if previous is not None and int(previous) == version:
+            return 0
+        return await self.invalidate_tags(GRAPH_CACHE_TAG)
+
+    async def _check_graph_version(self):
+        """距上次检查超过 GRAPH_VERSION_CHECK_INTERVAL 秒时检查图谱版本号，检查失败时继续使用现有缓存"""
+        now = time.monotonic()
+        if now - self._graph_checked_at < GRAPH_VERSION_CHECK_INTERVAL:
+            return
+        # 先记下时间，检查期间并发的请求不重复检查
+        self._graph_checked_at = now
+        try:
+            await self.sync_graph_version()
+        except Exception as e:
+            print(f"检查图谱版本号失败：{e}")
+
+    def cache_stats(self) -> Dict:
+        """两级缓存的命中率和读取耗时"""
+        return self.query_cache.report()
+
+    async def close(self):
+        """等待后台刷新结束并关闭所有连接"""
+        await self.query_cache.close()
+        if self.invalidation_bus is not None:
+            await self.invalidation_bus.close()
+        await self.cache_client.aclose()
+        await self.redis_pool.disconnect()
+        await self.neo4j_driver.close()
+        print("所有异步数据库连接已关闭")
+
+
+def get_db(request: Request) -> AsyncDatabaseManager:
+    """FastAPI 依赖：取 lifespan 中创建的 AsyncDatabaseManager"""
+    return request.app.state.db
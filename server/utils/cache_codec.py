@@ -0,0 +1,459 @@
+import time
+import zlib
+import datetime
+import zoneinfo
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import msgpack
+import orjson
+import pytz
+from neo4j import time as neo4j_time
+from neo4j.graph import Node, Relationship, Path
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+
+# 缓存数据格式版本，写在每条缓存数据的第一个字节；旧版本用 str() 写入的数据以可打印字符开头，不会与之混淆
+FORMAT_VERSION = 1
+
+# 序列化结果超过该字节数时才压缩
+COMPRESS_THRESHOLD = 1024
+
+# zlib 压缩级别，缓存读多写少，取速度较快的级别
+ZLIB_LEVEL = 3
+
+# msgpack 扩展类型编号：Python 原生时间类型和 Neo4j 时间类型分开编号，解码后类型不变
+EXT_DATETIME = 1
+EXT_DATE = 2
+EXT_TIME = 3
+EXT_TIMEDELTA = 4
+EXT_NEO4J_DATETIME = 11
+EXT_NEO4J_DATE = 12
+EXT_NEO4J_TIME = 13
+EXT_NEO4J_DURATION = 14
+
+# JSON 中标记特殊类型的键；用户数据中以 $ 开头的键在编码时多加一个 $，不会与之混淆
+JSON_TYPE_KEY = '$t'
+
+# 类型标记为 0 的 {"$t": 0, "v": ...} 包着整个值，表示其中以 $ 开头的键已经转义
+JSON_ESCAPED = 0
+
+
+class CacheDecodeError(ValueError):
+    """缓存数据无法解码（格式版本不符、旧格式数据或数据损坏），调用方应按未命中处理"""
+
+
+def graph_to_dict(value: Any) -> Optional[Dict]:
+    """
+    把 Neo4j 的节点、关系、路径转成普通字典，其他类型返回 None
+    :param value: 要转换的值
+    :return: 字典
+    """
+    if isinstance(value, Node):
+        return {
+            'element_id': value.element_id,
+            'labels': sorted(value.labels),
+            'properties': dict(value)
+        }
+    if isinstance(value, Relationship):
+        return {
+            'element_id': value.element_id,
+            'type': value.type,
+            'start': value.start_node.element_id if value.start_node is not None else None,
+            'end': value.end_node.element_id if value.end_node is not None else None,
+            'properties': dict(value)
+        }
+    if isinstance(value, Path):
+        return {
+            'nodes': [graph_to_dict(node) for node in value.nodes],
+            'relationships': [graph_to_dict(rel) for rel in value.relationships]
+        }
+    return None
+
+
+def _zone_name(tzinfo) -> Optional[Tuple[str, str]]:
+    """有名字的时区 -> (时区名, 实现 zoneinfo/pytz)，没有时区或只是固定偏移量时返回 None"""
+    key = getattr(tzinfo, 'key', None)
+    if isinstance(key, str):
+        return key, 'zoneinfo'
+    # pytz 的固定偏移量 zone 为 None
+    zone = getattr(tzinfo, 'zone', None)
+    if isinstance(zone, str):
+        return zone, 'pytz'
+    return None
+
+
+def _encode_zoned(iso: str, tzinfo) -> Union[str, List[str]]:
+    """
+    带时区的日期时间：ISO 字符串只含偏移量，有名字的时区（如 Europe/Berlin）再记下时区名，
+    读回后仍是原来的时区，之后按夏令时计算不会出错
+    """
+    named = _zone_name(tzinfo)
+    return iso if named is None else [iso, *named]
+
+
+def _decoder_zoned(parse: Callable[[str], Any]) -> Callable[[Union[str, List[str]]], Any]:
+    """_encode_zoned 的解码：先按偏移量解析，再换算到记下的时区；只有 ISO 字符串时（含旧数据）直接解析"""
+    def decode(value):
+        if isinstance(value, str):
+            return parse(value)
+        iso, name, kind = value
+        zone = pytz.timezone(name) if kind == 'pytz' else zoneinfo.ZoneInfo(name)
+        return parse(iso).astimezone(zone)
+    return decode
+
+
+# 时间类型 -> (扩展类型编号, 编码函数)；Neo4j 的时间类型保留纳秒精度
+_TEMPORAL_ENCODERS = [
+    (neo4j_time.DateTime, EXT_NEO4J_DATETIME, lambda v: _encode_zoned(v.iso_format(), v.tzinfo)),
+    (neo4j_time.Date, EXT_NEO4J_DATE, lambda v: v.iso_format()),
+    (neo4j_time.Time, EXT_NEO4J_TIME, lambda v: v.iso_format()),
+    (neo4j_time.Duration, EXT_NEO4J_DURATION, lambda v: [v.months, v.days, v.seconds, v.nanoseconds]),
+    # datetime 是 date 的子类，要排在 date 前面
+    (datetime.datetime, EXT_DATETIME, lambda v: _encode_zoned(v.isoformat(), v.tzinfo)),
+    (datetime.date, EXT_DATE, lambda v: v.isoformat()),
+    (datetime.time, EXT_TIME, lambda v: v.isoformat()),
+    (datetime.timedelta, EXT_TIMEDELTA, lambda v: [v.days, v.seconds, v.microseconds]),
+]
+
+_TEMPORAL_DECODERS: Dict[int, Callable[[Any], Any]] = {
+    EXT_NEO4J_DATETIME: _decoder_zoned(neo4j_time.DateTime.from_iso_format),
+    EXT_NEO4J_DATE: neo4j_time.Date.from_iso_format,
+    EXT_NEO4J_TIME: neo4j_time.Time.from_iso_format,
+    EXT_NEO4J_DURATION: lambda v: neo4j_time.Duration(months=v[0], days=v[1], seconds=v[2], nanoseconds=v[3]),
+    EXT_DATETIME: _decoder_zoned(datetime.datetime.fromisoformat),
+    EXT_DATE: datetime.date.fromisoformat,
+    EXT_TIME: datetime.time.fromisoformat,
+    EXT_TIMEDELTA: lambda v: datetime.timedelta(days=v[0], seconds=v[1], microseconds=v[2]),
+}
+
+
+def _encode_temporal(value: Any):
+    """时间类型 -> (扩展类型编号, 可序列化的值)，其他类型返回 None"""
+    for cls, code, encode in _TEMPORAL_ENCODERS:
+        if isinstance(value, cls):
+            return code, encode(value)
+    return None
+
+
+class MsgpackSerializer:
+    """
+    msgpack 序列化，时间类型用扩展类型保存
+
+    neo4j.time.Duration 是 tuple 的子类，按严格类型打包，子类才会交给 default 处理而不被当作数组。
+    """
+
+    id = 1
+    name = 'msgpack'
+
+    @staticmethod
+    def _default(value):
+        graph = graph_to_dict(value)
+        if graph is not None:
+            return graph
+        temporal = _encode_temporal(value)
+        if temporal is not None:
+            code, data = temporal
+            return msgpack.ExtType(code, msgpack.packb(data, use_bin_type=True))
+        # 严格类型下 tuple 和各种子类都要转成基本类型
+        for base in (list, tuple, set, frozenset):
+            if isinstance(value, base):
+                return list(value)
+        for base in (dict, str, bytes, int, float):
+            if isinstance(value, base):
+                return base(value)
+        raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+    @staticmethod
+    def _ext_hook(code, data):
+        decode = _TEMPORAL_DECODERS.get(code)
+        if decode is None:
+            return msgpack.ExtType(code, data)
+        return decode(msgpack.unpackb(data, raw=False))
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, default=self._default, use_bin_type=True, strict_types=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, ext_hook=self._ext_hook, strict_map_key=False)
+
+
+class OrjsonSerializer:
+    """
+    orjson 序列化，时间类型保存为 {"$t": 扩展类型编号, "v": 值}；非字符串的键读回后是字符串，不支持 bytes
+
+    编码结果中出现 "$t" 时（有时间类型，或用户数据中本来就有 $t），把用户数据中以 $ 开头的键转义后重新编码，
+    并用 {"$t": JSON_ESCAPED, "v": ...} 包起来，解码时据此区分类型标记和用户的键；
+    其余数据一次编码，解码时不必遍历。
+    """
+
+    id = 2
+    name = 'orjson'
+
+    @staticmethod
+    def _default(value):
+        graph = graph_to_dict(value)
+        if graph is not None:
+            return graph
+        temporal = _encode_temporal(value)
+        if temporal is not None:
+            code, data = temporal
+            return {JSON_TYPE_KEY: code, 'v': data}
+        if isinstance(value, (set, frozenset)):
+            return list(value)
+        raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+    def _dumps(self, value: Any) -> bytes:
+        # 时间类型交给 default 处理，否则 orjson 直接输出字符串，读回来时类型就变了
+        return orjson.dumps(value, default=self._default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+    def dumps(self, value: Any) -> bytes:
+        data = self._dumps(value)
+        if _JSON_TYPE_MARK in data:
+            data = self._dumps({JSON_TYPE_KEY: JSON_ESCAPED, 'v': _escape_keys(value)})
+        return data
+
+    def loads(self, data: bytes) -> Any:
+        value = orjson.loads(data)
+        # 只有含类型标记时才遍历还原
+        if _JSON_TYPE_MARK in data:
+            value = _revive(value)
+        return value
+
+
+_JSON_TYPE_MARK = b'"' + JSON_TYPE_KEY.encode() + b'"'
+
+
+def _escape_keys(value: Any) -> Any:
+    """给字典中以 $ 开头的字符串键多加一个 $；节点、关系、路径先转成字典，其属性中的键同样转义"""
+    graph = graph_to_dict(value)
+    if graph is not None:
+        value = graph
+    if isinstance(value, dict):
+        return {('$' + key if isinstance(key, str) and key.startswith('$') else key): _escape_keys(item)
+                for key, item in value.items()}
+    # Duration 是 tuple 的子类，交给 default 按时间类型编码
+    if isinstance(value, (list, tuple)) and not isinstance(value, neo4j_time.Duration):
+        return [_escape_keys(item) for item in value]
+    return value
+
+
+def _revive(value: Any, escaped: bool = False) -> Any:
+    """还原 JSON 中带类型标记的值；escaped 为 True 时去掉转义键多加的 $（没有外层标记的是旧数据，未转义）"""
+    if isinstance(value, dict):
+        code = value.get(JSON_TYPE_KEY)
+        if code is not None and len(value) == 2 and 'v' in value:
+            if code == JSON_ESCAPED:
+                return _revive(value['v'], True)
+            if code in _TEMPORAL_DECODERS:
+                return _TEMPORAL_DECODERS[code](value['v'])
+        return {(key[1:] if escaped and key.startswith('$') else key): _revive(item, escaped)
+                for key, item in value.items()}
+    if isinstance(value, list):
+        return [_revive(item, escaped) for item in value]
+    return value
+
+
+class ZlibCompressor:
+    id = 1
+    name = 'zlib'
+
+    def __init__(self, level: int = ZLIB_LEVEL):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class Lz4Compressor:
+    """lz4 压缩（需要安装 lz4），比 zlib 快得多，压缩率略低"""
+
+    id = 2
+    name = 'lz4'
+
+    def __init__(self):
+        if lz4_frame is None:
+            raise RuntimeError("未安装 lz4，无法使用 lz4 压缩")
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        return lz4_frame.compress(data)
+
+    @staticmethod
+    def decompress(data: bytes) -> bytes:
+        if lz4_frame is None:
+            raise CacheDecodeError("缓存数据使用 lz4 压缩，但未安装 lz4")
+        return lz4_frame.decompress(data)
+
+
+# 可选的序列化、压缩方式，按名称和编号登记；新增方式时登记到这里即可
+SERIALIZERS: Dict[str, type] = {cls.name: cls for cls in (MsgpackSerializer, OrjsonSerializer)}
+COMPRESSORS: Dict[str, type] = {cls.name: cls for cls in (ZlibCompressor, Lz4Compressor)}
+
+
+def register_serializer(cls: type):
+    """
+    登记新的序列化方式，类需要有 id（1-15）、name 属性及 dumps/loads 方法
+    :param cls: 序列化类
+    """
+    SERIALIZERS[cls.name] = cls
+
+
+def register_compressor(cls: type):
+    """
+    登记新的压缩方式，类需要有 id（1-15）、name 属性及 compress/decompress 方法
+    :param cls: 压缩类
+    """
+    COMPRESSORS[cls.name] = cls
+
+
+class CacheCodec:
+    """
+    缓存编解码
+
+    数据格式：版本号(1字节) + 标志(1字节，低4位为序列化方式编号，高4位为压缩方式编号，0表示不压缩) + 数据。
+    解码时按标志选择序列化和压缩方式，配置不同的进程也能读取彼此写入的缓存。
+    """
+
+    def __init__(self, serializer: str = 'orjson', compressor: Optional[str] = 'zlib',
+                 compress_threshold: int = COMPRESS_THRESHOLD):
+        """
+        :param serializer: 序列化方式：orjson（编解码最快）或 msgpack（数据最小，支持 bytes 和非字符串键）
+        :param compressor: 压缩方式：zlib、lz4 或 None（不压缩）
+        :param compress_threshold: 序列化结果超过该字节数时才压缩
+        """
+        self.serializer = SERIALIZERS[serializer]()
+        self.compressor = COMPRESSORS[compressor]() if compressor else None
+        self.compress_threshold = compress_threshold
+        self._serializers: Dict[int, Any] = {self.serializer.id: self.serializer}
+        self._compressors: Dict[int, Any] = {}
+        if self.compressor is not None:
+            self._compressors[self.compressor.id] = self.compressor
+
+    def dumps(self, value: Any) -> bytes:
+        """
+        编码
+        :param value: 要缓存的值
+        :return: 缓存数据
+        """
+        data = self.serializer.dumps(value)
+        compressor_id = 0
+        if self.compressor is not None and len(data) > self.compress_threshold:
+            compressed = self.compressor.compress(data)
+            # 压缩后没有变小就保存原数据
+            if len(compressed) < len(data):
+                data = compressed
+                compressor_id = self.compressor.id
+        return bytes((FORMAT_VERSION, compressor_id << 4 | self.serializer.id)) + data
+
+    def loads(self, payload: bytes) -> Any:
+        """
+        解码
+        :param payload: 缓存数据
+        :return: 缓存的值
+        """
+        if isinstance(payload, str):
+            raise CacheDecodeError("缓存数据是字符串，可能是旧格式或使用了 decode_responses=True 的客户端")
+        if len(payload) < 2 or payload[0] != FORMAT_VERSION:
+            raise CacheDecodeError("缓存数据格式版本不符")
+
+        flags = payload[1]
+        try:
+            serializer = self._get(self._serializers, SERIALIZERS, flags & 0x0F)
+            data = payload[2:]
+            if flags >> 4:
+                data = self._get(self._compressors, COMPRESSORS, flags >> 4).decompress(data)
+            return serializer.loads(data)
+        except CacheDecodeError:
+            raise
+        except Exception as e:
+            raise CacheDecodeError(f"缓存数据解码失败: {e}") from e
+
+    @staticmethod
+    def _get(instances: Dict[int, Any], registry: Dict[str, type], type_id: int):
+        """按编号取序列化或压缩方式的实例，首次遇到时创建"""
+        instance = instances.get(type_id)
+        if instance is None:
+            for cls in registry.values():
+                if cls.id == type_id:
+                    instance = instances[type_id] = cls()
+                    break
+            else:
+                raise CacheDecodeError(f"未知的编码方式编号: {type_id}")
+        return instance
+
+
+# 默认编解码器
+default_codec = CacheCodec()
+
+
+def dumps(value: Any) -> bytes:
+    return default_codec.dumps(value)
+
+
+def loads(payload: bytes) -> Any:
+    return default_codec.loads(payload)
+
+
+def benchmark(num_records: int = 200, repeat: int = 200) -> Dict:
+    """
+    对比原来的 str()/eval 方式与各编解码组合的编码、解码耗时及数据大小
+    :param num_records: 模拟查询结果的记录数
+    :param repeat: 重复次数
+    :return: 各方式的结果
+    """
+    # 模拟 record.data() 的查询结果，只含 str()/eval 也能还原的类型
+    records = [
+        {
+            'name': f'知识点{i}',
+            'email': f'user{i}@example.com',
+            'tags': ['python', '基础', f'tag{i % 7}'],
+            'score': i * 0.5,
+            'count': i,
+            'related': [{'name': f'知识点{i + j}', 'weight': j} for j in range(3)]
+        }
+        for i in range(num_records)
+    ]
+
+    candidates = {'str/eval': (lambda v: str(v).encode(), lambda b: eval(b.decode()))}
+    for serializer in SERIALIZERS:
+        for compressor in (None, 'zlib', 'lz4'):
+            if compressor == 'lz4' and lz4_frame is None:
+                continue
+            codec = CacheCodec(serializer, compressor)
+            candidates[f'{serializer}+{compressor or "none"}'] = (codec.dumps, codec.loads)
+
+    results = {}
+    for name, (encode, decode) in candidates.items():
+        start = time.perf_counter()
+        for _ in range(repeat):
+            payload = encode(records)
+        encode_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            value = decode(payload)
+        decode_seconds = time.perf_counter() - start
+
+        if value != records:
+            raise AssertionError(f"{name} 解码结果与原数据不一致")
+        results[name] = {
+            'bytes': len(payload),
+            'encode_us': round(encode_seconds / repeat * 1e6, 1),
+            'decode_us': round(decode_seconds / repeat * 1e6, 1)
+        }
+        print(f"{name:16s} 大小 {len(payload):7d} 字节, 编码 {results[name]['encode_us']:8.1f}us, "
+              f"解码 {results[name]['decode_us']:8.1f}us")
+    return results
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,202 @@
+import os
+import uuid
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator, List
+
+import redis
+
+from utils.local_cache import LocalCache, InvalidationBus, AsyncInvalidationBus
+
+
+# 标签集合的键前缀，集合中是打了该标签的缓存键
+TAG_PREFIX = 'tag:'
+
+# 标签集合的最短有效时间（秒），每次登记时延长；缓存条目的有效时间超过它时以条目为准
+# 常用的标签（如 neo4j）因此一直不会过期，集合中自然过期的键由 prune_tag 清理
+TAG_TTL = 86400
+
+# 标签集合超过该成员数时，读穿缓存在后台用 prune_tag 清理其中已过期的键
+TAG_MAX_MEMBERS = int(os.getenv('TAG_MAX_MEMBERS', 10000))
+
+# 每批删除的键数，一次往返删除一批
+DELETE_BATCH_SIZE = 500
+
+# SCAN/SSCAN 每次迭代让 Redis 检查的元素数
+SCAN_COUNT = 1000
+
+
+def tag_key(tag: str) -> str:
+    return TAG_PREFIX + tag
+
+
+def add_to_tags(pipe, key: str, tags: Iterable[str], ttl: int):
+    """
+    把缓存键登记到各个标签集合（只向管道中添加命令，由调用方执行）
+    :param pipe: Redis 管道
+    :param key: 缓存键
+    :param tags: 标签，如 neo4j、entity:Python、user:someone@example.com
+    :param ttl: 缓存条目在 Redis 中的有效时间（秒）
+    """
+    for tag in tags:
+        pipe.sadd(tag_key(tag), key)
+        pipe.expire(tag_key(tag), max(ttl, TAG_TTL))
+
+
+def _batches(items: Iterator, size: int) -> Iterator[List]:
+    while True:
+        batch = list(islice(items, size))
+        if not batch:
+            return
+        yield batch
+
+
+async def _async_batches(items: AsyncIterator, size: int) -> AsyncIterator[List]:
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CacheInvalidator:
+    """
+    不阻塞 Redis 的缓存失效
+
+    按标签失效时用 SSCAN 分批取出标签集合中的键，按模式清除时用 SCAN 分批遍历键空间，
+    每批发送一条 UNLINK（Redis 在后台线程中释放内存），不会像 KEYS 加一次性 DELETE 那样长时间占住 Redis。
+    """
+
+    def __init__(self, client, local: LocalCache = None, bus: InvalidationBus = None,
+                 batch_size: int = DELETE_BATCH_SIZE, scan_count: int = SCAN_COUNT):
+        """
+        :param client: Redis 客户端
+        :param local: 进程内缓存，删除的键同时从中删除
+        :param bus: 失效通知，删除的键同时通知其他进程
+        :param batch_size: 每批删除的键数
+        :param scan_count: SCAN/SSCAN 每次迭代检查的元素数
+        """
+        self.client = client
+        self.local = local
+        self.bus = bus
+        self.batch_size = batch_size
+        self.scan_count = scan_count
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """
+        删除打了这些标签的缓存
+        :param tags: 标签
+        :return: 删除的键数
+        """
+        deleted = 0
+        for tag in tags:
+            # 先把标签集合改名，之后新写入的缓存登记到新的集合，不会在本次失效中被误删
+            purging = f'{tag_key(tag)}:purging:{uuid.uuid4().hex}'
+            try:
+                self.client.rename(tag_key(tag), purging)
+            except redis.ResponseError:
+                # 标签集合不存在
+                continue
+
+            members = self.client.sscan_iter(purging, count=self.scan_count)
+            for batch in _batches(members, self.batch_size):
+                deleted += self._unlink(batch)
+            self.client.unlink(purging)
+        return deleted
+
+    def clear_pattern(self, pattern: str) -> int:
+        """
+        用 SCAN 增量遍历删除匹配模式的键
+        :param pattern: 键模式，如 user:*
+        :return: 删除的键数
+        """
+        deleted = 0
+        keys = self.client.scan_iter(match=pattern, count=self.scan_count)
+        for batch in _batches(keys, self.batch_size):
+            deleted += self._unlink(batch)
+        return deleted
+
+    def prune_tag(self, tag: str) -> int:
+        """
+        从标签集合中移除已经过期的缓存键；读穿缓存在标签集合超过 TAG_MAX_MEMBERS 时在后台调用
+        :param tag: 标签
+        :return: 移除的键数
+        """
+        removed = 0
+        members = self.client.sscan_iter(tag_key(tag), count=self.scan_count)
+        for batch in _batches(members, self.batch_size):
+            pipe = self.client.pipeline(transaction=False)
+            for key in batch:
+                pipe.exists(key)
+            expired = [key for key, exists in zip(batch, pipe.execute()) if not exists]
+            if expired:
+                removed += self.client.srem(tag_key(tag), *expired)
+        return removed
+
+    def _unlink(self, keys: List) -> int:
+        """用一次往返删除一批键，并让各进程丢弃进程内缓存中的这些键"""
+        keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+        deleted = self.client.unlink(*keys)
+
+        if self.local is not None:
+            self.local.delete(keys)
+        if self.bus is not None:
+            self.bus.publish(keys)
+        return deleted
+
+
+class AsyncCacheInvalidator(CacheInvalidator):
+    """
+    CacheInvalidator 的异步版本：使用 redis.asyncio 客户端，invalidate_tags、clear_pattern、prune_tag 是协程，
+    删除方式相同；bus 为 AsyncInvalidationBus
+    """
+
+    async def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """删除打了这些标签的缓存，返回删除的键数"""
+        deleted = 0
+        for tag in tags:
+            purging = f'{tag_key(tag)}:purging:{uuid.uuid4().hex}'
+            try:
+                await self.client.rename(tag_key(tag), purging)
+            except redis.ResponseError:
+                continue
+
+            members = self.client.sscan_iter(purging, count=self.scan_count)
+            async for batch in _async_batches(members, self.batch_size):
+                deleted += await self._unlink(batch)
+            await self.client.unlink(purging)
+        return deleted
+
+    async def clear_pattern(self, pattern: str) -> int:
+        """用 SCAN 增量遍历删除匹配模式的键，返回删除的键数"""
+        deleted = 0
+        keys = self.client.scan_iter(match=pattern, count=self.scan_count)
+        async for batch in _async_batches(keys, self.batch_size):
+            deleted += await self._unlink(batch)
+        return deleted
+
+    async def prune_tag(self, tag: str) -> int:
+        """从标签集合中移除已经过期的缓存键，返回移除的键数"""
+        removed = 0
+        members = self.client.sscan_iter(tag_key(tag), count=self.scan_count)
+        async for batch in _async_batches(members, self.batch_size):
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in batch:
+                    pipe.exists(key)
+                exists = await pipe.execute()
+            expired = [key for key, alive in zip(batch, exists) if not alive]
+            if expired:
+                removed += await self.client.srem(tag_key(tag), *expired)
+        return removed
+
+    async def _unlink(self, keys: List) -> int:
+        keys = [key.decode() if isinstance(key, bytes) else key for key in keys]
+        deleted = await self.client.unlink(*keys)
+
+        if self.local is not None:
+            self.local.delete(keys)
+        if self.bus is not None:
+            await self.bus.publish(keys)
+        return deleted
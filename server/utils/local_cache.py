@@ -0,0 +1,238 @@
+import time
+import uuid
+import asyncio
+import threading
+from collections import OrderedDict, Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import orjson
+
+
+# 进程内缓存的最大条目数
+LOCAL_MAX_ENTRIES = 10000
+
+# 进程内缓存的默认有效时间（秒），收不到失效通知时最多读到这么久以前的数据
+LOCAL_TTL = 30
+
+# 各进程之间广播缓存失效的频道
+INVALIDATION_CHANNEL = 'cache:invalidate'
+
+# 未命中时的返回值，与缓存的 None 区分
+MISSING = object()
+
+
+class LocalCache:
+    """
+    进程内的 LRU 缓存，按条目数和有效时间限制大小
+
+    缓存的是对象本身，读取后不要修改返回的对象。
+    """
+
+    def __init__(self, max_entries: int = LOCAL_MAX_ENTRIES, ttl: float = LOCAL_TTL):
+        """
+        :param max_entries: 最大条目数，超出时淘汰最久未使用的条目
+        :param ttl: 默认有效时间（秒）
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stats = Counter()
+
+        # 键 -> (过期时间, 值)，按最近使用的顺序排列
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        """
+        读取缓存
+        :param key: 缓存键
+        :return: 缓存值，不存在或已过期时返回 MISSING
+        """
+        start = time.perf_counter()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                value = MISSING
+            elif entry[0] <= time.monotonic():
+                del self._entries[key]
+                self.stats['expired'] += 1
+                value = MISSING
+            else:
+                self._entries.move_to_end(key)
+                value = entry[1]
+            self.stats['hits' if value is not MISSING else 'misses'] += 1
+            self.stats['seconds'] += time.perf_counter() - start
+        return value
+
+    def set(self, key: str, value: Any, ttl: float = None):
+        """
+        写入缓存
+        :param key: 缓存键
+        :param value: 缓存值
+        :param ttl: 有效时间（秒），默认使用构造时的设置
+        """
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def delete(self, keys: Iterable[str]):
+        """删除缓存"""
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def report(self) -> Dict:
+        """命中率、平均读取耗时等统计"""
+        lookups = self.stats['hits'] + self.stats['misses']
+        return {
+            'entries': len(self._entries),
+            'hits': self.stats['hits'],
+            'misses': self.stats['misses'],
+            'hit_ratio': round(self.stats['hits'] / lookups, 4) if lookups else None,
+            'avg_latency_us': round(self.stats['seconds'] / lookups * 1e6, 2) if lookups else None,
+            'evictions': self.stats['evictions'],
+            'expired': self.stats['expired']
+        }
+
+
+class InvalidationBus:
+    """
+    通过 Redis 发布/订阅在各进程（如多个 uvicorn worker）之间同步进程内缓存的失效
+
+    某个进程写入或删除缓存后广播键名，其他进程收到后删除自己进程内缓存中的这些键。
+    订阅连接断开期间可能漏掉通知，因此出错时清空进程内缓存。
+    """
+
+    def __init__(self, client, channel: str = INVALIDATION_CHANNEL):
+        """
+        :param client: Redis 客户端
+        :param channel: 频道名
+        """
+        self.client = client
+        self.channel = channel
+        # 本进程发出的通知不用处理
+        self.origin = uuid.uuid4().hex
+        self._caches: List[LocalCache] = []
+        self._pubsub = None
+        self._thread = None
+
+    def attach(self, cache: LocalCache):
+        """登记需要同步失效的进程内缓存"""
+        self._caches.append(cache)
+
+    def start(self):
+        """开始在后台线程中接收失效通知"""
+        if self._thread is not None:
+            return
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: self._handle})
+        self._thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True,
+                                                  exception_handler=self._handle_error)
+
+    def publish(self, keys: Iterable[str]):
+        """
+        广播缓存失效
+        :param keys: 失效的键
+        """
+        keys = list(keys)
+        if keys:
+            self.client.publish(self.channel, orjson.dumps({'origin': self.origin, 'keys': keys}))
+
+    def publish_clear(self):
+        """广播清空进程内缓存"""
+        self.client.publish(self.channel, orjson.dumps({'origin': self.origin, 'clear': True}))
+
+    def _handle(self, message: Dict):
+        try:
+            data = orjson.loads(message['data'])
+        except orjson.JSONDecodeError:
+            return
+        if data.get('origin') == self.origin:
+            return
+        for cache in self._caches:
+            if data.get('clear'):
+                cache.clear()
+            else:
+                cache.delete(data.get('keys', ()))
+
+    def _handle_error(self, error: Exception, pubsub, thread):
+        self._drop_all(error)
+        # 稍后由订阅线程重新连接
+        time.sleep(1.0)
+
+    def _drop_all(self, error: Exception):
+        print(f"缓存失效订阅出错，清空进程内缓存：{error}")
+        for cache in self._caches:
+            cache.clear()
+
+    def close(self):
+        """停止接收失效通知"""
+        if self._thread is not None:
+            self._thread.stop()
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._pubsub is not None:
+            self._pubsub.close()
+            self._pubsub = None
+
+
+class AsyncInvalidationBus(InvalidationBus):
+    """
+    InvalidationBus 的异步版本：使用 redis.asyncio 客户端，在事件循环的后台任务中接收通知，
+    publish、publish_clear、close 是协程。消息格式相同，可与同步的进程互通。
+    """
+
+    def __init__(self, client, channel: str = INVALIDATION_CHANNEL):
+        super().__init__(client, channel)
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """在当前事件循环中开始接收失效通知"""
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._listen())
+
+    async def publish(self, keys: Iterable[str]):
+        keys = list(keys)
+        if keys:
+            await self.client.publish(self.channel, orjson.dumps({'origin': self.origin, 'keys': keys}))
+
+    async def publish_clear(self):
+        await self.client.publish(self.channel, orjson.dumps({'origin': self.origin, 'clear': True}))
+
+    async def _listen(self):
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    self._handle(message)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._drop_all(e)
+                # 稍后重新连接
+                await asyncio.sleep(1.0)
+            finally:
+                await pubsub.aclose()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
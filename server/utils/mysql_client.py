@@ -1,13 +1,333 @@
+import os
+import time
+import asyncio
+import threading
+from collections import deque, Counter
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
 import pymysql
 from pymysql import cursors
+from pymysql.constants import SERVER_STATUS
+
+
+# 数据库连接配置
+MYSQL_CONFIG = {
+    'host': os.getenv('MYSQL_HOST', 'localhost'),
+    'port': int(os.getenv('MYSQL_PORT', 3306)),
+    'user': os.getenv('MYSQL_USER', 'root'),
+    'password': os.getenv('MYSQL_PASSWORD', '123456'),
+    'database': os.getenv('MYSQL_DATABASE', 'Graduation_project'),
+    'cursorclass': pymysql.cursors.DictCursor,
+    # 每条语句单独提交：连接池中的连接会被复用，关闭自动提交时只读的查询也会留下一个未结束的事务，
+    # 在 REPEATABLE READ 下之后的查询一直读这个事务开始时的快照，看不到其他连接新写入的数据
+    'autocommit': True
+}
+
+# 连接池最多持有的连接数，应小于 MySQL 的 max_connections 除以 worker 数
+MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', 10))
+
+# 空闲超过该时间（秒）的连接直接关闭重建，应小于 MySQL 的 wait_timeout
+MYSQL_MAX_IDLE_TIME = float(os.getenv('MYSQL_MAX_IDLE_TIME', 300))
+
+# 空闲超过该时间（秒）的连接取出时先 ping 一次，确认可用
+MYSQL_HEALTH_CHECK_INTERVAL = float(os.getenv('MYSQL_HEALTH_CHECK_INTERVAL', 30))
+
+# 连接用完时最多等待的时间（秒）
+MYSQL_ACQUIRE_TIMEOUT = float(os.getenv('MYSQL_ACQUIRE_TIMEOUT', 5))
 
 
 # 建立数据库连接配置
 def get_mysql_connection():
-    return pymysql.connect(
-        host='localhost',
-        user='root',
-        password='123456',
-        database='Graduation_project',
-        cursorclass=pymysql.cursors.DictCursor
-    )
+    return pymysql.connect(**MYSQL_CONFIG)
+
+
+class PoolTimeoutError(Exception):
+    """在等待时间内没有取到连接"""
+
+
+class MySQLPool:
+    """
+    有上限的 MySQL 连接池
+
+    - 最多持有 max_size 个连接，用完时等待其他线程归还，超过 acquire_timeout 抛出 PoolTimeoutError
+    - 空闲超过 max_idle_time 的连接关闭重建，避免用到已被 MySQL 按 wait_timeout 断开的连接
+    - 空闲超过 health_check_interval 的连接取出时先 ping，失败则重建
+    - 使用中出现连接错误的连接不放回池中
+    - 归还时连接上还有未结束的事务（如以 autocommit=False 建立的连接只读了数据）则先回滚，
+      下次取出时不会读到旧的快照
+    """
+
+    def __init__(self, max_size: int = MYSQL_POOL_SIZE, max_idle_time: float = MYSQL_MAX_IDLE_TIME,
+                 health_check_interval: float = MYSQL_HEALTH_CHECK_INTERVAL,
+                 acquire_timeout: float = MYSQL_ACQUIRE_TIMEOUT, **connect_kwargs):
+        """
+        :param max_size: 最多持有的连接数
+        :param max_idle_time: 连接最长空闲时间（秒）
+        :param health_check_interval: 空闲超过该时间的连接取出时先 ping（秒）
+        :param acquire_timeout: 取连接的默认等待时间（秒）
+        :param connect_kwargs: 传给 pymysql.connect 的参数，覆盖 MYSQL_CONFIG 中的同名项
+        """
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.health_check_interval = health_check_interval
+        self.acquire_timeout = acquire_timeout
+        self.connect_kwargs = dict(MYSQL_CONFIG, **connect_kwargs)
+        # 多个线程同时更新，读写都在 _cond 中进行
+        self.stats = Counter()
+
+        # (连接, 归还时间)，后进先出，常用的连接保持活跃，多余的连接逐渐空闲超时
+        self._idle = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float = None) -> pymysql.connections.Connection:
+        """
+        取一个可用的连接，用完后必须 release
+        :param timeout: 最多等待的时间（秒），默认使用 acquire_timeout
+        :return: 连接
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        with self._cond:
+            if self._closed:
+                raise PoolTimeoutError("连接池已关闭")
+            while not self._idle and self._size >= self.max_size:
+                if self._closed:
+                    raise PoolTimeoutError("连接池已关闭")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    raise PoolTimeoutError(f"{timeout}秒内没有可用的 MySQL 连接（连接池上限 {self.max_size}）")
+                self._cond.wait(remaining)
+            idle = self._idle.pop() if self._idle else None
+            if idle is None:
+                # 先占住名额，在锁外建立连接
+                self._size += 1
+
+            waited = time.monotonic() - start
+            self.stats['acquires'] += 1
+            self.stats['wait_seconds'] += waited
+            if waited > self.stats['max_wait_seconds']:
+                self.stats['max_wait_seconds'] = waited
+
+        if idle is not None:
+            connection, released_at = idle
+            connection = self._check(connection, time.monotonic() - released_at)
+            if connection is not None:
+                return connection
+
+        try:
+            connection = pymysql.connect(**self.connect_kwargs)
+        except BaseException:
+            self._discard()
+            raise
+        self._count('created')
+        return connection
+
+    def release(self, connection: pymysql.connections.Connection, discard: bool = False):
+        """
+        归还连接
+        :param connection: 连接
+        :param discard: 为 True 时关闭连接而不放回池中（如连接已出错）
+        """
+        if not discard and connection.open and connection.server_status & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+            try:
+                connection.rollback()
+            except pymysql.MySQLError:
+                discard = True
+        if discard or self._closed or not connection.open:
+            self._close(connection)
+            self._discard()
+            return
+        with self._cond:
+            self._idle.append((connection, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: float = None):
+        """
+        with pool.connection() as connection: 取出连接，结束时归还；出错时回滚，连接错误时丢弃连接
+        :param timeout: 最多等待的时间（秒）
+        """
+        connection = self.acquire(timeout)
+        discard = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            discard = True
+            raise
+        except BaseException:
+            try:
+                connection.rollback()
+            except pymysql.MySQLError:
+                discard = True
+            raise
+        finally:
+            self.release(connection, discard)
+
+    def report(self) -> Dict:
+        """连接数、等待次数与耗时、超时次数等统计"""
+        with self._cond:
+            size, idle = self._size, len(self._idle)
+            stats = Counter(self.stats)
+        acquires = stats['acquires']
+        return {
+            'size': size,
+            'idle': idle,
+            'in_use': size - idle,
+            'max_size': self.max_size,
+            'acquires': acquires,
+            'timeouts': stats['timeouts'],
+            'avg_wait_ms': round(stats['wait_seconds'] / acquires * 1000, 3) if acquires else None,
+            'max_wait_ms': round(stats['max_wait_seconds'] * 1000, 3),
+            'created': stats['created'],
+            'idle_expired': stats['idle_expired'],
+            'health_check_failures': stats['health_check_failures']
+        }
+
+    def close(self):
+        """关闭所有空闲连接，使用中的连接在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for connection, _ in idle:
+            self._close(connection)
+
+    def _check(self, connection, idle_seconds: float):
+        """空闲太久的连接关闭，空闲较久的先 ping；不可用时返回 None，名额留给新连接"""
+        if idle_seconds > self.max_idle_time:
+            self._count('idle_expired')
+            self._close(connection)
+            return None
+        if idle_seconds > self.health_check_interval:
+            try:
+                connection.ping(reconnect=False)
+            except pymysql.MySQLError:
+                self._count('health_check_failures')
+                self._close(connection)
+                return None
+        return connection
+
+    def _count(self, key: str):
+        """在锁内累加一项统计"""
+        with self._cond:
+            self.stats[key] += 1
+
+    def _discard(self):
+        """释放一个名额"""
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    @staticmethod
+    def _close(connection):
+        try:
+            connection.close()
+        except pymysql.MySQLError:
+            pass
+
+
+class AsyncMySQLPool:
+    """
+    MySQLPool 的异步用法：在事件循环中等待连接，查询在专用线程池中执行，不阻塞事件循环
+
+    pymysql 是同步驱动，查询函数接收连接、在与连接池同样大小的线程池中运行；
+    等待连接用 asyncio.Semaphore，不占用线程。
+    """
+
+    def __init__(self, pool: MySQLPool):
+        """
+        :param pool: 同步连接池，同步和异步的调用共用其中的连接
+        """
+        self.pool = pool
+        self.stats = Counter()
+        self._semaphore = asyncio.Semaphore(pool.max_size)
+        self._executor = ThreadPoolExecutor(max_workers=pool.max_size, thread_name_prefix='mysql')
+
+    async def run(self, func: Callable[..., Any], *args, timeout: float = None) -> Any:
+        """
+        取一个连接执行 func(connection, *args)
+        :param func: 使用连接的同步函数
+        :param timeout: 最多等待连接的时间（秒），默认使用连接池的 acquire_timeout
+        :return: func 的返回值
+        """
+        timeout = self.pool.acquire_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise PoolTimeoutError(f"{timeout}秒内没有可用的 MySQL 连接（连接池上限 {self.pool.max_size}）")
+        waited = time.perf_counter() - start
+        self.stats['acquires'] += 1
+        self.stats['wait_seconds'] += waited
+        if waited > self.stats['max_wait_seconds']:
+            self.stats['max_wait_seconds'] = waited
+
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self._run, func, args, timeout)
+        finally:
+            self._semaphore.release()
+
+    def _run(self, func, args, timeout):
+        with self.pool.connection(timeout) as connection:
+            return func(connection, *args)
+
+    def report(self) -> Dict:
+        """连接池统计，加上事件循环中等待连接的次数与耗时"""
+        acquires = self.stats['acquires']
+        report = self.pool.report()
+        report['async'] = {
+            'acquires': acquires,
+            'timeouts': self.stats['timeouts'],
+            'avg_wait_ms': round(self.stats['wait_seconds'] / acquires * 1000, 3) if acquires else None,
+            'max_wait_ms': round(self.stats['max_wait_seconds'] * 1000, 3)
+        }
+        return report
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+_pool: Optional[MySQLPool] = None
+_async_pool: Optional[AsyncMySQLPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_mysql_pool() -> MySQLPool:
+    """进程内共享的 MySQL 连接池"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = MySQLPool()
+        return _pool
+
+
+def get_async_mysql_pool() -> AsyncMySQLPool:
+    """进程内共享的异步 MySQL 连接池，与 get_mysql_pool 共用连接"""
+    global _async_pool
+    pool = get_mysql_pool()
+    with _pool_lock:
+        if _async_pool is None:
+            _async_pool = AsyncMySQLPool(pool)
+        return _async_pool
+
+
+def close_mysql_pools():
+    """关闭共享的连接池，在应用退出时调用"""
+    global _pool, _async_pool
+    with _pool_lock:
+        if _async_pool is not None:
+            _async_pool.close()
+            _async_pool = None
+        if _pool is not None:
+            _pool.close()
+            _pool = None
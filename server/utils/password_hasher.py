@@ -0,0 +1,139 @@
+import os
+import hmac
+import base64
+import asyncio
+import hashlib
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+
+# scrypt 参数：N=2^14、r=8 约占 16MB 内存，单次计算几十毫秒
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+SCRYPT_DKLEN = 32
+SALT_BYTES = 16
+
+# 存储格式：scrypt$N$r$p$盐$哈希（盐和哈希为 base64）
+HASH_PREFIX = 'scrypt'
+
+# 计算哈希的线程数；hashlib.scrypt 计算时释放 GIL，多个线程可以同时计算
+HASH_WORKERS = int(os.getenv('HASH_WORKERS', os.cpu_count() or 4))
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.b64encode(data).decode('ascii')
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int, dklen: int) -> bytes:
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt, n=n, r=r, p=p, dklen=dklen,
+                          maxmem=128 * r * n + 1024 * 1024)
+
+
+def _parse(stored: str) -> Optional[Tuple[int, int, int, bytes, bytes]]:
+    """解析存储的哈希，不是本模块生成的格式（如旧的明文密码）时返回 None"""
+    parts = stored.split('$')
+    if len(parts) != 6 or parts[0] != HASH_PREFIX:
+        return None
+    try:
+        n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+        return n, r, p, base64.b64decode(parts[4]), base64.b64decode(parts[5])
+    except ValueError:
+        return None
+
+
+def hash_password(password: str) -> str:
+    """
+    计算密码哈希（耗时几十毫秒，异步代码中用 PasswordHasher）
+    :param password: 明文密码
+    :return: 存储格式的哈希
+    """
+    salt = secrets.token_bytes(SALT_BYTES)
+    digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P, SCRYPT_DKLEN)
+    return '$'.join((HASH_PREFIX, str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P), _b64encode(salt), _b64encode(digest)))
+
+
+def verify_password(password: str, stored: str) -> bool:
+    """
+    校验密码，兼容旧的明文存储
+    :param password: 用户输入的密码
+    :param stored: 数据库中的密码字段
+    :return: 是否匹配
+    """
+    parsed = _parse(stored)
+    if parsed is None:
+        # 旧数据是明文，比较时间与内容无关
+        return hmac.compare_digest(password.encode('utf-8'), stored.encode('utf-8'))
+    n, r, p, salt, digest = parsed
+    return hmac.compare_digest(_scrypt(password, salt, n, r, p, len(digest)), digest)
+
+
+def needs_rehash(stored: str) -> bool:
+    """
+    是否需要重新计算哈希：旧的明文密码，或参数与当前设置不同
+    :param stored: 数据库中的密码字段
+    """
+    parsed = _parse(stored)
+    if parsed is None:
+        return True
+    n, r, p, salt, digest = parsed
+    return (n, r, p, len(digest)) != (SCRYPT_N, SCRYPT_R, SCRYPT_P, SCRYPT_DKLEN)
+
+
+class PasswordHasher:
+    """
+    在专用线程池中计算和校验密码哈希，事件循环只等待结果
+
+    线程数有上限，登录高峰时多余的请求在事件循环中排队，不会占用更多 CPU 和内存。
+    """
+
+    def __init__(self, max_workers: int = HASH_WORKERS):
+        """
+        :param max_workers: 计算哈希的线程数
+        """
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hash')
+        # 用户不存在时也校验一次，让响应时间与用户是否存在无关
+        self._dummy_hash = None
+
+    async def hash(self, password: str) -> str:
+        """计算密码哈希"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, hash_password, password)
+
+    async def verify(self, password: str, stored: Optional[str]) -> bool:
+        """
+        校验密码
+        :param password: 用户输入的密码
+        :param stored: 数据库中的密码字段，用户不存在时传 None
+        :return: 是否匹配
+        """
+        if stored is None:
+            if self._dummy_hash is None:
+                self._dummy_hash = await self.hash(secrets.token_urlsafe(16))
+            await asyncio.get_running_loop().run_in_executor(self._executor, verify_password, password,
+                                                             self._dummy_hash)
+            return False
+        return await asyncio.get_running_loop().run_in_executor(self._executor, verify_password, password, stored)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """进程内共享的 PasswordHasher"""
+    global _hasher
+    if _hasher is None:
+        _hasher = PasswordHasher()
+    return _hasher
+
+
+def close_password_hasher():
+    """关闭共享的 PasswordHasher，在应用退出时调用"""
+    global _hasher
+    if _hasher is not None:
+        _hasher.close()
+        _hasher = None
@@ -0,0 +1,813 @@
+import math
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import threading
+from abc import ABC, abstractmethod
+from functools import partial
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import orjson
+
+from utils.cache_codec import CacheCodec, CacheDecodeError
+from utils.local_cache import LocalCache, InvalidationBus, AsyncInvalidationBus, MISSING
+from utils.cache_invalidation import add_to_tags, tag_key, CacheInvalidator, AsyncCacheInvalidator, TAG_MAX_MEMBERS
+
+
+# 自动生成的查询缓存键前缀
+QUERY_KEY_PREFIX = 'neo4j:query:'
+
+# 跨进程计算锁的键前缀
+LOCK_PREFIX = 'lock:'
+
+# 过期后仍可返回旧值（同时后台刷新）的时间（秒）
+STALE_TTL = 300
+
+# 提前刷新的激进程度（XFetch 的 beta），越大越早刷新
+XFETCH_BETA = 1.0
+
+# 计算锁的过期时间（秒），持锁进程崩溃时锁自动释放
+LOCK_TTL = 30
+
+# 未抢到锁时等待其他进程写入缓存的最长时间（秒），超时后自己查询
+LOCK_WAIT = 5
+
+# 后台刷新线程数
+REFRESH_WORKERS = 2
+
+# 后台刷新没有抢到锁、没有计算时交给同一个键的等待者的结果，等待者需要自己重新加载
+NOT_LOADED = object()
+
+# 只在锁仍属于自己时删除，避免删掉锁过期后别的进程加的锁
+_RELEASE_LOCK_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def make_cache_key(query: str, params: Optional[Dict] = None, prefix: str = QUERY_KEY_PREFIX) -> str:
+    """
+    由查询语句和参数生成缓存键：语句中的空白统一后与按键排序的参数一起取哈希
+    :param query: Cypher 语句
+    :param params: 查询参数
+    :param prefix: 键前缀
+    :return: 缓存键
+    """
+    normalized = ' '.join(query.split())
+    encoded_params = orjson.dumps(params or {}, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    digest = hashlib.sha1(normalized.encode() + b'\0' + encoded_params).hexdigest()
+    return prefix + digest
+
+
+def _load_one(loader: Callable[[List[str]], Dict[str, Any]], key: str) -> Any:
+    """用批量 loader 计算单个键，供后台刷新使用"""
+    return loader([key])[key]
+
+
+async def _load_one_async(loader: Callable[[List[str]], Awaitable[Dict[str, Any]]], key: str) -> Any:
+    """_load_one 的异步版本"""
+    return (await loader([key]))[key]
+
+
+class _ReadThroughPolicy(ABC):
+    """
+    ReadThroughCache 与 AsyncReadThroughCache 共用的缓存策略，两者只在读写 Redis、等待和合并的方式上不同：
+    - 缓存条目 {'v': 值, 'd': 计算耗时, 'e': 过期时间} 的编解码，Redis 中的过期时间包含旧值可用期
+    - 命中时按 XFetch 决定是否提前刷新，过期后在旧值可用期内返回旧值并刷新
+    - 计算锁的参数和未抢到锁时的等待间隔
+    - 同一个键的并发加载登记在 _inflight 中，后加入的等待第一个的结果
+    - 写入时顺带取标签集合的大小，超过上限的标签交给后台清理已过期的成员
+
+    后台刷新由子类按各自的方式调度（线程池或事件循环中的任务），见 _refresh_in_background
+    """
+
+    def __init__(self, client, codec: CacheCodec, stale_ttl: int, beta: float, lock_ttl: int, lock_wait: float,
+                 local: LocalCache, bus, invalidator: CacheInvalidator, tag_max_members: int):
+        self.client = client
+        self.codec = codec or CacheCodec()
+        self.stale_ttl = stale_ttl
+        self.beta = beta
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.local = local
+        self.bus = bus
+        self.invalidator = invalidator
+        self.tag_max_members = tag_max_members
+        self.stats = Counter()
+
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Any] = {}
+        self._release_script = client.register_script(_RELEASE_LOCK_SCRIPT)
+        # 正在清理的标签，以及各标签上次清理后剩下的成员数
+        self._pruning = set()
+        self._pruned_sizes: Dict[str, int] = {}
+
+    def report(self) -> Dict:
+        """两级缓存各自的命中率、平均读取耗时，以及 L1 省掉的 Redis 读取次数"""
+        stats = self.stats
+        l2_lookups = stats['l2_lookups']
+        l2_hits = stats['hits'] + stats['stale_hits']
+        l1 = self.local.report() if self.local is not None else None
+        return {
+            'l1': l1,
+            'l2': {
+                'hits': l2_hits,
+                'stale_hits': stats['stale_hits'],
+                'misses': stats['misses'],
+                'hit_ratio': round(l2_hits / (l2_hits + stats['misses']), 4) if l2_hits + stats['misses'] else None,
+                'avg_latency_us': round(stats['l2_seconds'] / l2_lookups * 1e6, 2) if l2_lookups else None
+            },
+            'loads': stats['loads'],
+            'early_refreshes': stats['early_refreshes'],
+            'coalesced': stats['coalesced'],
+            'tag_prunes': stats['tag_prunes'],
+            'redis_reads_avoided': l1['hits'] if l1 else 0
+        }
+
+    def _local_get_many(self, keys: Iterable[str]) -> Tuple[Dict[str, Any], List[str]]:
+        """在 L1 中查找（去重后的）键，返回命中的 {键: 值} 和需要读 Redis 的键"""
+        values, pending = {}, []
+        for key in dict.fromkeys(keys):
+            if self.local is not None:
+                value = self.local.get(key)
+                if value is not MISSING:
+                    values[key] = value
+                    continue
+            pending.append(key)
+        return values, pending
+
+    def _serve(self, key: str, entry: Dict, loader: Callable, ttl: int, stale_ttl: int, tags: Iterable[str]) -> Any:
+        """返回 Redis 中读到的值，按需在后台刷新"""
+        now = time.time()
+        expiry = entry['e']
+        if now < expiry:
+            self.stats['hits'] += 1
+            # XFetch：now - delta * beta * ln(rand) >= expiry 时提前刷新
+            if self.beta > 0 and now - entry['d'] * self.beta * math.log(1.0 - random.random()) >= expiry:
+                self.stats['early_refreshes'] += 1
+                self._refresh_in_background(key, loader, ttl, stale_ttl, tags)
+            elif self.local is not None:
+                self.local.set(key, entry['v'], expiry - now)
+            return entry['v']
+
+        # 已过期但仍在旧值可用期内
+        self.stats['stale_hits'] += 1
+        self._refresh_in_background(key, loader, ttl, stale_ttl, tags)
+        return entry['v']
+
+    @abstractmethod
+    def _refresh_in_background(self, key: str, loader: Callable, ttl: int, stale_ttl: int, tags: Iterable[str]):
+        """在后台重新加载 key，不等待结果；同一个键已在加载时不重复加载"""
+
+    def _record_read(self, count: int, start: float):
+        self.stats['l2_lookups'] += count
+        self.stats['l2_seconds'] += time.perf_counter() - start
+
+    def _decode(self, payload: Optional[bytes]) -> Optional[Dict]:
+        """解码缓存条目，不存在或无法解码时返回 None"""
+        if payload is None:
+            return None
+        try:
+            entry = self.codec.loads(payload)
+        except CacheDecodeError:
+            return None
+        if not isinstance(entry, dict) or 'e' not in entry:
+            return None
+        return entry
+
+    def _write(self, pipe, values: Dict[str, Any], delta: float, ttl: int, stale_ttl: int,
+               tags: Callable[[str], Iterable[str]]) -> List[str]:
+        """
+        向管道中添加写入缓存条目、登记标签和读取标签集合大小的命令（由调用方执行）
+        :return: 登记的标签，管道结果的最后几项依次是它们的集合大小
+        """
+        expiry = time.time() + ttl
+        expire = max(1, math.ceil(ttl + stale_ttl))
+        registered = {}
+        for key, value in values.items():
+            pipe.set(key, self.codec.dumps({'v': value, 'd': delta, 'e': expiry}), ex=expire)
+            key_tags = tuple(tags(key))
+            add_to_tags(pipe, key, key_tags, expire)
+            registered.update(dict.fromkeys(key_tags))
+        for tag in registered:
+            pipe.scard(tag_key(tag))
+        return list(registered)
+
+    def _tags_to_prune(self, tags: List[str], results: List) -> List[Tuple[str, int]]:
+        """
+        由管道结果找出需要清理的标签：集合大小超过上限，且超过上次清理后剩余大小的两倍
+        （活跃的成员本身就很多时不会每次写入都清理一遍）
+        """
+        if not tags:
+            return []
+        due = []
+        with self._lock:
+            for tag, size in zip(tags, results[-len(tags):]):
+                limit = max(self.tag_max_members, 2 * self._pruned_sizes.get(tag, 0))
+                if size > limit and tag not in self._pruning:
+                    self._pruning.add(tag)
+                    due.append((tag, size))
+        return due
+
+    def _pruned(self, tag: str, size: int, removed: int):
+        self.stats['tag_prunes'] += 1
+        with self._lock:
+            self._pruning.discard(tag)
+            self._pruned_sizes[tag] = size - removed
+
+    def _store_local(self, values: Dict[str, Any], ttl: int):
+        """本进程 L1 直接放入新值（其他进程由失效通知丢弃旧值）"""
+        if self.local is not None:
+            for key, value in values.items():
+                self.local.set(key, value, ttl)
+
+    def _lock_args(self, key: str) -> Tuple[str, str, int]:
+        """计算锁的键、本次持锁的令牌和过期时间（毫秒）"""
+        return LOCK_PREFIX + key, uuid.uuid4().hex, int(self.lock_ttl * 1000)
+
+    def _lock_wait_delays(self) -> Iterator[float]:
+        """未抢到锁时每次检查缓存前等待的时间，逐渐加长，到 lock_wait 为止"""
+        self.stats['lock_waits'] += 1
+        deadline = time.monotonic() + self.lock_wait
+        delay = 0.01
+        while time.monotonic() < deadline:
+            yield delay
+            delay = min(delay * 2, 0.2)
+        self.stats['lock_timeouts'] += 1
+
+    @staticmethod
+    def _fresh(entry: Optional[Dict]) -> bool:
+        return entry is not None and entry['e'] > time.time()
+
+    def _join(self, keys: Iterable[str], new_future: Callable[[], Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """
+        登记并发加载：没有在加载的键由调用方负责，其余键等待已有的结果
+        :param new_future: 创建 Future 的函数
+        :return: (调用方负责的 {键: Future}, 需要等待的 {键: Future})
+        """
+        owned, waiting = {}, {}
+        with self._lock:
+            for key in keys:
+                future = self._inflight.get(key)
+                if future is None:
+                    owned[key] = self._inflight[key] = new_future()
+                else:
+                    waiting[key] = future
+        return owned, waiting
+
+    def _leave(self, keys: Iterable[str]):
+        with self._lock:
+            for key in keys:
+                self._inflight.pop(key, None)
+
+    @staticmethod
+    def _split_waited(results: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        整理等到的结果
+        :return: (得到的 {键: 值}, 等到 NOT_LOADED 需要重新加载的键)；批量计算时 loader 没有返回的键两者都不在
+        """
+        values, retry = {}, []
+        for key, value in results.items():
+            if value is NOT_LOADED:
+                retry.append(key)
+            elif value is not MISSING:
+                values[key] = value
+        return values, retry
+
+
+class ReadThroughCache(_ReadThroughPolicy):
+    """
+    防击穿的读穿缓存
+
+    - 同一个键同时未命中时，进程内只有一个线程执行查询，其余线程等待它的结果；
+      多个进程之间用 Redis 锁保证只有一个进程查询，其余进程等待缓存写入
+    - 缓存中同时保存本次查询耗时，临近过期时按 XFetch 算法以一定概率提前在后台刷新，
+      查询越慢、越接近过期，提前刷新的概率越大
+    - 过期后的 stale_ttl 时间内仍返回旧值，同时在后台刷新
+    - 可选的进程内缓存（L1）放在 Redis（L2）前面，只缓存未过期的值，且不超过其剩余有效时间；
+      写入或删除缓存时通过失效通知让其他进程丢弃 L1 中的旧值
+    """
+
+    def __init__(self, client, codec: CacheCodec = None, stale_ttl: int = STALE_TTL, beta: float = XFETCH_BETA,
+                 lock_ttl: int = LOCK_TTL, lock_wait: float = LOCK_WAIT, refresh_workers: int = REFRESH_WORKERS,
+                 local: LocalCache = None, bus: InvalidationBus = None, tag_max_members: int = TAG_MAX_MEMBERS):
+        """
+        :param client: Redis 客户端（decode_responses=False）
+        :param codec: 缓存编解码器
+        :param stale_ttl: 过期后仍可返回旧值的时间（秒）
+        :param beta: 提前刷新的激进程度，为0时不提前刷新
+        :param lock_ttl: 计算锁的过期时间（秒）
+        :param lock_wait: 未抢到锁时等待其他进程写入缓存的最长时间（秒）
+        :param refresh_workers: 后台刷新线程数
+        :param local: 进程内缓存，为空时每次都读 Redis
+        :param bus: 失效通知，为空时只靠 L1 的有效时间保证一致
+        :param tag_max_members: 标签集合超过该成员数时在后台清理其中已过期的键
+        """
+        super().__init__(client, codec, stale_ttl, beta, lock_ttl, lock_wait, local, bus,
+                         CacheInvalidator(client), tag_max_members)
+        self._executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix='cache-refresh')
+
+    def get(self, key: str, loader: Callable[[], Any], ttl: int, stale_ttl: int = None,
+            tags: Iterable[str] = ()) -> Any:
+        """
+        读取缓存，未命中时调用 loader 计算并写入
+        :param key: 缓存键
+        :param loader: 计算缓存值的函数
+        :param ttl: 缓存有效时间（秒）
+        :param stale_ttl: 过期后仍可返回旧值的时间（秒），默认使用构造时的设置
+        :param tags: 写入时登记的标签，供按标签失效
+        :return: 缓存值
+        """
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not MISSING:
+                return value
+
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        entry = self._read(key)
+        if entry is not None:
+            return self._serve(key, entry, loader, ttl, stale_ttl, tags)
+
+        self.stats['misses'] += 1
+        return self._load(key, loader, ttl, stale_ttl, tags, blocking=True)
+
+    def get_many(self, keys: Iterable[str], loader: Callable[[List[str]], Dict[str, Any]], ttl: int,
+                 stale_ttl: int = None, tags: Callable[[str], Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        批量读取缓存：L1 之外的键用一次 MGET 读取，未命中的键一起交给 loader 计算，再用一个管道写回，
+        N 个键最多两次 Redis 往返和一次 loader 调用
+
+        未命中的键只在进程内合并并发计算，不抢 Redis 锁（否则每个键都要一次往返），
+        多个进程同时批量未命中时可能重复计算。
+        :param keys: 缓存键
+        :param loader: 接收未命中的键列表，返回 {键: 值}；返回结果中没有的键不缓存，也不出现在结果中
+        :param ttl: 缓存有效时间（秒）
+        :param stale_ttl: 过期后仍可返回旧值的时间（秒），默认使用构造时的设置
+        :param tags: 接收缓存键、返回该键标签的函数
+        :return: {键: 值}
+        """
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        tags = tags or (lambda key: ())
+        values, pending = self._local_get_many(keys)
+        if not pending:
+            return values
+
+        missing = []
+        for key, entry in zip(pending, self._read_many(pending)):
+            if entry is None:
+                self.stats['misses'] += 1
+                missing.append(key)
+            else:
+                values[key] = self._serve(key, entry, partial(_load_one, loader, key), ttl, stale_ttl, tags(key))
+
+        if missing:
+            values.update(self._load_many(missing, loader, ttl, stale_ttl, tags))
+        return values
+
+    def refresh(self, key: str, loader: Callable[[], Any], ttl: int, stale_ttl: int = None,
+                tags: Iterable[str] = ()) -> Any:
+        """
+        立即重新计算并写入缓存
+        :param key: 缓存键
+        :param loader: 计算缓存值的函数
+        :param ttl: 缓存有效时间（秒）
+        :param stale_ttl: 过期后仍可返回旧值的时间（秒）
+        :param tags: 写入时登记的标签
+        :return: 缓存值
+        """
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        return self._load(key, loader, ttl, stale_ttl, tags, blocking=True)
+
+    def invalidate(self, key: str):
+        """删除缓存，并通知其他进程丢弃 L1 中的值"""
+        self.client.delete(key)
+        self._drop_local([key])
+
+    def close(self):
+        """等待后台刷新结束"""
+        self._executor.shutdown(wait=True)
+
+    def _drop_local(self, keys):
+        """删除本进程 L1 中的键，并通知其他进程"""
+        if self.local is not None:
+            self.local.delete(keys)
+        if self.bus is not None:
+            self.bus.publish(keys)
+
+    def _read(self, key: str) -> Optional[Dict]:
+        """读取缓存条目，不存在或无法解码时返回 None"""
+        start = time.perf_counter()
+        payload = self.client.get(key)
+        self._record_read(1, start)
+        return self._decode(payload)
+
+    def _read_many(self, keys: List[str]) -> List[Optional[Dict]]:
+        """用一次 MGET 读取多个缓存条目"""
+        start = time.perf_counter()
+        payloads = self.client.mget(keys)
+        self._record_read(len(keys), start)
+        return [self._decode(payload) for payload in payloads]
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Any], ttl: int, stale_ttl: int,
+                               tags: Iterable[str]):
+        """提交后台刷新，本进程已在计算该键时不重复提交"""
+        if key in self._inflight:
+            return
+        self._executor.submit(self._background_load, key, loader, ttl, stale_ttl, tags)
+
+    def _background_load(self, key: str, loader: Callable[[], Any], ttl: int, stale_ttl: int,
+                         tags: Iterable[str]):
+        try:
+            self._load(key, loader, ttl, stale_ttl, tags, blocking=False)
+        except Exception as e:
+            # 刷新失败时继续使用旧值
+            self.stats['refresh_errors'] += 1
+            print(f"后台刷新缓存失败：{key}（{e}）")
+
+    def _prune_in_background(self, due: List[Tuple[str, int]]):
+        for tag, size in due:
+            self._executor.submit(self._prune, tag, size)
+
+    def _prune(self, tag: str, size: int):
+        removed = 0
+        try:
+            removed = self.invalidator.prune_tag(tag)
+        except Exception as e:
+            print(f"清理标签集合失败：{tag}（{e}）")
+        finally:
+            self._pruned(tag, size, removed)
+
+    def _load(self, key: str, loader: Callable[[], Any], ttl: int, stale_ttl: int, tags: Iterable[str],
+              blocking: bool) -> Any:
+        """
+        进程内合并同一个键的并发计算：第一个线程负责计算，其余线程等待同一个结果
+        :param blocking: 为 False 时（后台刷新）有别的线程或进程在计算就直接返回
+        """
+        owned, waiting = self._join([key], Future)
+        if waiting:
+            self.stats['coalesced'] += 1
+            if not blocking:
+                return None
+            values, retry = self._split_waited({key: waiting[key].result()})
+            if retry:
+                # 等到的是没抢到锁的后台刷新，它没有计算，由本线程重新加载
+                return self._load(key, loader, ttl, stale_ttl, tags, blocking=True)
+            return values.get(key)
+
+        future = owned[key]
+        try:
+            value = self._load_across_workers(key, loader, ttl, stale_ttl, tags, blocking)
+            future.set_result(value)
+            return None if value is NOT_LOADED else value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._leave([key])
+
+    def _load_across_workers(self, key: str, loader: Callable[[], Any], ttl: int, stale_ttl: int,
+                             tags: Iterable[str], blocking: bool) -> Any:
+        """
+        抢到 Redis 锁的进程负责计算，其余进程等待缓存写入，等待超时后自己计算
+        :return: 缓存值；blocking 为 False 且没有抢到锁时返回 NOT_LOADED
+        """
+        lock_key, token, lock_ms = self._lock_args(key)
+        if self.client.set(lock_key, token, nx=True, px=lock_ms):
+            try:
+                return self._compute(key, loader, ttl, stale_ttl, tags)
+            finally:
+                self._release_script(keys=[lock_key], args=[token])
+
+        if not blocking:
+            return NOT_LOADED
+
+        for delay in self._lock_wait_delays():
+            time.sleep(delay)
+            entry = self._read(key)
+            if self._fresh(entry):
+                return entry['v']
+        return self._compute(key, loader, ttl, stale_ttl, tags)
+
+    def _load_many(self, keys: List[str], loader: Callable[[List[str]], Dict[str, Any]], ttl: int, stale_ttl: int,
+                   tags: Callable[[str], Iterable[str]]) -> Dict[str, Any]:
+        """
+        批量计算未命中的键：本进程其他线程正在计算的键等待其结果，其余的键一起交给 loader
+        """
+        owned, waiting = self._join(keys, Future)
+        values = {}
+        try:
+            if owned:
+                values = self._compute_many(list(owned), loader, ttl, stale_ttl, tags)
+                for key, future in owned.items():
+                    future.set_result(values.get(key, MISSING))
+        except BaseException as e:
+            for future in owned.values():
+                if not future.done():
+                    future.set_exception(e)
+            raise
+        finally:
+            self._leave(owned)
+
+        self.stats['coalesced'] += len(waiting)
+        waited, retry = self._split_waited({key: future.result() for key, future in waiting.items()})
+        values.update(waited)
+        if retry:
+            # 等到的是没抢到锁的后台刷新，这些键重新加载
+            values.update(self._load_many(retry, loader, ttl, stale_ttl, tags))
+        return values
+
+    def _compute_many(self, keys: List[str], loader: Callable[[List[str]], Dict[str, Any]], ttl: int, stale_ttl: int,
+                      tags: Callable[[str], Iterable[str]]) -> Dict[str, Any]:
+        """调用一次 loader 计算多个键，并用一个管道写入缓存和登记标签"""
+        start = time.perf_counter()
+        values = loader(keys)
+        delta = time.perf_counter() - start
+        self.stats['loads'] += 1
+
+        pipe = self.client.pipeline(transaction=False)
+        registered = self._write(pipe, values, delta, ttl, stale_ttl, tags)
+        self._prune_in_background(self._tags_to_prune(registered, pipe.execute()))
+
+        if self.bus is not None:
+            self.bus.publish(values)
+        self._store_local(values, ttl)
+        return values
+
+    def _compute(self, key: str, loader: Callable[[], Any], ttl: int, stale_ttl: int, tags: Iterable[str]) -> Any:
+        """调用 loader 并写入缓存；写入和登记标签一次往返完成"""
+        start = time.perf_counter()
+        value = loader()
+        delta = time.perf_counter() - start
+        self.stats['loads'] += 1
+
+        pipe = self.client.pipeline(transaction=False)
+        registered = self._write(pipe, {key: value}, delta, ttl, stale_ttl, lambda _: tags)
+        self._prune_in_background(self._tags_to_prune(registered, pipe.execute()))
+
+        # 其他进程 L1 中的旧值作废，本进程直接放入新值
+        if self.bus is not None:
+            self.bus.publish([key])
+        self._store_local({key: value}, ttl)
+        return value
+
+
+class AsyncReadThroughCache(_ReadThroughPolicy):
+    """
+    ReadThroughCache 的异步版本：基于 redis.asyncio，loader 是返回协程的函数，
+    同一个键的并发加载在协程之间合并，后台刷新是事件循环中的任务
+
+    缓存策略（XFetch、旧值可用期、计算锁、合并加载）与 ReadThroughCache 是同一份实现，
+    缓存格式和锁也相同，同步和异步的进程可以共用缓存。需要在事件循环中创建。
+    """
+
+    def __init__(self, client, codec: CacheCodec = None, stale_ttl: int = STALE_TTL, beta: float = XFETCH_BETA,
+                 lock_ttl: int = LOCK_TTL, lock_wait: float = LOCK_WAIT, local: LocalCache = None,
+                 bus: AsyncInvalidationBus = None, tag_max_members: int = TAG_MAX_MEMBERS):
+        """
+        :param client: redis.asyncio 客户端（decode_responses=False）
+        :param codec: 缓存编解码器
+        :param stale_ttl: 过期后仍可返回旧值的时间（秒）
+        :param beta: 提前刷新的激进程度，为0时不提前刷新
+        :param lock_ttl: 计算锁的过期时间（秒）
+        :param lock_wait: 未抢到锁时等待其他进程写入缓存的最长时间（秒）
+        :param local: 进程内缓存，为空时每次都读 Redis
+        :param bus: 失效通知，为空时只靠 L1 的有效时间保证一致
+        :param tag_max_members: 标签集合超过该成员数时在后台清理其中已过期的键
+        """
+        super().__init__(client, codec, stale_ttl, beta, lock_ttl, lock_wait, local, bus,
+                         AsyncCacheInvalidator(client), tag_max_members)
+        # 后台刷新任务，保存引用避免被回收
+        self._background = set()
+
+    async def get(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int = None,
+                  tags: Iterable[str] = ()) -> Any:
+        """
+        读取缓存，未命中时调用 loader 计算并写入，参数同 ReadThroughCache.get
+        """
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not MISSING:
+                return value
+
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        entry = await self._read(key)
+        if entry is not None:
+            return self._serve(key, entry, loader, ttl, stale_ttl, tags)
+
+        self.stats['misses'] += 1
+        return await self._load(key, loader, ttl, stale_ttl, tags, blocking=True)
+
+    async def get_many(self, keys: Iterable[str], loader: Callable[[List[str]], Awaitable[Dict[str, Any]]], ttl: int,
+                       stale_ttl: int = None, tags: Callable[[str], Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        批量读取缓存，参数同 ReadThroughCache.get_many
+        """
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        tags = tags or (lambda key: ())
+        values, pending = self._local_get_many(keys)
+        if not pending:
+            return values
+
+        missing = []
+        for key, entry in zip(pending, await self._read_many(pending)):
+            if entry is None:
+                self.stats['misses'] += 1
+                missing.append(key)
+            else:
+                values[key] = self._serve(key, entry, partial(_load_one_async, loader, key), ttl, stale_ttl,
+                                          tags(key))
+
+        if missing:
+            values.update(await self._load_many(missing, loader, ttl, stale_ttl, tags))
+        return values
+
+    async def refresh(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int = None,
+                      tags: Iterable[str] = ()) -> Any:
+        """立即重新计算并写入缓存，参数同 ReadThroughCache.refresh"""
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        return await self._load(key, loader, ttl, stale_ttl, tags, blocking=True)
+
+    async def invalidate(self, key: str):
+        """删除缓存，并通知其他进程丢弃 L1 中的值"""
+        await self.client.delete(key)
+        await self._drop_local([key])
+
+    async def close(self):
+        """等待后台刷新结束"""
+        if self._background:
+            await asyncio.gather(*self._background, return_exceptions=True)
+
+    async def _drop_local(self, keys):
+        if self.local is not None:
+            self.local.delete(keys)
+        if self.bus is not None:
+            await self.bus.publish(keys)
+
+    async def _read(self, key: str) -> Optional[Dict]:
+        start = time.perf_counter()
+        payload = await self.client.get(key)
+        self._record_read(1, start)
+        return self._decode(payload)
+
+    async def _read_many(self, keys: List[str]) -> List[Optional[Dict]]:
+        start = time.perf_counter()
+        payloads = await self.client.mget(keys)
+        self._record_read(len(keys), start)
+        return [self._decode(payload) for payload in payloads]
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int,
+                               tags: Iterable[str]):
+        """创建后台刷新任务，本进程已在计算该键时不重复创建"""
+        if key in self._inflight:
+            return
+        task = asyncio.get_running_loop().create_task(self._background_load(key, loader, ttl, stale_ttl, tags))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _background_load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int,
+                               tags: Iterable[str]):
+        try:
+            await self._load(key, loader, ttl, stale_ttl, tags, blocking=False)
+        except Exception as e:
+            # 刷新失败时继续使用旧值
+            self.stats['refresh_errors'] += 1
+            print(f"后台刷新缓存失败：{key}（{e}）")
+
+    def _prune_in_background(self, due: List[Tuple[str, int]]):
+        for tag, size in due:
+            task = asyncio.get_running_loop().create_task(self._prune(tag, size))
+            self._background.add(task)
+            task.add_done_callback(self._background.discard)
+
+    async def _prune(self, tag: str, size: int):
+        removed = 0
+        try:
+            removed = await self.invalidator.prune_tag(tag)
+        except Exception as e:
+            print(f"清理标签集合失败：{tag}（{e}）")
+        finally:
+            self._pruned(tag, size, removed)
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int,
+                    tags: Iterable[str], blocking: bool) -> Any:
+        """
+        合并同一个键的并发计算：第一个协程负责计算，其余协程等待同一个结果
+        :param blocking: 为 False 时（后台刷新）有别的协程或进程在计算就直接返回
+        """
+        owned, waiting = self._join([key], asyncio.get_running_loop().create_future)
+        if waiting:
+            self.stats['coalesced'] += 1
+            if not blocking:
+                return None
+            values, retry = self._split_waited({key: await asyncio.shield(waiting[key])})
+            if retry:
+                # 等到的是没抢到锁的后台刷新，它没有计算，由本协程重新加载
+                return await self._load(key, loader, ttl, stale_ttl, tags, blocking=True)
+            return values.get(key)
+
+        future = owned[key]
+        try:
+            value = await self._load_across_workers(key, loader, ttl, stale_ttl, tags, blocking)
+            future.set_result(value)
+            return None if value is NOT_LOADED else value
+        except BaseException as e:
+            _fail(future, e)
+            raise
+        finally:
+            self._leave([key])
+
+    async def _load_across_workers(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int,
+                                   tags: Iterable[str], blocking: bool) -> Any:
+        """
+        抢到 Redis 锁的进程负责计算，其余进程等待缓存写入，等待超时后自己计算
+        :return: 缓存值；blocking 为 False 且没有抢到锁时返回 NOT_LOADED
+        """
+        lock_key, token, lock_ms = self._lock_args(key)
+        if await self.client.set(lock_key, token, nx=True, px=lock_ms):
+            try:
+                return await self._compute(key, loader, ttl, stale_ttl, tags)
+            finally:
+                await self._release_script(keys=[lock_key], args=[token])
+
+        if not blocking:
+            return NOT_LOADED
+
+        for delay in self._lock_wait_delays():
+            await asyncio.sleep(delay)
+            entry = await self._read(key)
+            if self._fresh(entry):
+                return entry['v']
+        return await self._compute(key, loader, ttl, stale_ttl, tags)
+
+    async def _load_many(self, keys: List[str], loader: Callable[[List[str]], Awaitable[Dict[str, Any]]], ttl: int,
+                         stale_ttl: int, tags: Callable[[str], Iterable[str]]) -> Dict[str, Any]:
+        """批量计算未命中的键：本进程其他协程正在计算的键等待其结果，其余的键一起交给 loader"""
+        owned, waiting = self._join(keys, asyncio.get_running_loop().create_future)
+        values = {}
+        try:
+            if owned:
+                values = await self._compute_many(list(owned), loader, ttl, stale_ttl, tags)
+                for key, future in owned.items():
+                    future.set_result(values.get(key, MISSING))
+        except BaseException as e:
+            for future in owned.values():
+                if not future.done():
+                    _fail(future, e)
+            raise
+        finally:
+            self._leave(owned)
+
+        self.stats['coalesced'] += len(waiting)
+        results = {key: await asyncio.shield(future) for key, future in waiting.items()}
+        waited, retry = self._split_waited(results)
+        values.update(waited)
+        if retry:
+            # 等到的是没抢到锁的后台刷新，这些键重新加载
+            values.update(await self._load_many(retry, loader, ttl, stale_ttl, tags))
+        return values
+
+    async def _compute_many(self, keys: List[str], loader: Callable[[List[str]], Awaitable[Dict[str, Any]]],
+                            ttl: int, stale_ttl: int, tags: Callable[[str], Iterable[str]]) -> Dict[str, Any]:
+        """调用一次 loader 计算多个键，并用一个管道写入缓存和登记标签"""
+        start = time.perf_counter()
+        values = await loader(keys)
+        delta = time.perf_counter() - start
+        self.stats['loads'] += 1
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            registered = self._write(pipe, values, delta, ttl, stale_ttl, tags)
+            self._prune_in_background(self._tags_to_prune(registered, await pipe.execute()))
+
+        if self.bus is not None:
+            await self.bus.publish(values)
+        self._store_local(values, ttl)
+        return values
+
+    async def _compute(self, key: str, loader: Callable[[], Awaitable[Any]], ttl: int, stale_ttl: int,
+                       tags: Iterable[str]) -> Any:
+        """调用 loader 并写入缓存；写入和登记标签一次往返完成"""
+        start = time.perf_counter()
+        value = await loader()
+        delta = time.perf_counter() - start
+        self.stats['loads'] += 1
+
+        async with self.client.pipeline(transaction=False) as pipe:
+            registered = self._write(pipe, {key: value}, delta, ttl, stale_ttl, lambda _: tags)
+            self._prune_in_background(self._tags_to_prune(registered, await pipe.execute()))
+
+        if self.bus is not None:
+            await self.bus.publish([key])
+        self._store_local({key: value}, ttl)
+        return value
+
+
+def _fail(future: asyncio.Future, error: BaseException):
+    """设置异常；没有其他协程等待时不报 "exception was never retrieved" """
+    future.set_exception(error)
+    future.exception()
@@ -1,9 +1,16 @@
 import os
+import time
+import threading
 
 import redis
 from neo4j import GraphDatabase
 from dotenv import load_dotenv
 
+from utils.cache_codec import CacheCodec, CacheDecodeError
+from utils.read_through_cache import ReadThroughCache, make_cache_key
+from utils.local_cache import LocalCache, InvalidationBus, MISSING
+from utils.cache_invalidation import CacheInvalidator, add_to_tags
+
 
 # 加载环境变量
 load_dotenv()
@@ -14,27 +21,113 @@ REDIS_PORT = int(os.getenv('REDIS_PORT', 6379))
 REDIS_PASSWORD = os.getenv('REDIS_PASSWORD', None)
 REDIS_DB = int(os.getenv('REDIS_DB', 0))
 
+# 进程内共享的 Redis 连接池大小，连接用完时最多等待 REDIS_POOL_TIMEOUT 秒
+REDIS_MAX_CONNECTIONS = int(os.getenv('REDIS_MAX_CONNECTIONS', 50))
+REDIS_POOL_TIMEOUT = float(os.getenv('REDIS_POOL_TIMEOUT', 5))
+
+# 所有 Neo4j 查询结果缓存都带的标签，知识图谱重建后按它整体失效
+GRAPH_CACHE_TAG = 'neo4j'
+
+# 知识图谱版本号，Knowledge_Graph_Building 的构建器每次写库后加一（与 graph_engine.GRAPH_VERSION_QUERY 相同）
+GRAPH_VERSION_QUERY = """
+OPTIONAL MATCH (m:GraphMeta {name: 'knowledge_graph'})
+RETURN coalesce(m.version, 0) AS version
+"""
+
+# Redis 中记录的、缓存已对应到的图谱版本号，多个进程用它保证每次重建只清除一次缓存
+GRAPH_VERSION_KEY = 'neo4j:graph_version'
+
+# 查询缓存前检查图谱版本号的间隔（秒），构建器重建图谱后最多这么久缓存被清除
+GRAPH_VERSION_CHECK_INTERVAL = float(os.getenv('GRAPH_VERSION_CHECK_INTERVAL', 30))
+
 # neo4j连接配置
 NEO4J_URI = os.getenv('NEO4J_URI', 'bolt://localhost:7687')
 NEO4J_USER = os.getenv('NEO4J_USER', 'neo4j')
 NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD', 'password')
 
+# Neo4j 驱动的连接池大小
+NEO4J_MAX_CONNECTIONS = int(os.getenv('NEO4J_MAX_CONNECTIONS', 50))
+
+# 单个用户的朋友列表，get_user_friends 和 get_users_friends 共用同一个缓存键
+FRIENDS_QUERY = """
+MATCH (u:User {email: $email})-[:FRIEND]->(f:User)
+RETURN f.name as name,f.email as email
+LIMIT 50
+"""
+
+# 一次查询多个用户的朋友列表
+FRIENDS_BATCH_QUERY = """
+UNWIND $emails AS email
+MATCH (u:User {email: email})-[:FRIEND]->(f:User)
+WITH email, collect(f {.name, .email})[..50] AS friends
+RETURN email, friends
+"""
+
+# 一次查询多个用户的信息
+USERS_BATCH_QUERY = """
+UNWIND $emails AS email
+MATCH (u:User {email: email})
+RETURN email, u.name AS name, u.create_at AS create_at
+"""
+
+_redis_pools = {}
+_redis_pools_lock = threading.Lock()
+
+
+def get_redis_pool(decode_responses: bool = False) -> redis.ConnectionPool:
+    """
+    进程内共享的 Redis 连接池，所有 DatabaseManager 共用，按是否自动解码分为两个
+    :param decode_responses: 是否自动解码返回字符串
+    :return: 连接池
+    """
+    with _redis_pools_lock:
+        pool = _redis_pools.get(decode_responses)
+        if pool is None:
+            pool = _redis_pools[decode_responses] = redis.BlockingConnectionPool(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                password=REDIS_PASSWORD,
+                db=REDIS_DB,
+                decode_responses=decode_responses,
+                max_connections=REDIS_MAX_CONNECTIONS,
+                timeout=REDIS_POOL_TIMEOUT
+            )
+        return pool
+
 
 class DatabaseManager:
-    def __init__(self):
-        # 连接redis
-        self.redis_client = redis.Redis(
-            host=REDIS_HOST,
-            port=REDIS_PORT,
-            password=REDIS_PASSWORD,
-            db=REDIS_DB,
-            decode_responses=True  # 自动解码返回字符串
-        )
+    def __init__(self, codec: CacheCodec = None, local_cache: bool = True):
+        # 连接redis（自动解码返回字符串），使用进程内共享的连接池
+        self.redis_client = redis.Redis(connection_pool=get_redis_pool(decode_responses=True))
+
+        # 缓存值是编码后的二进制数据，用不自动解码的客户端读写
+        self.cache_client = redis.Redis(connection_pool=get_redis_pool())
+        self.codec = codec or CacheCodec()
+
+        # 进程内缓存（L1），多个 worker 之间通过 Redis 发布/订阅同步失效
+        self.local_cache = LocalCache() if local_cache else None
+        self.invalidation_bus = None
+        if self.local_cache is not None:
+            self.invalidation_bus = InvalidationBus(self.cache_client)
+            self.invalidation_bus.attach(self.local_cache)
+            self.invalidation_bus.start()
+
+        # 查询结果的读穿缓存（防击穿、提前刷新、过期后返回旧值）
+        self.query_cache = ReadThroughCache(self.cache_client, self.codec,
+                                            local=self.local_cache, bus=self.invalidation_bus)
+
+        # 按标签或模式失效缓存，不阻塞 Redis
+        self.invalidator = CacheInvalidator(self.cache_client, self.local_cache, self.invalidation_bus)
+
+        # 上次检查图谱版本号的时间，见 sync_graph_version
+        self._graph_checked_at = float('-inf')
+        self._graph_lock = threading.Lock()
 
         # 连接neo4j
         self.neo4j_driver = GraphDatabase.driver(
             NEO4J_URI,
-            auth=(NEO4J_USER, NEO4J_PASSWORD)
+            auth=(NEO4J_USER, NEO4J_PASSWORD),
+            max_connection_pool_size=NEO4J_MAX_CONNECTIONS
         )
 
     def test_redis_connection(self):
@@ -58,29 +151,151 @@ class DatabaseManager:
             print(f"Neo4j 连接失败：{e}")
             return False
 
-    def cache_neo4j_query_result(self, query, cache_key, ttl=3600):
+    def get_cached(self, cache_key):
         """
-        缓存 Neo4j 查询结果到 Redis
-        :param query: Neo4j 查询语句
+        读取缓存
+        :param cache_key: Redis 缓存键
+        :return: 缓存的值，不存在或无法解码（如旧格式的数据）时返回 None
+        """
+        if self.local_cache is not None:
+            value = self.local_cache.get(cache_key)
+            if value is not MISSING:
+                return value
+
+        # 同时取剩余有效时间，L1 的有效时间不超过它；两条命令一次往返
+        pipe = self.cache_client.pipeline(transaction=False)
+        pipe.get(cache_key)
+        pipe.ttl(cache_key)
+        payload, remaining = pipe.execute()
+        if payload is None:
+            return None
+        try:
+            value = self.codec.loads(payload)
+        except CacheDecodeError as e:
+            print(f"缓存无法解码，按未命中处理：{cache_key}（{e}）")
+            return None
+
+        if self.local_cache is not None and remaining and remaining > 0:
+            self.local_cache.set(cache_key, value, remaining)
+        return value
+
+    def set_cached(self, cache_key, ttl, value, tags=()):
+        """
+        写入缓存
         :param cache_key: Redis 缓存键
         :param ttl: 缓存过期时间
+        :param value: 要缓存的值
+        :param tags: 登记的标签，供按标签失效
+        """
+        pipe = self.cache_client.pipeline(transaction=False)
+        pipe.setex(cache_key, ttl, self.codec.dumps(value))
+        add_to_tags(pipe, cache_key, tags, ttl)
+        pipe.execute()
+        if self.local_cache is not None:
+            self.local_cache.set(cache_key, value, ttl)
+            self.invalidation_bus.publish([cache_key])
+
+    def get_many_cached(self, cache_keys):
+        """
+        批量读取缓存，L1 之外的键用一个管道（MGET 加各键的 TTL）一次往返读取
+        :param cache_keys: Redis 缓存键
+        :return: {键: 值}，不存在或无法解码的键不在结果中
+        """
+        values = {}
+        pending = []
+        for cache_key in dict.fromkeys(cache_keys):
+            if self.local_cache is not None:
+                value = self.local_cache.get(cache_key)
+                if value is not MISSING:
+                    values[cache_key] = value
+                    continue
+            pending.append(cache_key)
+        if not pending:
+            return values
+
+        pipe = self.cache_client.pipeline(transaction=False)
+        pipe.mget(pending)
+        for cache_key in pending:
+            pipe.ttl(cache_key)
+        payloads, *remainings = pipe.execute()
+
+        for cache_key, payload, remaining in zip(pending, payloads, remainings):
+            if payload is None:
+                continue
+            try:
+                value = self.codec.loads(payload)
+            except CacheDecodeError as e:
+                print(f"缓存无法解码，按未命中处理：{cache_key}（{e}）")
+                continue
+            values[cache_key] = value
+            if self.local_cache is not None and remaining and remaining > 0:
+                self.local_cache.set(cache_key, value, remaining)
+        return values
+
+    def set_many_cached(self, items, ttl, tags=None):
+        """
+        批量写入缓存，一个管道一次往返
+        :param items: {键: 值}
+        :param ttl: 缓存过期时间
+        :param tags: 接收缓存键、返回该键标签的函数
+        """
+        if not items:
+            return
+        pipe = self.cache_client.pipeline(transaction=False)
+        for cache_key, value in items.items():
+            pipe.setex(cache_key, ttl, self.codec.dumps(value))
+            if tags is not None:
+                add_to_tags(pipe, cache_key, tags(cache_key), ttl)
+        pipe.execute()
+        if self.local_cache is not None:
+            for cache_key, value in items.items():
+                self.local_cache.set(cache_key, value, ttl)
+            self.invalidation_bus.publish(items)
+
+    def cache_stats(self):
+        """
+        两级缓存的命中率和读取耗时
+        :return: 统计信息
+        """
+        return self.query_cache.report()
+
+    def cached_query(self, query, params=None, ttl=3600, cache_key=None, tags=()):
+        """
+        通过读穿缓存执行只读查询，缓存键由查询语句和参数自动生成
+        :param query: Neo4j 查询语句
+        :param params: 查询参数
+        :param ttl: 缓存有效时间
+        :param cache_key: 指定缓存键（一般不需要）
+        :param tags: 额外的标签，如 entity:Python、user:someone@example.com；总会带上 GRAPH_CACHE_TAG
         :return: 查询结果
         """
-        # 先检查 Redis 中是否有缓存
-        cached_result = self.redis_client.get(cache_key)
-        if cached_result:
-            print(f"从 Redis 缓存获取数据：{cache_key}")
-            return eval(cached_result)  # 后续换成实际的反序列化方式
+        self._check_graph_version()
+        if cache_key is None:
+            cache_key = make_cache_key(query, params)
+        return self.query_cache.get(cache_key, lambda: self.run_read_query(query, params), ttl,
+                                    tags=(GRAPH_CACHE_TAG, *tags))
 
-        # 如果没有缓存，查询Neo4j
-        print(f"查询 Neo4j 并缓存结果：{cache_key}")
+    def run_read_query(self, query, params=None):
+        """
+        直接在 Neo4j 中执行只读查询
+        :param query: Neo4j 查询语句
+        :param params: 查询参数
+        :return: 查询结果
+        """
         with self.neo4j_driver.session() as session:
-            result = session.run(query)
-            data = [record.data for record in result]
+            result = session.run(query, params or {})
+            return [record.data() for record in result]
 
-            # 将结果缓存到 Redis
-            self.redis_client.setex(cache_key, ttl, str(data))
-            return data
+    def cache_neo4j_query_result(self, query, cache_key=None, ttl=3600, params=None):
+        """
+        缓存 Neo4j 查询结果到 Redis
+        :param query: Neo4j 查询语句
+        :param cache_key: Redis 缓存键，为空时由查询语句和参数自动生成
+        :param ttl: 缓存过期时间
+        :param params: 查询参数
+        :return: 查询结果
+        """
+        return self.cached_query(query, params, ttl, cache_key)
 
     def create_user_with_cache(self, name, email):
         """
@@ -89,31 +304,31 @@ class DatabaseManager:
         :param email: 邮箱
         :return: 用户信息
         """
-        user_key = f"user: {email}"
+        user_key = f"user:{email}"
 
         # 检查 Redis 缓存
-        cached_user = self.redis_client.get(user_key)
-        if cached_user:
+        cached_user = self.get_cached(user_key)
+        if cached_user is not None:
             print(f"从缓存获取用户：{email}")
-            return eval(cached_user)
+            return cached_user
 
         # 在 Neo4j中创建用户
-        query = f"""
+        query = """
         CREATE (u: User {name: $name, email: $email, create_at: timestamp()})
         RETURN u
         """
 
         with self.neo4j_driver.session() as session:
-            result = session.run(query, name, email)
+            result = session.run(query, name=name, email=email)
             user_data = result.single()[0]
 
             # 缓存到Redis(24小时过期)
             user_info = {
                 'name': user_data['name'],
-                'email': email['email'],
+                'email': email,
                 'create_at': user_data['create_at']
             }
-            self.redis_client.setex(user_key, 86400, str(user_info))
+            self.set_cached(user_key, 86400, user_info, tags=(f"user:{email}",))
 
             return user_info
 
@@ -123,42 +338,108 @@ class DatabaseManager:
         :param user_email:
         :return:
         """
-        cache_key = f"user:{user_email}:friends"
+        # 缓存5分钟
+        return self.cached_query(FRIENDS_QUERY, {'email': user_email}, ttl=300, tags=(f"user:{user_email}",))
 
-        # 检查缓存
-        cached = self.redis_client.get(cache_key)
-        if cached:
-            return eval(cached)
+    def get_users_friends(self, user_emails):
+        """
+        批量获取多个用户的朋友列表，与 get_user_friends 共用缓存；
+        缓存用一次 MGET 读取，未命中的用户用一条 UNWIND 查询一起查出，再用一个管道写回
+        :param user_emails: 用户邮箱
+        :return: {邮箱: 朋友列表}
+        """
+        self._check_graph_version()
+        emails = {make_cache_key(FRIENDS_QUERY, {'email': email}): email for email in user_emails}
 
-        # 查询Neo4j
-        query = """
-        MATCH (u:User {email: $email})-[:FRIEND]->(f:User)
-        RETURN f.name as name,f.email as email
-        LIMIT 50
+        def load(cache_keys):
+            rows = self.run_read_query(FRIENDS_BATCH_QUERY, {'emails': [emails[key] for key in cache_keys]})
+            friends = {row['email']: row['friends'] for row in rows}
+            # 没有朋友的用户也缓存空列表
+            return {key: friends.get(emails[key], []) for key in cache_keys}
+
+        values = self.query_cache.get_many(emails, load, ttl=300,
+                                           tags=lambda key: (GRAPH_CACHE_TAG, f"user:{emails[key]}"))
+        return {emails[key]: value for key, value in values.items()}
+
+    def get_users_cached(self, user_emails):
+        """
+        批量获取用户信息，缓存键与 create_user_with_cache 相同；
+        缓存用一个管道读取，未命中的用户用一条 UNWIND 查询一起查出，再用一个管道写回
+        :param user_emails: 用户邮箱
+        :return: {邮箱: 用户信息}，不存在的用户不在结果中
         """
+        emails = {f"user:{email}": email for email in user_emails}
+        cached = self.get_many_cached(emails)
+        users = {emails[key]: value for key, value in cached.items()}
+
+        missing = [email for key, email in emails.items() if key not in cached]
+        if missing:
+            rows = self.run_read_query(USERS_BATCH_QUERY, {'emails': missing})
+            loaded = {f"user:{row['email']}": row for row in rows}
+            self.set_many_cached(loaded, 86400, tags=lambda key: (key,))
+            users.update((row['email'], row) for row in rows)
+        return users
+
+    def invalidate_tags(self, *tags):
+        """
+        删除打了这些标签的缓存，如用户信息变化后 invalidate_tags(f"user:{email}")
+        :param tags: 标签
+        :return: 删除的键数
+        """
+        deleted = self.invalidator.invalidate_tags(tags)
+        print(f"按标签清除缓存：{', '.join(tags)}，{deleted}个键")
+        return deleted
 
-        with self.neo4j_driver.session() as session:
-            result = session.run(query, email=user_email)
-            friends = [record.data() for record in result]
+    def invalidate_graph_cache(self):
+        """
+        知识图谱重建后删除全部 Neo4j 查询结果缓存
+        :return: 删除的键数
+        """
+        return self.invalidate_tags(GRAPH_CACHE_TAG)
 
-            # 缓存结果(5分钟过期)
-            self.redis_client.setex(cache_key,300,str(friends))
-            return friends
+    def sync_graph_version(self):
+        """
+        知识图谱的版本号与 Redis 中记录的不同（构建器重建或写入了图谱）时删除全部 Neo4j 查询结果缓存；
+        用 SET ... GET 交换版本号，多个进程同时发现同一次变化时只有一个进程清除。
+        cached_query 和 get_users_friends 每隔 GRAPH_VERSION_CHECK_INTERVAL 秒自动调用一次
+        :return: 删除的键数
+        """
+        version = self.run_read_query(GRAPH_VERSION_QUERY)[0]['version']
+        previous = self.cache_client.set(GRAPH_VERSION_KEY, version, get=True)
+        if previous is not None and int(previous) == version:
+            return 0
+        return self.invalidate_graph_cache()
 
     def clear_cache_pattern(self, pattern):
         """
-        清除匹配模式的 Redis 缓存
+        清除匹配模式的 Redis 缓存，用 SCAN 增量遍历并分批 UNLINK，不阻塞 Redis
         :param pattern:
-        :return:
+        :return: 删除的键数
         """
-        keys = self.redis_client.keys(pattern)
-        if keys:
-            self.redis_client.delete(*keys)
-            print(f"清除缓存：{len(keys)}个键")
+        deleted = self.invalidator.clear_pattern(pattern)
+        if deleted:
+            print(f"清除缓存：{deleted}个键")
+        return deleted
+
+    def _check_graph_version(self):
+        """距上次检查超过 GRAPH_VERSION_CHECK_INTERVAL 秒时检查图谱版本号，检查失败时继续使用现有缓存"""
+        now = time.monotonic()
+        with self._graph_lock:
+            if now - self._graph_checked_at < GRAPH_VERSION_CHECK_INTERVAL:
+                return
+            self._graph_checked_at = now
+        try:
+            self.sync_graph_version()
+        except Exception as e:
+            print(f"检查图谱版本号失败：{e}")
 
     def close(self):
         """关闭所有连接"""
+        self.query_cache.close()
+        if self.invalidation_bus is not None:
+            self.invalidation_bus.close()
         self.redis_client.close()
+        self.cache_client.close()
         self.neo4j_driver.close()
         print("所有数据库已关闭")
 
@@ -179,7 +460,7 @@ if __name__ == '__main__':
 
         # 示例2：查询 Neo4j 并缓存结果
         neo4j_query = "MATCH (n) RETURN count(n) as node_count"
-        result = db.cache_neo4j_query_result(neo4j_query, "node_count_cache", 60)
+        result = db.cached_query(neo4j_query, ttl=60)
         print(f"节点数量:{result}")
 
         # 示例3：设置 Redis 键值
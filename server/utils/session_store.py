@@ -0,0 +1,155 @@
+import os
+import hmac
+import time
+import base64
+import hashlib
+import secrets
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, Request, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from utils.cache_codec import CacheCodec, CacheDecodeError
+from utils.local_cache import LocalCache, AsyncInvalidationBus, MISSING
+
+
+# 会话在 Redis 中的键前缀
+SESSION_PREFIX = 'session:'
+
+# 会话有效时间（秒）
+SESSION_TTL = int(os.getenv('SESSION_TTL', 86400))
+
+# 进程内缓存会话的时间（秒）；注销后其他 worker 通过失效通知丢弃，收不到通知时最多再认这么久
+SESSION_LOCAL_TTL = float(os.getenv('SESSION_LOCAL_TTL', 30))
+
+# 进程内最多缓存的会话数
+SESSION_LOCAL_MAX_ENTRIES = 10000
+
+# 签名密钥，多个 worker 必须相同；未配置时每个进程随机生成，重启后已发出的令牌全部失效
+SESSION_SECRET = os.getenv('SESSION_SECRET')
+if not SESSION_SECRET:
+    print("未配置 SESSION_SECRET，使用随机密钥，多个 worker 之间的令牌不通用")
+    SESSION_SECRET = secrets.token_hex(32)
+
+
+def _sign(session_id: str, secret: bytes) -> str:
+    digest = hmac.new(secret, session_id.encode('utf-8'), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+
+class SessionStore:
+    """
+    登录会话：令牌为 "会话ID.签名"，会话内容保存在 Redis，前面有进程内 LRU 缓存
+
+    校验令牌时先验签名（伪造的令牌不访问 Redis），再查进程内缓存，未命中才读 Redis，
+    不访问 MySQL 的 users 表。注销时删除 Redis 中的会话并通知其他 worker 丢弃进程内缓存。
+    """
+
+    def __init__(self, client, codec: CacheCodec = None, bus: AsyncInvalidationBus = None,
+                 secret: str = SESSION_SECRET, ttl: int = SESSION_TTL, local_ttl: float = SESSION_LOCAL_TTL,
+                 local_max_entries: int = SESSION_LOCAL_MAX_ENTRIES):
+        """
+        :param client: redis.asyncio 客户端（decode_responses=False）
+        :param codec: 缓存编解码器
+        :param bus: 失效通知，为空时注销只在本进程立即生效
+        :param secret: 签名密钥
+        :param ttl: 会话有效时间（秒）
+        :param local_ttl: 进程内缓存会话的时间（秒）
+        :param local_max_entries: 进程内最多缓存的会话数
+        """
+        self.client = client
+        self.codec = codec or CacheCodec()
+        self.bus = bus
+        self.ttl = ttl
+        self.local = LocalCache(local_max_entries, local_ttl)
+        if bus is not None:
+            bus.attach(self.local)
+        self._secret = secret.encode('utf-8')
+
+    async def create(self, user: Dict) -> str:
+        """
+        创建会话
+        :param user: 会话中保存的用户信息，如 {'user_id': 1, 'username': 'admin'}
+        :return: 令牌
+        """
+        session_id = secrets.token_urlsafe(24)
+        now = time.time()
+        session = dict(user, created_at=now, expires_at=now + self.ttl)
+        await self.client.set(SESSION_PREFIX + session_id, self.codec.dumps(session), ex=self.ttl)
+        self.local.set(SESSION_PREFIX + session_id, session)
+        return f'{session_id}.{_sign(session_id, self._secret)}'
+
+    async def get(self, token: str) -> Optional[Dict]:
+        """
+        读取会话
+        :param token: 令牌
+        :return: 会话中的用户信息，令牌无效或会话已过期、已注销时返回 None
+        """
+        key = self._key(token)
+        if key is None:
+            return None
+
+        session = self.local.get(key)
+        if session is not MISSING:
+            return session
+
+        payload = await self.client.get(key)
+        if payload is None:
+            return None
+        try:
+            session = self.codec.loads(payload)
+        except CacheDecodeError:
+            return None
+        # 进程内缓存的时间不超过会话剩余的有效时间
+        self.local.set(key, session, session['expires_at'] - time.time())
+        return session
+
+    async def revoke(self, token: str):
+        """注销会话"""
+        key = self._key(token)
+        if key is None:
+            return
+        await self.client.delete(key)
+        self.local.delete([key])
+        if self.bus is not None:
+            await self.bus.publish([key])
+
+    def _key(self, token: str) -> Optional[str]:
+        """验证签名，返回会话在 Redis 中的键"""
+        session_id, _, signature = token.partition('.')
+        expected = _sign(session_id, self._secret)
+        if not session_id or not hmac.compare_digest(signature.encode('utf-8'), expected.encode('ascii')):
+            return None
+        return SESSION_PREFIX + session_id
+
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def get_session_store(request: Request) -> SessionStore:
+    """FastAPI 依赖：取 lifespan 中创建的 SessionStore"""
+    return request.app.state.sessions
+
+
+def get_token(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> str:
+    """FastAPI 依赖：取请求头 Authorization: Bearer <令牌> 中的令牌"""
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="未登录",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return credentials.credentials
+
+
+async def get_current_user(token: str = Depends(get_token),
+                           sessions: SessionStore = Depends(get_session_store)) -> Dict:
+    """FastAPI 依赖：由令牌得到当前用户，不访问 users 表"""
+    user = await sessions.get(token)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="登录已失效，请重新登录",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return user